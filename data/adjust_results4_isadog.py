@@ -6,7 +6,100 @@
 # DATE CREATED: 30/09/25                                
 # REVISED DATE: 
 # PURPOSE: Adjusts results_dic to indicate whether labels are of-a-dog or not.
+#          adjust_results4_isadog_stream does the same for a stream of
+#          (filename, results list) records. The dog names file is parsed
+#          once, and for a results table the classifier flags come from a
+#          precomputed is-a-dog bitmap over the 1000 ImageNet class ids.
 ##
+# Imports python modules
+import os
+
+import numpy as np
+
+# Imports functions created for this program
+from imagenet_labels import get_imagenet_classes
+from results_table import ResultsTable
+
+# Parsed dog names files and their is-a-dog class bitmaps, keyed by
+# (path, modification time) so that an edited file is read again
+_dognames_cache = {}
+_dog_classes_cache = {}
+
+def _file_key(path):
+    # Cache key of a file: its path and modification time
+    return path, os.stat(path).st_mtime_ns
+
+
+def load_dognames(dogfile):
+    """
+    Returns a dictionary with every valid dog name in dogfile as a key.
+    The file is parsed once and the dictionary cached until the file
+    changes, so it is shared between callers and must not be modified.
+    """
+    key = _file_key(dogfile)
+    dognames_dic = _dognames_cache.get(key)
+    if dognames_dic is None:
+        dognames_dic = {}
+        with open(dogfile, "r") as infile:
+            for line in infile:
+                breed_name = line.strip()
+                # Add non-empty breed names to dictionary
+                if breed_name and breed_name not in dognames_dic:
+                    dognames_dic[breed_name] = 1
+        _dognames_cache[key] = dognames_dic
+    return dognames_dic
+
+
+def dog_class_bitmap(dogfile):
+    """
+    Returns the is-a-dog flag of every ImageNet class id: whether any term
+    of the (normalized) class label is a dog name in dogfile. Built once per
+    dogfile and cached.
+
+    Parameters:
+      dogfile (str) - Path to text file containing valid dog breed names
+    Returns:
+      numpy.ndarray - Read-only array of bool indexed by ImageNet class id
+    """
+    key = _file_key(dogfile)
+    bitmap = _dog_classes_cache.get(key)
+    if bitmap is None:
+        dognames_dic = load_dognames(dogfile)
+        imagenet_classes_dict = get_imagenet_classes()
+        bitmap = np.zeros(max(imagenet_classes_dict) + 1, dtype=bool)
+        for class_id, label in imagenet_classes_dict.items():
+            bitmap[class_id] = _isadog_flags(['', label.lower().strip()], dognames_dic)[1]
+        bitmap.flags.writeable = False
+        _dog_classes_cache[key] = bitmap
+    return bitmap
+
+
+def _isadog_flags(result_list, dognames_dic, classifier_flags=None):
+    # Returns [pet is-a-dog, classifier is-a-dog] for one results list;
+    # classifier_flags, when given, remembers the flag of every classifier
+    # label already checked
+    # Extract labels from results list
+    pet_label = result_list[0]
+    classifier_label = result_list[1]
+
+    # Step 3: Check if pet label is a dog breed
+    pet_is_dog = 1 if pet_label in dognames_dic else 0
+
+    if classifier_flags is not None and classifier_label in classifier_flags:
+        return [pet_is_dog, classifier_flags[classifier_label]]
+
+    # Step 4: Check if classifier label contains any dog breed
+    # Classifier may return multiple terms separated by commas
+    classifier_is_dog = 0
+    classifier_terms = classifier_label.split(",")
+    for term in classifier_terms:
+        if term.strip() in dognames_dic:
+            classifier_is_dog = 1
+            break  # Found a dog breed, no need to check further
+    if classifier_flags is not None:
+        classifier_flags[classifier_label] = classifier_is_dog
+    return [pet_is_dog, classifier_is_dog]
+
 
 def adjust_results4_isadog(results_dic, dogfile):
     """
@@ -36,6 +129,8 @@ def adjust_results4_isadog(results_dic, dogfile):
                           EXTENDED BY THIS FUNCTION:
                             index 3 = pet is-a-dog flag (int: 1=dog, 0=not dog)
                             index 4 = classifier is-a-dog flag (int: 1=dog, 0=not dog)
+                          May also be a ResultsTable, whose is-a-dog
+                          columns are set instead
       dogfile (str) - Path to text file containing valid dog breed names
                      (one breed name per line, lowercase format)
     
@@ -47,31 +142,50 @@ def adjust_results4_isadog(results_dic, dogfile):
       If classifier_label='cat, feline' and neither is in dogfile, then classifier_is_dog=0
     """
     # Step 1: Load valid dog breed names from file into dictionary
-    dognames_dic = {}
-    with open(dogfile, "r") as infile:
-        for line in infile:
-            breed_name = line.strip()
-            # Add non-empty breed names to dictionary
-            if breed_name and breed_name not in dognames_dic:
-                dognames_dic[breed_name] = 1
-
-    # Step 2: Process each image result and add is-a-dog flags
-    for filename, result_list in results_dic.items():
-        # Extract labels from results list
-        pet_label = result_list[0]
-        classifier_label = result_list[1]
-
-        # Step 3: Check if pet label is a dog breed
-        pet_is_dog = 1 if pet_label in dognames_dic else 0
-
-        # Step 4: Check if classifier label contains any dog breed
-        # Classifier may return multiple terms separated by commas
-        classifier_is_dog = 0
-        classifier_terms = classifier_label.split(",")
-        for term in classifier_terms:
-            if term.strip() in dognames_dic:
-                classifier_is_dog = 1
-                break  # Found a dog breed, no need to check further
+    dognames_dic = load_dognames(dogfile)
 
+    # A ResultsTable sets the flags of all images at once: the classifier
+    # flags with one lookup of every class id in the is-a-dog bitmap, and
+    # the pet flags once per distinct pet label. Tables without class ids
+    # check each distinct pair of labels once instead
+    if isinstance(results_dic, ResultsTable):
+        if len(results_dic) and results_dic.column('class_id').min() >= 0:
+            results_dic.set_is_dog_by_class(
+                lambda pet_label: 1 if pet_label in dognames_dic else 0,
+                dog_class_bitmap(dogfile))
+        else:
+            results_dic.set_is_dog(lambda pet_label, classifier_label:
+                                   _isadog_flags([pet_label, classifier_label],
+                                                 dognames_dic))
+        return
+
+    # Step 2: Process each image result and add is-a-dog flags (Steps 3-4)
+    # Each distinct classifier label is only split and checked once
+    classifier_flags = {}
+    for filename, result_list in results_dic.items():
         # Step 5: Extend results list with is-a-dog flags
-        results_dic[filename].extend([pet_is_dog, classifier_is_dog])
+        results_dic[filename].extend(_isadog_flags(result_list, dognames_dic,
+                                                   classifier_flags))
+
+
+def adjust_results4_isadog_stream(records, dogfile):
+    """
+    Adds the is-a-dog flags to a stream of results, one image at a time.
+
+    The streaming counterpart of adjust_results4_isadog(): each record is
+    extended exactly like a results_dic value and passed on as soon as it
+    arrives, so nothing is held back in memory.
+
+    Parameters:
+      records (iterable) - (filename, results list) tuples with the pet label,
+                           classifier label and match indicator, e.g. from
+                           classify_images_stream()
+      dogfile (str) - Path to text file containing valid dog breed names
+    Yields:
+      tuple - (filename, results list) with indexes 3 and 4 added
+    """
+    dognames_dic = load_dognames(dogfile)
+    classifier_flags = {}
+    for filename, result_list in records:
+        result_list.extend(_isadog_flags(result_list, dognames_dic, classifier_flags))
+        yield filename, result_list
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/benchmark.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Benchmark suite for the pet classification pipeline. Each stage
+#          is timed on its own - get_pet_labels, image decode, preprocessing,
+#          the forward pass of every architecture at every batch size,
+#          adjust_results4_isadog, calculates_results_stats and
+#          print_results - on a folder of images (pet_images/ by default)
+#          and on generated synthetic JPEGs. The models use randomly
+#          initialized weights, so the suite runs offline and the timings do
+#          not depend on downloaded weights. 'run' saves the timings as a
+#          JSON baseline, 'compare' checks a run against a baseline and
+#          exits with status 1 when any stage got slower than the threshold.
+#
+#   Example calls:
+#    python benchmark.py run --arch all --output baselines/main.json
+#    python benchmark.py run --arch all --output current.json
+#    python benchmark.py compare baselines/main.json current.json --threshold 10
+##
+# Imports python modules
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+from time import perf_counter, strftime
+
+import numpy as np
+import torch
+import torchvision
+from PIL import Image
+
+# Imports functions created for this program
+from adjust_results4_isadog import adjust_results4_isadog
+from calculates_results_stats import calculates_results_stats
+from classifier import (CROP_SIZE, DECODE_MODES, InferenceSession, ModelRegistry,
+                        decode_image, preprocess)
+from get_input_args import arch_list, positive_int
+from get_pet_labels import get_pet_labels
+from label_index import imagenet_label_index
+from print_results import print_results
+
+# Version of the baseline file format
+BENCHMARK_FORMAT = 1
+
+# Pet labels of the synthetic images (dogs and not-dogs), used in turn
+SYNTHETIC_LABELS = ('Beagle', 'Collie', 'Boston_terrier', 'Basset_hound',
+                    'Cat', 'Gecko', 'Polar_bear', 'Skunk')
+
+# Size (width, height) of the synthetic images, that of a typical photo
+SYNTHETIC_SIZE = (500, 375)
+
+
+def time_stage(function, repeat, items=1):
+    """
+    Times function() over repeat calls, after one untimed call that pays the
+    one-off costs (caches, allocations, kernel selection).
+
+    Parameters:
+      function (callable) - Stage to time, called without arguments
+      repeat (int) - Number of timed calls
+      items (int) - Number of items (images) one call processes (default: 1)
+    Returns:
+      dict - 'items', 'repeat' and the 'min', 'median' and 'mean' seconds
+             per call, plus 'per_item' (fastest call's seconds per item,
+             the least noisy estimate, used by 'compare')
+    """
+    function()
+    seconds = []
+    for _ in range(repeat):
+        start_time = perf_counter()
+        function()
+        seconds.append(perf_counter() - start_time)
+    return {'items': items, 'repeat': repeat, 'min': min(seconds),
+            'median': statistics.median(seconds), 'mean': statistics.fmean(seconds),
+            'per_item': min(seconds) / items}
+
+
+def write_synthetic_images(image_dir, n_images, seed=0):
+    """
+    Writes n_images random-noise JPEGs named after SYNTHETIC_LABELS in turn,
+    e.g. 'Beagle_00000.jpg', so get_pet_labels gives them pet labels.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = SYNTHETIC_SIZE
+    for index in range(n_images):
+        pixels = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+        label = SYNTHETIC_LABELS[index % len(SYNTHETIC_LABELS)]
+        Image.fromarray(pixels).save(os.path.join(image_dir, f"{label}_{index:05d}.jpg"),
+                                     quality=90)
+
+
+def benchmark_images(name, image_dir, dogfile, decode, repeat, results):
+    """
+    Times the stages that depend on the images of one dataset, adding each
+    timing to results under '<name>/<stage>'.
+
+    Parameters:
+      name (str) - Dataset name: the folder name, or 'synthetic'
+      image_dir (str) - Folder of the images, ending in '/'
+      dogfile (str) - Dog names file for adjust_results4_isadog
+      decode (str) - One of DECODE_MODES
+      repeat (int) - Number of timed calls of each stage
+      results (dict) - Timings by benchmark name, added to
+    Returns:
+      torch.Tensor - The preprocessed (N, 3, 224, 224) images of the dataset
+    """
+    table = get_pet_labels(image_dir, table=True)
+    filenames = list(table)
+    n_images = len(filenames)
+    results[f"{name}/get_pet_labels"] = time_stage(
+        lambda: get_pet_labels(image_dir, table=True), repeat, n_images)
+
+    paths = [image_dir + filename for filename in filenames]
+    results[f"{name}/decode"] = time_stage(
+        lambda: [decode_image(path, decode) for path in paths], repeat, n_images)
+    images = [decode_image(path, decode) for path in paths]
+    results[f"{name}/preprocess"] = time_stage(
+        lambda: [preprocess(image) for image in images], repeat, n_images)
+    batch = torch.stack([preprocess(image) for image in images])
+
+    # The result stages need classified images; random class ids stand in
+    # for predictions, which makes the timings independent of the models
+    class_ids = np.random.default_rng(0).integers(0, 1000, size=n_images)
+    index = imagenet_label_index()
+    table.set_classifications(filenames, class_ids, index.class_labels, index.classes_for)
+    results[f"{name}/adjust_results4_isadog"] = time_stage(
+        lambda: adjust_results4_isadog(table.copy(), dogfile), repeat, n_images)
+    adjust_results4_isadog(table, dogfile)
+    results[f"{name}/calculates_results_stats"] = time_stage(
+        lambda: calculates_results_stats(table), repeat, n_images)
+    results_stats = calculates_results_stats(table)
+
+    # Console output is timed into a buffer so the terminal does not count
+    def print_stage():
+        with contextlib.redirect_stdout(io.StringIO()):
+            print_results(table, results_stats, 'benchmark', True, True)
+    results[f"{name}/print_results"] = time_stage(print_stage, repeat, n_images)
+    return batch
+
+
+def benchmark_forward(archs, batch_sizes, images, repeat, results):
+    """
+    Times one forward pass of every architecture at every batch size on
+    randomly initialized models, adding each timing to results under
+    'forward/<arch>/bs<batch size>'.
+
+    Parameters:
+      archs (list) - CNN model architectures
+      batch_sizes (list) - Batch sizes (int)
+      images (torch.Tensor) - Preprocessed images, repeated to fill batches
+      repeat (int) - Number of timed passes
+      results (dict) - Timings by benchmark name, added to
+    Returns:
+      None
+    """
+    registry = ModelRegistry(pretrained=False)
+    for arch in archs:
+        torch.manual_seed(0)
+        session = InferenceSession(arch, warmup=0, registry=registry, artifact_dir=None)
+        for batch_size in batch_sizes:
+            repeats = -(-batch_size // len(images))
+            batch = images.repeat(repeats, 1, 1, 1)[:batch_size].contiguous()
+            results[f"forward/{arch}/bs{batch_size}"] = time_stage(
+                lambda: session.forward(batch), repeat, batch_size)
+        # Only one model is held at a time
+        registry.evict(arch)
+
+
+def run_benchmarks(args):
+    """Runs the suite and writes the timings to args.output."""
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+    results = {}
+    datasets = []
+    if args.dir:
+        datasets.append((os.path.basename(os.path.normpath(args.dir)),
+                         os.path.join(args.dir, '')))
+
+    with tempfile.TemporaryDirectory() as synthetic_dir:
+        if args.synthetic:
+            write_synthetic_images(synthetic_dir, args.synthetic)
+            datasets.append(('synthetic', os.path.join(synthetic_dir, '')))
+        images = None
+        for name, image_dir in datasets:
+            print(f"Benchmarking {name} stages ({image_dir})")
+            images = benchmark_images(name, image_dir, args.dogfile, args.decode,
+                                      args.repeat, results)
+        if images is None or not len(images):
+            images = torch.zeros(1, 3, CROP_SIZE, CROP_SIZE)
+        print(f"Benchmarking forward passes of {args.arch}")
+        benchmark_forward(args.arch.split(','), args.batch_sizes, images, args.repeat,
+                          results)
+
+    report = {
+        'format': BENCHMARK_FORMAT,
+        'created': strftime('%Y-%m-%d %H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count(), 'torch_threads': torch.get_num_threads(),
+            'torch': torch.__version__, 'torchvision': torchvision.__version__,
+            'numpy': np.__version__,
+        },
+        'settings': {'dir': args.dir, 'synthetic': args.synthetic, 'arch': args.arch,
+                     'batch_sizes': args.batch_sizes, 'decode': args.decode,
+                     'repeat': args.repeat},
+        'benchmarks': results,
+    }
+    folder = os.path.dirname(args.output)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(args.output, 'w') as outfile:
+        json.dump(report, outfile, indent=2)
+    print_benchmarks(results)
+    print(f"Wrote {len(results)} benchmarks to {args.output}")
+
+
+def print_benchmarks(results):
+    """Prints the median time per call and the time per item of every benchmark."""
+    print("\n" + "="*70)
+    print(f"{'BENCHMARK':<40}{'MEDIAN [ms]':>14}{'PER ITEM [ms]':>16}")
+    print("="*70)
+    for name, timing in results.items():
+        print(f"{name[:39]:<40}{timing['median'] * 1e3:>14.2f}"
+              f"{timing['per_item'] * 1e3:>16.3f}")
+    print("="*70)
+
+
+def compare_benchmarks(baseline, current, threshold):
+    """
+    Compares the time per item (see time_stage) of every benchmark in both
+    reports.
+
+    Parameters:
+      baseline (dict) - Baseline report written by 'run'
+      current (dict) - Report to check
+      threshold (float) - Slowdown in percent above which a benchmark is a
+                          regression
+    Returns:
+      dict - Maps each benchmark in both reports to a dict with keys
+             'baseline' and 'current' (seconds per item), 'change'
+             (percent) and 'regression' (bool)
+    """
+    comparison = {}
+    for name, timing in current['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            continue
+        before = baseline['benchmarks'][name]['per_item']
+        after = timing['per_item']
+        change = (after / before - 1.0) * 100.0 if before > 0 else 0.0
+        comparison[name] = {'baseline': before, 'current': after, 'change': change,
+                            'regression': change > threshold}
+    return comparison
+
+
+def print_comparison(comparison, baseline, current, threshold):
+    """Prints a comparison from compare_benchmarks(), regressions flagged."""
+    print("\n" + "="*78)
+    print(f"*** Benchmark Comparison (regression threshold {threshold:g}%) ***")
+    print("="*78)
+    print(f"{'BENCHMARK':<40}{'BASE [ms]':>11}{'NOW [ms]':>11}{'CHANGE':>10}")
+    for name, row in comparison.items():
+        flag = '  REGRESSION' if row['regression'] else ''
+        print(f"{name[:39]:<40}{row['baseline'] * 1e3:>11.3f}{row['current'] * 1e3:>11.3f}"
+              f"{row['change']:>+9.1f}%{flag}")
+    missing = sorted(set(baseline['benchmarks']) - set(current['benchmarks']))
+    added = sorted(set(current['benchmarks']) - set(baseline['benchmarks']))
+    if missing:
+        print(f"\nOnly in the baseline: {', '.join(missing)}")
+    if added:
+        print(f"\nNot in the baseline: {', '.join(added)}")
+    if baseline.get('environment') != current.get('environment'):
+        print("\nWarning: the runs were made in different environments")
+    n_regressions = sum(row['regression'] for row in comparison.values())
+    print(f"\n{n_regressions} of {len(comparison)} benchmarks regressed")
+    print("="*78)
+
+
+def batch_size_list(value):
+    """argparse type for --batch-sizes: comma-separated positive integers."""
+    return [positive_int(size) for size in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark each stage of the pet classification pipeline'
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run the benchmarks and save a JSON baseline')
+    run_parser.add_argument('--dir', type=str, default='pet_images/',
+                            help="Folder of images to benchmark on ('' to skip)")
+    run_parser.add_argument('--synthetic', type=int, default=64,
+                            help='Number of synthetic images to benchmark on (0 to skip)')
+    run_parser.add_argument('--arch', type=arch_list, default='all',
+                            help="CNN model architecture(s), e.g. 'vgg', 'resnet,vgg' or 'all'")
+    run_parser.add_argument('--batch-sizes', type=batch_size_list, default=[1, 8, 32],
+                            help='Comma-separated forward pass batch sizes')
+    run_parser.add_argument('--decode', type=str, default='full', choices=DECODE_MODES,
+                            help='Image decode mode')
+    run_parser.add_argument('--dogfile', type=str, default='dognames.txt',
+                            help='Text file with dog names')
+    run_parser.add_argument('--repeat', type=positive_int, default=5,
+                            help='Timed calls of each stage, after one untimed call')
+    run_parser.add_argument('--threads', type=positive_int, default=None,
+                            help='Intra-op threads for torch (default: torch default)')
+    run_parser.add_argument('--output', type=str, default='benchmark.json',
+                            help='JSON file the timings are written to')
+
+    compare_parser = commands.add_parser(
+        'compare', help='Compare a run with a baseline and flag regressions')
+    compare_parser.add_argument('baseline', help='Baseline JSON file')
+    compare_parser.add_argument('current', help='JSON file of the run to check')
+    compare_parser.add_argument('--threshold', type=float, default=10.0,
+                                help='Slowdown in percent counted as a regression')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        if args.synthetic < 0:
+            parser.error(f"--synthetic must be at least 0, got {args.synthetic}")
+        if not args.dir and not args.synthetic:
+            parser.error("nothing to benchmark: give --dir or --synthetic")
+        run_benchmarks(args)
+        return
+
+    reports = []
+    for path in (args.baseline, args.current):
+        with open(path) as infile:
+            reports.append(json.load(infile))
+    comparison = compare_benchmarks(reports[0], reports[1], args.threshold)
+    print_comparison(comparison, reports[0], reports[1], args.threshold)
+    if any(row['regression'] for row in comparison.values()):
+        sys.exit(1)
+
+
+# Call to main function to run the program
+if __name__ == "__main__":
+    main()
@@ -36,13 +36,29 @@
 #            pct_correct_dogs - percentage of correctly classified dogs
 #            pct_correct_breed - percentage of correctly classified dog breeds
 #            pct_correct_notdogs - percentage of correctly classified NON-dogs
+#          When a top-k dictionary from classify_images is also given, the
+#          dictionary additionally contains:
+#            topk - number of classes (k) considered per image
+#            n_topk_match - number of images whose pet label matches any of
+#                           the top-k classifier classes
+#            n_topk_correct_breed - number of dog images whose breed is among
+#                                   the top-k classifier classes
+#            pct_topk_match - percentage of top-k matches
+#            pct_topk_correct_breed - percentage of dog breeds in the top-k
 #
 ##
+# Imports python modules
+from collections.abc import Mapping
+
+# Imports the columnar results store and its vectorized statistics
+from results_stats import ResultsStats
+from results_table import ResultsTable
+
 # TODO 5: Define calculates_results_stats function below, please be certain to replace None
 #       in the return statement with the results_stats_dic dictionary that you create 
 #       with this function
 # 
-def calculates_results_stats(results_dic):
+def calculates_results_stats(results_dic, topk_dic=None):
     """
     Calculates comprehensive statistics for image classification results.
     
@@ -75,6 +91,14 @@ def calculates_results_stats(results_dic):
                             index 2 = label match (int: 1=match, 0=no match)
                             index 3 = pet is-a-dog (int: 1=dog, 0=not dog)
                             index 4 = classifier is-a-dog (int: 1=dog, 0=not dog)
+                          May also be a ResultsTable, the ResultsStats of
+                          one (e.g. merged from shards, without topk_dic), or
+                          an iterable of (filename, list) records, e.g. from
+                          adjust_results4_isadog_stream(), which is consumed
+                          one record at a time
+      topk_dic (dict) - Optional top-k dictionary filled in by classify_images()
+                       (index 2 of each value is the top-k match indicator);
+                       when given, top-k match rates are added (default: None)
     
     Returns:
       dict - Statistics dictionary with keys as statistic names and values as
@@ -95,7 +119,21 @@ def calculates_results_stats(results_dic):
     }
     
     # Process each image result and accumulate counts
-    for filename, result_list in results_dic.items():
+    if isinstance(results_dic, (ResultsTable, ResultsStats)):
+        # A table is counted with boolean masks over its columns instead of
+        # row by row (merged shard statistics are already counted)
+        if isinstance(results_dic, ResultsTable):
+            table_stats = ResultsStats.from_table(results_dic)
+        else:
+            table_stats = results_dic
+        results_stats_dic = table_stats.counts()
+        n_images = results_stats_dic['n_images']
+        records = ()
+    else:
+        records = results_dic.items() if isinstance(results_dic, Mapping) else results_dic
+        n_images = 0
+    for filename, result_list in records:
+        n_images += 1
         # Extract values from result list for readability
         pet_label = result_list[0]
         classifier_label = result_list[1]
@@ -126,7 +164,7 @@ def calculates_results_stats(results_dic):
                 results_stats_dic['n_correct_notdogs'] += 1
     
     # Calculate derived counts
-    results_stats_dic['n_images'] = len(results_dic)
+    results_stats_dic['n_images'] = n_images
     results_stats_dic['n_notdogs_img'] = (
         results_stats_dic['n_images'] - results_stats_dic['n_dogs_img']
     )
@@ -157,6 +195,28 @@ def calculates_results_stats(results_dic):
         if results_stats_dic['n_notdogs_img'] > 0 else 0.0
     )
     
+    # Top-k match rates - the pet label matches any of the k most probable
+    # classes rather than only the top one
+    if topk_dic:
+        n_topk_match = 0
+        n_topk_correct_breed = 0
+        for filename, (class_ids, _, topk_match) in topk_dic.items():
+            if topk_match == 1:
+                n_topk_match += 1
+                if results_dic[filename][3] == 1:
+                    n_topk_correct_breed += 1
+        results_stats_dic['topk'] = len(class_ids)
+        results_stats_dic['n_topk_match'] = n_topk_match
+        results_stats_dic['n_topk_correct_breed'] = n_topk_correct_breed
+        results_stats_dic['pct_topk_match'] = (
+            (n_topk_match / results_stats_dic['n_images'] * 100.0)
+            if results_stats_dic['n_images'] > 0 else 0.0
+        )
+        results_stats_dic['pct_topk_correct_breed'] = (
+            (n_topk_correct_breed / results_stats_dic['n_dogs_img'] * 100.0)
+            if results_stats_dic['n_dogs_img'] > 0 else 0.0
+        )
+    
     # Return the completed statistics dictionary
     return results_stats_dic    
     
\ No newline at end of file
@@ -17,25 +17,68 @@
 #          architectures to determine which provides the 'best' classification.
 #
 # Use argparse Expected Call with <> indicating expected user input:
-#      python check_images.py --dir <directory with images> --arch <model>
+#      python check_images.py --dir <directory with images> --arch <model(s)>
 #             --dogfile <file that contains dognames>
+#             --batch-size <images per CNN forward pass>
+#             --workers <number of worker processes>
+#             --cache-dir <prediction cache directory> --no-cache
+#             --tensor-store <path prefix of preprocessed image store>
+#             --precision <fp32, int8, int8-static or bf16> --compare-fp32
+#             --layout <nchw or channels_last> --decode <full or draft>
+#             --stream --recursive --filelist <file listing the images>
+#             --check-magic --scan-threads <number of scanning threads>
+#             --journal --resume <run id> --journal-path <journal database>
+#             --breed-stats --label-index --startup-report
+#             --timing-report <JSON run report file>
+#             --profile --profile-dir <profile directory>
+#             --profile-batches <batches recorded by torch.profiler>
+#             --memory-report --tracemalloc <top allocation sites per stage>
 #   Example call:
 #    python check_images.py --dir pet_images/ --arch vgg --dogfile dognames.txt
+#   Example call comparing all 3 architectures in a single pass:
+#    python check_images.py --dir pet_images/ --arch all --ensemble
+#   Example call streaming a very large folder with flat memory use:
+#    python check_images.py --dir huge_images/ --arch resnet --stream
+#   Example call journaling a long run, and resuming it after a crash:
+#    python check_images.py --dir huge_images/ --arch resnet --journal
+#    python check_images.py --dir huge_images/ --arch resnet --resume <run id>
+#   Example call checking whether INT8 quantization is safe for each model:
+#    python check_images.py --dir pet_images/ --arch all --precision int8 --compare-fp32
 ##
 
 # Imports python modules
+import sys
+from itertools import islice
 from time import time, sleep
 
+# Times every stage of the run (for --startup-report and --timing-report).
+# With --startup-report every module import from here on is timed too; the
+# flag is looked for before the arguments are parsed so that these imports
+# count
+from startup_report import StartupReport
+stage_timer = StartupReport(time_imports='--startup-report' in sys.argv)
+
 # Imports print functions that check the lab
 from print_functions_for_lab_checks import *
 
-# Imports functions created for this program
+# Imports functions created for this program. None of these import torch:
+# the modules that do (classify_images, classifier, tensor_store and
+# precision_comparison) are only imported once the arguments have been
+# checked and the images found, so --help, argument errors and (without
+# --stream) folders with no images never pay for loading torch
 from get_input_args import get_input_args
-from get_pet_labels import get_pet_labels
-from classify_images import classify_images
-from adjust_results4_isadog import adjust_results4_isadog
+from get_pet_labels import get_pet_labels, iter_pet_labels
+from adjust_results4_isadog import adjust_results4_isadog, adjust_results4_isadog_stream
 from calculates_results_stats import calculates_results_stats
-from print_results import print_results
+from print_results import (print_results, print_model_comparison, print_results_stream,
+                           print_breed_stats)
+from parallel_classify import print_worker_stats
+from label_index import print_label_index
+from prediction_cache import PredictionCache
+from results_stats import ResultsStats
+from run_journal import RunJournal
+from run_report import (LatencyRecorder, print_memory_report, run_manifest,
+                        write_timing_report)
 
 # Main program function defined below
 def main():
@@ -47,10 +90,24 @@ def main():
     # the user running the program from a terminal window. This function returns
     # the collection of these command line arguments from the function call as
     # the variable in_arg
+    stage_timer.mark('module imports')
     in_arg = get_input_args()
 
     # Function that checks command line arguments using in_arg  
     check_command_line_arguments(in_arg)
+    # With --memory-report (or --tracemalloc) every stage also records its
+    # memory use from here on
+    if in_arg.memory_report or in_arg.tracemalloc:
+        stage_timer.track_memory(in_arg.tracemalloc or 0)
+    stage_timer.mark('argument parsing')
+
+    # With --stream the images flow through every step one batch at a time
+    # instead of filling in a results dictionary first
+    if in_arg.stream:
+        results_stats = stream_images(in_arg)
+        print_elapsed_runtime(start_time)
+        report_timings(in_arg, results_stats['n_images'])
+        return
 
     
     # TODO 2: Define get_pet_labels function within the file get_pet_labels.py
@@ -60,65 +117,331 @@ def main():
     #             get_pet_labels(in_arg.dir)
     # This function creates the results dictionary that contains the results, 
     # this dictionary is returned from the function call as the variable results
-    results = get_pet_labels(in_arg.dir)
+    # (as a columnar ResultsTable, which behaves like the dictionary but stores
+    # every column in a compact array)
+    results = get_pet_labels(in_arg.dir, in_arg.recursive, in_arg.filelist,
+                             in_arg.check_magic, in_arg.scan_threads, table=True)
 
     # Function that checks Pet Images in the results Dictionary using results    
     check_creating_pet_image_labels(results)
 
+    # With --label-index, shows the ImageNet classes each pet label can match
+    if in_arg.label_index:
+        print_label_index(results.label_counts())
+    stage_timer.mark('image discovery')
+
+    # Without images there is nothing to classify, so torch is never loaded
+    if not results:
+        print(f"\nNo images found in {in_arg.dir}")
+        print_elapsed_runtime(start_time)
+        if in_arg.startup_report:
+            stage_timer.print_report()
+        return
+
+    # The images are found, so the CNN pipeline (and torch) is needed now
+    from classify_images import classify_images_multi
+    from classifier import ENSEMBLE, calibration_sample
+    from tensor_store import TensorStore
+    instrument_classifier(in_arg)
+    stage_timer.mark('pipeline imports')
+
+    # With several architectures (e.g. --arch resnet,vgg or --arch all) every
+    # model - and the optional averaged-logits ensemble - gets its own copy of
+    # the results table, all filled in by a single classification pass
+    archs = in_arg.arch.split(',')
+    names = archs + ([ENSEMBLE] if in_arg.ensemble and len(archs) > 1 else [])
+    results_dics = {names[0]: results}
+    for name in names[1:]:
+        results_dics[name] = results.copy()
+    # With --topk the k most probable classes of each image are recorded too
+    topk_dics = {name: {} for name in names} if in_arg.topk else None
+
 
     # TODO 3: Define classify_images function within the file classiy_images.py
     # Once the classify_images function has been defined replace first 'None' 
     # in the function call with in_arg.dir and replace the last 'None' in the
     # function call with in_arg.arch  Once you have done the replacements your
     # function call should look like this: 
-    #             classify_images(in_arg.dir, results, in_arg.arch)
+    #             classify_images(in_arg.dir, results, in_arg.arch, in_arg.batch_size)
     # Creates Classifier Labels with classifier function, Compares Labels, 
     # and adds these results to the results dictionary - results
-    classify_images(in_arg.dir, results, in_arg.arch)
+    # (classify_images_multi does this for every requested architecture,
+    # decoding each image only once)
+    # Predictions of unchanged images are reused from the prediction cache
+    # unless it has been disabled with --no-cache
+    cache = None
+    if not in_arg.no_cache:
+        cache = PredictionCache(in_arg.cache_dir, in_arg.cache_size_mb * 1024 ** 2)
+    # Preprocessed images are read from (and added to) the tensor store
+    tensor_store = TensorStore(in_arg.tensor_store, in_arg.decode) \
+        if in_arg.tensor_store else None
+    # Static INT8 quantization is calibrated on a sample of the images
+    calibration_paths = None
+    if in_arg.precision == 'int8-static':
+        calibration_paths = calibration_sample([in_arg.dir + filename for filename in results],
+                                               in_arg.calibration_images)
+    # With --profile, classification and every step after it are profiled
+    python_profiler = start_profiling(in_arg)
+    # With --journal or --resume results are journaled as they are
+    # classified, and images journaled before an interruption are skipped
+    journal = open_journal(in_arg)
+    try:
+        worker_stats = classify_images_multi(in_arg.dir, results_dics, archs,
+                                             in_arg.batch_size, in_arg.workers,
+                                             in_arg.threads_per_worker, in_arg.pin_cores,
+                                             cache, tensor_store, in_arg.topk, topk_dics,
+                                             in_arg.precision, calibration_paths,
+                                             in_arg.layout, in_arg.decode, journal)
+    finally:
+        if journal is not None:
+            journal.close()
+    stage_timer.mark('classification')
 
-    # Function that checks Results Dictionary using results    
-    check_classifying_images(results)    
+    # Reports per-worker throughput when classifying with worker processes
+    if worker_stats:
+        print_worker_stats(worker_stats)
 
-    
-    # TODO 4: Define adjust_results4_isadog function within the file adjust_results4_isadog.py
-    # Once the adjust_results4_isadog function has been defined replace 'None' 
-    # in the function call with in_arg.dogfile  Once you have done the 
-    # replacements your function call should look like this: 
-    #          adjust_results4_isadog(results, in_arg.dogfile)
-    # Adjusts the results dictionary to determine if classifier correctly 
-    # classified images as 'a dog' or 'not a dog'. This demonstrates if 
-    # model can correctly classify dog images as dogs (regardless of breed)
-    adjust_results4_isadog(results, in_arg.dogfile)
-
-    # Function that checks Results Dictionary for is-a-dog adjustment using results
-    check_classifying_labels_as_dogs(results)
-
-
-    # TODO 5: Define calculates_results_stats function within the file calculates_results_stats.py
-    # This function creates the results statistics dictionary that contains a
-    # summary of the results statistics (this includes counts & percentages). This
-    # dictionary is returned from the function call as the variable results_stats    
-    # Calculates results of run and puts statistics in the Results Statistics
-    # Dictionary - called results_stats
-    results_stats = calculates_results_stats(results)
-
-    # Function that checks Results Statistics Dictionary using results_stats
-    check_calculating_results(results, results_stats)
-
-
-    # TODO 6: Define print_results function within the file print_results.py
-    # Once the print_results function has been defined replace 'None' 
-    # in the function call with in_arg.arch  Once you have done the 
-    # replacements your function call should look like this: 
-    #      print_results(results, results_stats, in_arg.arch, True, True)
-    # Prints summary results, incorrect classifications of dogs (if requested)
-    # and incorrectly classified breeds (if requested)
-    print_results(results, results_stats, in_arg.arch, True, True)
+    # The remaining steps run once per architecture (and for the ensemble);
+    # the time of each step is added up over the architectures
+    results_stats_dics = {}
+    for name, results in results_dics.items():
+        # Function that checks Results Dictionary using results    
+        check_classifying_images(results)    
+        stage_timer.mark('lab checks')
+
+
+        # TODO 4: Define adjust_results4_isadog function within the file adjust_results4_isadog.py
+        # Once the adjust_results4_isadog function has been defined replace 'None' 
+        # in the function call with in_arg.dogfile  Once you have done the 
+        # replacements your function call should look like this: 
+        #          adjust_results4_isadog(results, in_arg.dogfile)
+        # Adjusts the results dictionary to determine if classifier correctly 
+        # classified images as 'a dog' or 'not a dog'. This demonstrates if 
+        # model can correctly classify dog images as dogs (regardless of breed)
+        adjust_results4_isadog(results, in_arg.dogfile)
+        stage_timer.mark('adjust_results4_isadog')
+
+        # Function that checks Results Dictionary for is-a-dog adjustment using results
+        check_classifying_labels_as_dogs(results)
+        stage_timer.mark('lab checks')
+
+
+        # TODO 5: Define calculates_results_stats function within the file calculates_results_stats.py
+        # This function creates the results statistics dictionary that contains a
+        # summary of the results statistics (this includes counts & percentages). This
+        # dictionary is returned from the function call as the variable results_stats    
+        # Calculates results of run and puts statistics in the Results Statistics
+        # Dictionary - called results_stats
+        results_stats = calculates_results_stats(
+            results, topk_dics[name] if topk_dics else None)
+        results_stats_dics[name] = results_stats
+        stage_timer.mark('calculates_results_stats')
+
+        # Function that checks Results Statistics Dictionary using results_stats
+        check_calculating_results(results, results_stats)
+        stage_timer.mark('lab checks')
+
+
+        # TODO 6: Define print_results function within the file print_results.py
+        # Once the print_results function has been defined replace 'None' 
+        # in the function call with in_arg.arch  Once you have done the 
+        # replacements your function call should look like this: 
+        #      print_results(results, results_stats, in_arg.arch, True, True)
+        # Prints summary results, incorrect classifications of dogs (if requested)
+        # and incorrectly classified breeds (if requested)
+        print_results(results, results_stats, name, True, True)
+
+        # With --breed-stats, the precision and recall of every dog breed
+        # from the confusion matrix of the results
+        if in_arg.breed_stats:
+            print_breed_stats(ResultsStats.from_table(results).breed_metrics(), name)
+        stage_timer.mark('print_results')
+
+    # Compares the architectures side by side when several were run
+    if len(results_stats_dics) > 1:
+        print_model_comparison(results_stats_dics)
+        stage_timer.mark('print_results')
+
+    # Compares the reduced precision and/or channels_last layout with fp32
+    # NCHW on the same images
+    if in_arg.compare_fp32 and (in_arg.precision != 'fp32' or in_arg.layout != 'nchw'):
+        from precision_comparison import compare_precision, print_precision_comparison
+        comparison = compare_precision(in_arg.dir, results, archs, in_arg.dogfile,
+                                       in_arg.precision, calibration_paths,
+                                       in_arg.batch_size, in_arg.workers, tensor_store,
+                                       in_arg.layout, in_arg.decode)
+        print_precision_comparison(comparison, in_arg.precision, in_arg.layout)
+        stage_timer.mark('precision comparison')
+    stop_profiling(in_arg, python_profiler)
     
     # TODO 0: Measure total program runtime by collecting end time
-    end_time = time()
-    
     # TODO 0: Computes overall runtime in seconds & prints it in hh:mm:ss format
+    print_elapsed_runtime(start_time)
+
+    # Reports the stage timings requested with --startup-report and
+    # --timing-report
+    report_timings(in_arg, len(results))
+
+
+def stream_images(in_arg):
+    """
+    Runs the whole pipeline as a stream of per-image records: pet labels are
+    read lazily from the folder, classified batch_size images at a time,
+    checked for dogs and counted, and misclassifications are printed as
+    soon as their batch completes. Memory use is bounded by the batch size
+    rather than the number of images.
+
+    Parameters:
+      in_arg (argparse.Namespace) - Command line arguments (one architecture)
+    Returns:
+      dict - The results statistics dictionary of the whole stream (the
+             results are printed to console)
+    """
+    from classify_images import classify_images_stream
+    from tensor_store import TensorStore
+    instrument_classifier(in_arg)
+    stage_timer.mark('pipeline imports')
+
+    cache = None
+    if not in_arg.no_cache:
+        cache = PredictionCache(in_arg.cache_dir, in_arg.cache_size_mb * 1024 ** 2)
+    # Each batch's images are added to the store before they are classified
+    tensor_store = TensorStore(in_arg.tensor_store, in_arg.decode) \
+        if in_arg.tensor_store else None
+    calibration_paths = None
+    if in_arg.precision == 'int8-static':
+        # The first images of the folder are used for the calibration
+        calibration_paths = [in_arg.dir + filename for filename, _ in
+                             islice(iter_pet_labels(in_arg.dir, in_arg.recursive,
+                                                    in_arg.filelist, in_arg.check_magic),
+                                    in_arg.calibration_images)]
+
+    records = iter_pet_labels(in_arg.dir, in_arg.recursive, in_arg.filelist,
+                              in_arg.check_magic, in_arg.scan_threads)
+    journal = open_journal(in_arg)
+    records = classify_images_stream(in_arg.dir, records, in_arg.arch, in_arg.batch_size,
+                                     cache, in_arg.precision, calibration_paths,
+                                     in_arg.layout, in_arg.decode, journal, tensor_store)
+    records = adjust_results4_isadog_stream(records, in_arg.dogfile)
+    python_profiler = start_profiling(in_arg)
+    try:
+        results_stats = print_results_stream(records, in_arg.arch, True, True)
+    finally:
+        if journal is not None:
+            journal.close()
+    stop_profiling(in_arg, python_profiler)
+    stage_timer.mark('classification and results')
+    return results_stats
+
+
+def open_journal(in_arg):
+    """
+    Opens the run journal requested with --journal or --resume and prints
+    the id of the run.
+
+    Parameters:
+      in_arg (argparse.Namespace) - Command line arguments
+    Returns:
+      RunJournal - The journal of the new or resumed run, or None when
+                   journaling is off
+    """
+    if not in_arg.journal and not in_arg.resume:
+        return None
+    # A run may only be resumed with the settings its predictions depend on
+    archs = in_arg.arch.split(',')
+    settings = {'dir': in_arg.dir, 'arch': in_arg.arch,
+                'ensemble': in_arg.ensemble and len(archs) > 1,
+                'precision': in_arg.precision, 'layout': in_arg.layout,
+                'decode': in_arg.decode}
+    if in_arg.precision == 'int8-static':
+        settings['calibration_images'] = in_arg.calibration_images
+    try:
+        journal = RunJournal(in_arg.journal_path, in_arg.resume, settings)
+    except (KeyError, ValueError) as error:
+        sys.exit(f"Cannot resume run: {error.args[0]}")
+    if journal.resumed:
+        print(f"Resuming run {journal.run_id}: {journal.count(archs[0])} images "
+              f"already journaled in {in_arg.journal_path}")
+    else:
+        print(f"Journaling run {journal.run_id} to {in_arg.journal_path} "
+              f"(continue it with --resume {journal.run_id})")
+    return journal
+
+
+def instrument_classifier(in_arg):
+    """
+    Makes classifier.py record the per-image decode, preprocess and forward
+    latencies of this process for --timing-report, and the peak memory
+    growth of every batch for --memory-report (worker processes do not
+    record theirs).
+    """
+    import classifier
+    if in_arg.timing_report:
+        classifier.latency_recorder = LatencyRecorder()
+    classifier.memory_tracker = stage_timer.memory
+
+
+def start_profiling(in_arg):
+    """
+    With --profile, has the first classification batches recorded with
+    torch.profiler (see profiling.BatchProfiler) and starts profiling the
+    Python side with cProfile. Without it nothing is imported or started.
+
+    Parameters:
+      in_arg (argparse.Namespace) - Command line arguments
+    Returns:
+      PythonProfiler - The running cProfile profiler, or None without
+                       --profile
+    """
+    if not in_arg.profile:
+        return None
+    import classifier
+    from profiling import BatchProfiler, PythonProfiler
+    classifier.batch_profiler = BatchProfiler(in_arg.profile_dir, in_arg.profile_batches)
+    python_profiler = PythonProfiler(in_arg.profile_dir)
+    python_profiler.enable()
+    return python_profiler
+
+
+def stop_profiling(in_arg, python_profiler):
+    """Stops the profilers of start_profiling() and writes their results."""
+    if python_profiler is None:
+        return
+    import classifier
+    from profiling import print_profile_files
+    python_profiler.disable()
+    classifier.batch_profiler.finish()
+    classifier.batch_profiler = None
+    python_profiler.dump()
+    print_profile_files(in_arg.profile_dir)
+
+
+def report_timings(in_arg, n_images):
+    """
+    Writes the JSON run report of --timing-report and prints the memory
+    report of --memory-report and the startup report of --startup-report.
+
+    Parameters:
+      in_arg (argparse.Namespace) - Command line arguments
+      n_images (int) - Number of images classified
+    Returns:
+      None
+    """
+    import classifier
+    model_memory = classifier.session_memory() if stage_timer.memory else None
+    if stage_timer.memory is not None:
+        print_memory_report(stage_timer, model_memory)
+    if in_arg.timing_report:
+        write_timing_report(in_arg.timing_report, run_manifest(in_arg), stage_timer,
+                            classifier.latency_recorder, n_images, model_memory)
+        print(f"Wrote timing report to {in_arg.timing_report}")
+    if in_arg.startup_report:
+        stage_timer.print_report()
+
+
+def print_elapsed_runtime(start_time):
+    """Prints the time elapsed since start_time in hh:mm:ss format."""
+    end_time = time()
     tot_time = end_time - start_time
     # Calculate difference between end time and start time
     hours = int(tot_time / 3600)
@@ -1,74 +1,913 @@
-import ast
+import copy
+import hashlib
+import math
+import os
+import warnings
+from collections import OrderedDict
+from time import perf_counter
+import numpy as np
 from PIL import Image
+import torch
+import torchvision
 import torchvision.transforms as transforms
-from torch.autograd import Variable
-import torchvision.models as models
-from torch import __version__
+import torchvision.models as torchvision_models
 
-resnet18 = models.resnet18(pretrained=True)
-alexnet = models.alexnet(pretrained=True)
-vgg16 = models.vgg16(pretrained=True)
+# Imports functions created for this program
+from imagenet_labels import get_imagenet_classes
 
-models = {'resnet': resnet18, 'alexnet': alexnet, 'vgg': vgg16}
+# Builders for the supported architectures - models are only constructed
+# (and their pretrained weights loaded) the first time they are requested
+MODEL_BUILDERS = {
+    'resnet': torchvision_models.resnet18,
+    'alexnet': torchvision_models.alexnet,
+    'vgg': torchvision_models.vgg16,
+}
+
+# Numeric precisions an InferenceSession can run in: 'int8' quantizes the
+# Linear layers dynamically, 'int8-static' also quantizes the conv layers
+# with activation ranges calibrated on sample images, and 'bf16' runs the
+# fp32 model under bfloat16 autocast
+PRECISIONS = ('fp32', 'int8', 'int8-static', 'bf16')
+
+# Memory layouts of the model weights and input batches: 'nchw' is the
+# PyTorch default, 'channels_last' (NHWC) is what the oneDNN convolution
+# kernels prefer on x86 CPUs
+LAYOUTS = ('nchw', 'channels_last')
+
+# Directory of quantized models saved by quantize_model()
+QUANTIZED_MODEL_DIR = '.quantized_models'
+
+# Directory of optimized fp32 model artifacts written by optimize_model()
+ARTIFACT_DIR = '.model_artifacts'
+
+# Preprocessing shared by every architecture
+RESIZE_SIZE = 256
+CROP_SIZE = 224
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+# Built once and reused by every InferenceSession
+preprocess = transforms.Compose([
+    transforms.Resize(RESIZE_SIZE),
+    transforms.CenterCrop(CROP_SIZE),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD)
+])
+
+# The geometric half of preprocess - its uint8 output is what the tensor
+# store (tensor_store.py) keeps on disk
+crop = transforms.Compose([
+    transforms.Resize(RESIZE_SIZE),
+    transforms.CenterCrop(CROP_SIZE),
+])
+
+# How images are decoded: 'full' decodes every pixel, 'draft' lets the JPEG
+# decoder scale the image down by 1/2, 1/4 or 1/8 while decoding
+DECODE_MODES = ('full', 'draft')
+
+
+def decode_image(img_path, decode='full'):
+    """
+    Opens an image and returns it decoded in RGB.
+
+    In 'draft' mode a JPEG is decoded straight to the smallest DCT-scaled
+    size whose short side is still at least RESIZE_SIZE, so the exact
+    Resize that follows has far fewer pixels to decode and resample. Other
+    formats, and JPEGs that are already small, are decoded in full.
+
+    Parameters:
+      img_path (str) - Path of the image
+      decode (str) - One of DECODE_MODES (default: 'full')
+    Returns:
+      PIL.Image.Image - The decoded RGB image
+    """
+    image = Image.open(img_path)
+    if decode == 'draft' and image.format == 'JPEG':
+        width, height = image.size
+        scale = RESIZE_SIZE / min(width, height)
+        if scale < 1:
+            image.draft('RGB', (math.ceil(width * scale), math.ceil(height * scale)))
+    elif decode not in DECODE_MODES:
+        raise ValueError(f"Unknown decode mode: {decode!r} "
+                         f"(expected one of {list(DECODE_MODES)})")
+    return image.convert('RGB')
+
+
+def preprocess_signature(decode='full'):
+    """
+    Returns a string identifying the decoding and preprocessing of images,
+    used to key cached predictions and stored images.
+    """
+    if decode == 'full':
+        return repr(preprocess)
+    return f"decode={decode}|{preprocess!r}"
+
+
+def normalize_batch(images):
+    """
+    Converts a batch of cropped uint8 images into the normalized float
+    tensor the models expect - the batched equivalent of the ToTensor and
+    Normalize steps of preprocess, giving identical values.
+
+    Parameters:
+      images (numpy.ndarray) - uint8 array of shape (N, 224, 224, 3)
+    Returns:
+      torch.Tensor - float32 tensor of shape (N, 3, 224, 224)
+    """
+    batch = torch.from_numpy(images).permute(0, 3, 1, 2).contiguous()
+    batch = batch.float().div_(255)
+    mean = torch.tensor(IMAGENET_MEAN).view(1, 3, 1, 1)
+    std = torch.tensor(IMAGENET_STD).view(1, 3, 1, 1)
+    return batch.sub_(mean).div_(std)
+
+
+def model_nbytes(model):
+    """
+    Returns the number of bytes held by a model's parameters and buffers.
+
+    Parameters:
+      model (torch.nn.Module) - Model to measure
+    Returns:
+      int - Total size in bytes of all parameters and buffers
+    """
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelRegistry:
+    """
+    Loads CNN architectures on first use and keeps them for later calls.
+
+    Models are kept in least-recently-used order. When a memory budget is
+    set, loading a model that would push the total parameter and buffer
+    size over the budget first evicts the least-recently-used models. The
+    model being requested is always kept, even if it alone exceeds the
+    budget.
+
+    Parameters:
+      memory_budget (int) - Maximum bytes of model weights to keep loaded,
+                            or None for no limit (default: None)
+      pretrained (bool) - Load ImageNet pretrained weights (default: True)
+      builders (dict) - Maps architecture name to a function that builds the
+                        model (default: MODEL_BUILDERS)
+      on_evict (callable) - Called with the architecture name whenever a model
+                            is dropped from the registry (default: None)
+
+    Example:
+      >>> registry = ModelRegistry(memory_budget=300 * 1024 ** 2)
+      >>> model = registry['resnet']
+    """
+
+    def __init__(self, memory_budget=None, pretrained=True, builders=None,
+                 on_evict=None):
+        self.memory_budget = memory_budget
+        self.pretrained = pretrained
+        self.builders = dict(MODEL_BUILDERS if builders is None else builders)
+        self.on_evict = on_evict
+        self._loaded = OrderedDict()
+        self._sizes = {}
+
+    def __contains__(self, model_name):
+        return model_name in self._loaded
+
+    def __getitem__(self, model_name):
+        return self.get(model_name)
+
+    def __len__(self):
+        return len(self._loaded)
+
+    def loaded(self):
+        """Returns the names of the loaded models, least recently used first."""
+        return list(self._loaded)
+
+    def nbytes(self):
+        """Returns the total bytes of weights held by the loaded models."""
+        return sum(self._sizes.values())
+
+    def get(self, model_name):
+        """
+        Returns the model for model_name, building it if not already loaded.
+
+        Parameters:
+          model_name (str) - Architecture name, one of the builders' keys
+        Returns:
+          torch.nn.Module - The model for the requested architecture
+        """
+        if model_name in self._loaded:
+            self._loaded.move_to_end(model_name)
+            return self._loaded[model_name]
+
+        if model_name not in self.builders:
+            raise KeyError(f"Unknown model architecture: {model_name!r} "
+                           f"(expected one of {sorted(self.builders)})")
+
+        model = self.builders[model_name](pretrained=self.pretrained)
+        self._loaded[model_name] = model
+        self._sizes[model_name] = model_nbytes(model)
+        self._enforce_budget()
+        return model
+
+    def evict(self, model_name):
+        """Drops model_name from the registry if it is loaded."""
+        if self._loaded.pop(model_name, None) is not None:
+            self._sizes.pop(model_name, None)
+            if self.on_evict is not None:
+                self.on_evict(model_name)
+
+    def clear(self):
+        """Drops every loaded model."""
+        for model_name in list(self._loaded):
+            self.evict(model_name)
+
+    def _enforce_budget(self):
+        # Evict least-recently-used models (never the newest one) until the
+        # loaded weights fit within the memory budget
+        if self.memory_budget is None:
+            return
+        while len(self._loaded) > 1 and self.nbytes() > self.memory_budget:
+            oldest = next(iter(self._loaded))
+            self.evict(oldest)
+
+
+# Name under which classify_multi() returns the averaged-logits prediction
+ENSEMBLE = 'ensemble'
+
+# Inference sessions returned by get_session(), keyed by (architecture
+# name, precision, layout, calibration digest); the digest of the
+# calibration images is only set for 'int8-static'
+_sessions = {}
+
+
+def _drop_sessions(model_name):
+    # Drops every session built from model_name, whatever its precision
+    for key in [key for key in _sessions if key[0] == model_name]:
+        del _sessions[key]
+
+
+# Recorder of the per-image latencies of decoding, preprocessing and every
+# model's forward pass (a run_report.LatencyRecorder), set by check_images
+# for --timing-report; while it is None nothing is timed
+latency_recorder = None
+
+# Profiler stepped after every classification batch (a
+# profiling.BatchProfiler), set by check_images for --profile
+batch_profiler = None
+
+# Tracker of the peak memory growth of every classification batch (a
+# run_report.MemoryTracker), set by check_images for --memory-report
+memory_tracker = None
+
+# Registry of models used by classifier() - replaces the dict of all three
+# models that used to be built at import time. A session is dropped together
+# with its model so that eviction actually releases the weights.
+models = ModelRegistry(on_evict=_drop_sessions)
+
+# torch.inference_mode (PyTorch 1.9+) also skips the version counter and
+# view tracking that no_grad still pays for
+_inference_mode = getattr(torch, 'inference_mode', torch.no_grad)
+
+
+def artifact_path(model_name, artifact_dir=ARTIFACT_DIR):
+    """
+    Returns the path of the optimized artifact of model_name, keyed by the
+    torch and torchvision versions (which decide the pretrained weights) and
+    the input shape it was traced with.
+    """
+    name = (f"{model_name}-fp32-torch{torch.__version__}"
+            f"-torchvision{torchvision.__version__}-3x{CROP_SIZE}x{CROP_SIZE}")
+    return os.path.join(artifact_dir, name.replace('+', '_') + '.pt')
+
+
+def optimize_model(model_name, registry=None, artifact_dir=ARTIFACT_DIR):
+    """
+    Writes the frozen TorchScript inference artifact of model_name.
+
+    The model is traced on a single image and frozen: its weights become
+    constants and freezing folds every BatchNorm into the preceding
+    convolution (resnet18) and drops the training-only parts of the graph.
+    Conv+ReLU fusion is done when the artifact is loaded (see
+    load_artifact), because the oneDNN fused graph cannot be saved.
+
+    Parameters:
+      model_name (str) - CNN model architecture: 'resnet', 'alexnet' or 'vgg'
+      registry (ModelRegistry) - Registry to load the eager model from
+                                 (default: the module level registry)
+      artifact_dir (str) - Directory to write the artifact to
+                           (default: ARTIFACT_DIR)
+    Returns:
+      str - Path of the written artifact
+    """
+    registry = models if registry is None else registry
+    model = registry[model_name].eval()
+    example = torch.zeros(1, 3, CROP_SIZE, CROP_SIZE)
+    model_path = artifact_path(model_name, artifact_dir)
+    os.makedirs(artifact_dir, exist_ok=True)
+    tmp_path = f"{model_path}.{os.getpid()}.tmp"
+    # Newer torch versions warn that TorchScript is deprecated; it is still
+    # the format that loads without the Python model code
+    with warnings.catch_warnings(), _inference_mode():
+        warnings.simplefilter('ignore', FutureWarning)
+        frozen = torch.jit.freeze(torch.jit.trace(model, example))
+        torch.jit.save(frozen, tmp_path)
+    os.replace(tmp_path, model_path)
+    return model_path
+
+
+def load_artifact(model_name, artifact_dir=ARTIFACT_DIR):
+    """
+    Returns the optimized artifact of model_name ready for inference, or
+    None when optimize_model() has not written one for this torch version.
+
+    Loading runs torch.jit.optimize_for_inference, which fuses Conv+ReLU
+    (and Conv+Add+ReLU) and converts the convolutions to oneDNN where the
+    CPU supports it.
+    """
+    model_path = artifact_path(model_name, artifact_dir)
+    if not os.path.exists(model_path):
+        return None
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        return torch.jit.optimize_for_inference(torch.jit.load(model_path).eval())
+
+
+def bf16_supported():
+    """
+    Returns True when oneDNN can run bfloat16 kernels natively on this CPU
+    (AVX512-BF16 or AMX); elsewhere bf16 autocast would only be emulated.
+    """
+    if not torch.backends.mkldnn.is_available():
+        return False
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def calibration_digest(calibration_paths):
+    """
+    Returns a short digest of the contents of the calibration images, which
+    identifies a statically quantized model together with its architecture.
+    """
+    from prediction_cache import file_digest
+    digest = hashlib.sha256()
+    for path in calibration_paths:
+        digest.update(file_digest(path).encode())
+    return digest.hexdigest()[:16]
+
+
+def calibration_sample(img_paths, n_images):
+    """
+    Returns n_images paths spread evenly over img_paths (all of them when
+    there are fewer), used to calibrate static quantization.
+    """
+    img_paths = sorted(img_paths)
+    if len(img_paths) <= n_images:
+        return img_paths
+    step = len(img_paths) / n_images
+    return [img_paths[int(i * step)] for i in range(n_images)]
+
+
+def quantize_model(model, precision, calibration_paths=None, batch_size=32):
+    """
+    Returns an INT8 quantized copy of a float model for CPU inference.
+
+    'int8' applies dynamic quantization to the Linear layers: weights are
+    stored as int8 and activations are quantized on the fly, which mostly
+    speeds up the large classifier heads of alexnet and vgg. 'int8-static'
+    runs FX graph mode post-training quantization instead, which also
+    covers the conv layers; the activation ranges are calibrated by running
+    the calibration images through the model first.
+
+    Parameters:
+      model (torch.nn.Module) - Float model in evaluation mode, not modified
+      precision (str) - 'int8' or 'int8-static'
+      calibration_paths (list) - Images to calibrate with, required for
+                                 'int8-static' (default: None)
+      batch_size (int) - Number of calibration images per forward pass
+                         (default: 32)
+    Returns:
+      torch.nn.Module - The quantized model
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    # torch.ao.quantization warns that it is deprecated in favour of torchao,
+    # which is not a dependency of this project
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if precision == 'int8':
+            return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        if precision != 'int8-static':
+            raise ValueError(f"Unknown quantized precision: {precision!r}")
+        if not calibration_paths:
+            raise ValueError("int8-static quantization needs calibration images")
+
+        example = torch.zeros(1, 3, CROP_SIZE, CROP_SIZE)
+        qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+        prepared = prepare_fx(copy.deepcopy(model), qconfig_mapping, (example,))
+        with _inference_mode():
+            for start in range(0, len(calibration_paths), batch_size):
+                prepared(load_batch(calibration_paths[start:start + batch_size]))
+        return convert_fx(prepared)
+
+
+def load_quantized_model(model_name, precision, calibration_paths=None,
+                         registry=None, model_dir=QUANTIZED_MODEL_DIR):
+    """
+    Returns the quantized model of model_name, loading it from model_dir when
+    it has been quantized before and quantizing (and saving) it otherwise.
+
+    Saved models are TorchScript traces named after the architecture,
+    precision, torch version, quantization engine and - for 'int8-static' -
+    the calibration images, so a saved model is never used with a different
+    setup. Randomly initialized models are never saved.
+
+    Parameters:
+      model_name (str) - CNN model architecture: 'resnet', 'alexnet' or 'vgg'
+      precision (str) - 'int8' or 'int8-static'
+      calibration_paths (list) - Images to calibrate 'int8-static' with
+      registry (ModelRegistry) - Registry of the float models
+                                 (default: the module level registry)
+      model_dir (str) - Directory of saved quantized models
+                        (default: QUANTIZED_MODEL_DIR)
+    Returns:
+      torch.nn.Module - The quantized model, in evaluation mode
+    """
+    registry = models if registry is None else registry
+    engine = torch.backends.quantized.engine
+    name = f"{model_name}-{precision}-torch{torch.__version__}-{engine}"
+    if precision == 'int8-static' and calibration_paths:
+        name += '-' + calibration_digest(calibration_paths)
+    model_path = os.path.join(model_dir, name.replace('+', '_') + '.pt')
+
+    if registry.pretrained and os.path.exists(model_path):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', FutureWarning)
+            return torch.jit.load(model_path).eval()
+
+    model = registry[model_name].eval()
+    quantized = quantize_model(model, precision, calibration_paths).eval()
+    if registry.pretrained:
+        os.makedirs(model_dir, exist_ok=True)
+        example = torch.zeros(1, 3, CROP_SIZE, CROP_SIZE)
+        with warnings.catch_warnings(), _inference_mode():
+            warnings.simplefilter('ignore')
+            traced = torch.jit.freeze(torch.jit.trace(quantized, example))
+        tmp_path = f"{model_path}.{os.getpid()}.tmp"
+        torch.jit.save(traced, tmp_path)
+        os.replace(tmp_path, model_path)
+    return quantized
+
+
+class InferenceSession:
+    """
+    Holds one CNN model ready for repeated inference.
+
+    The model is put in evaluation mode and its parameters are frozen once,
+    the preprocessing pipeline is shared, and every forward pass runs under
+    torch.inference_mode so no autograd state is recorded. Optional warmup
+    passes on a blank batch pay the one-off allocation and kernel selection
+    costs before the first real image is classified. At fp32 the optimized
+    artifact written by optimize_model() is used instead of the eager model
+    whenever one exists for the pretrained weights; with an INT8 precision
+    the session runs a quantized copy of the model (see
+    load_quantized_model). With bf16 the forward pass runs under bfloat16
+    autocast, and the channels_last layout converts a copy of the model and
+    every input batch to NHWC. Both fall back to fp32 NCHW, with a warning,
+    on CPUs without oneDNN (bfloat16) support.
+
+    Parameters:
+      model_name (str) - CNN model architecture: 'resnet', 'alexnet' or 'vgg'
+      warmup (int) - Number of warmup forward passes to run (default: 1)
+      registry (ModelRegistry) - Registry to load the model from
+                                 (default: the module level registry)
+      precision (str) - One of PRECISIONS (default: 'fp32')
+      calibration_paths (list) - Images to calibrate 'int8-static' with
+                                 (default: None)
+      artifact_dir (str) - Directory of optimized artifacts, or None to always
+                           run the eager model (default: ARTIFACT_DIR)
+      layout (str) - One of LAYOUTS (default: 'nchw')
+
+    Example:
+      >>> session = InferenceSession('resnet')
+      >>> labels, class_ids = session.classify(['pet_images/Collie_03797.jpg'])
+    """
+
+    def __init__(self, model_name, warmup=1, registry=None, precision='fp32',
+                 calibration_paths=None, artifact_dir=ARTIFACT_DIR, layout='nchw'):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision!r} "
+                             f"(expected one of {list(PRECISIONS)})")
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout: {layout!r} "
+                             f"(expected one of {list(LAYOUTS)})")
+        if layout != 'nchw' and precision.startswith('int8'):
+            raise ValueError(f"The {layout} layout is not supported with {precision}")
+        if precision == 'bf16' and not bf16_supported():
+            warnings.warn("This CPU has no native bfloat16 support, running fp32 instead")
+            precision = 'fp32'
+        if layout == 'channels_last' and not torch.backends.mkldnn.is_available():
+            warnings.warn("oneDNN is not available, running the nchw layout instead")
+            layout = 'nchw'
+        self.model_name = model_name
+        self.precision = precision
+        self.layout = layout
+        self.registry = models if registry is None else registry
+        if precision.startswith('int8'):
+            self.model = load_quantized_model(model_name, precision,
+                                              calibration_paths, self.registry)
+        else:
+            # Artifacts are only written for the pretrained fp32 NCHW model
+            self.model = None
+            if self.registry.pretrained and artifact_dir and \
+                    precision == 'fp32' and layout == 'nchw':
+                self.model = load_artifact(model_name, artifact_dir)
+            if self.model is None:
+                self.model = self.registry[model_name]
+            # The registry's model is shared with other sessions, so only a
+            # copy is converted to channels_last
+            if layout == 'channels_last':
+                self.model = copy.deepcopy(self.model).to(memory_format=torch.channels_last)
+        self.model.eval()
+        for param in self.model.parameters():
+            param.requires_grad_(False)
+        self.preprocess = preprocess
+        self.imagenet_classes_dict = get_imagenet_classes()
+        self.warmup(warmup)
+
+    def warmup(self, n_passes=1, batch_size=1):
+        """Runs n_passes forward passes on a blank batch of batch_size images."""
+        if n_passes > 0:
+            blank = torch.zeros(batch_size, 3, CROP_SIZE, CROP_SIZE)
+            for _ in range(n_passes):
+                self.forward(blank)
+
+    def load(self, img_path, decode='full'):
+        """Returns the preprocessed (3, 224, 224) tensor for one image."""
+        return self.preprocess(decode_image(img_path, decode))
+
+    def forward(self, batch):
+        """Returns the fp32 model output for a (N, 3, 224, 224) batch tensor."""
+        if self.layout == 'channels_last':
+            batch = batch.contiguous(memory_format=torch.channels_last)
+        with _inference_mode():
+            if self.precision == 'bf16':
+                with torch.autocast('cpu', dtype=torch.bfloat16):
+                    return self.model(batch).float()
+            return self.model(batch)
+
+    def classify(self, img_paths, batch_size=32, cache=None, cache_keys=None,
+                 tensor_store=None, topk=None, decode='full'):
+        """
+        Classifies images, running one forward pass per batch_size images.
+
+        Parameters:
+          img_paths (list) - Paths of the images to classify
+          batch_size (int) - Number of images per forward pass (default: 32)
+          cache (PredictionCache) - When given, the class id and logits of
+                                    every image are stored in this cache
+                                    (default: None)
+          cache_keys (list) - Cache key of each image, required with cache
+          tensor_store (TensorStore) - Store holding the cropped images, read
+                                       instead of decoding them (default: None)
+          topk (int) - Also return the k most probable classes of every image
+                       (default: None)
+          decode (str) - How to decode the images, one of DECODE_MODES
+                         (default: 'full')
+        Returns:
+          labels (list) - ImageNet label (str) for each image, in input order
+          class_ids (list) - ImageNet class index (int) for each image
+          topk (tuple) - Only when topk is given: (class ids, probabilities)
+                         arrays of shape (N, k), most probable class first
+        """
+        if cache is not None:
+            cache_keys = {self.model_name: cache_keys}
+        predictions = _classify_sessions([self], img_paths, batch_size, cache,
+                                         cache_keys, tensor_store, topk=topk,
+                                         decode=decode)
+        if topk:
+            predictions, topk_predictions = predictions
+            return predictions[self.model_name] + (topk_predictions[self.model_name],)
+        return predictions[self.model_name]
+
+
+def load_batch(img_paths, tensor_store=None, decode='full'):
+    """
+    Returns the preprocessed (N, 3, 224, 224) batch tensor for img_paths,
+    read from tensor_store when given instead of decoding the images.
+    """
+    if latency_recorder is not None:
+        return _timed_load_batch(img_paths, tensor_store, decode)
+    if tensor_store is not None:
+        return normalize_batch(tensor_store.batch(img_paths))
+    return torch.stack([preprocess(decode_image(path, decode)) for path in img_paths])
+
+
+def _timed_load_batch(img_paths, tensor_store, decode):
+    # load_batch() recording the latency of every step in latency_recorder:
+    # reading the tensor store, or decoding and preprocessing each image
+    if tensor_store is not None:
+        start_time = perf_counter()
+        images = tensor_store.batch(img_paths)
+        latency_recorder.record('tensor_store', perf_counter() - start_time, len(img_paths))
+        start_time = perf_counter()
+        batch = normalize_batch(images)
+        latency_recorder.record('preprocess', perf_counter() - start_time, len(img_paths))
+        return batch
+    tensors = []
+    for path in img_paths:
+        start_time = perf_counter()
+        image = decode_image(path, decode)
+        decoded_time = perf_counter()
+        tensors.append(preprocess(image))
+        latency_recorder.record('decode', decoded_time - start_time)
+        latency_recorder.record('preprocess', perf_counter() - decoded_time)
+    return torch.stack(tensors)
+
+
+def topk_probabilities(logits, k):
+    """
+    Returns the k most probable classes of each row of logits.
+
+    The softmax and top-k selection run vectorized in torch, and only the
+    (N, k) result is converted to NumPy.
+
+    Parameters:
+      logits (torch.Tensor or numpy.ndarray) - Model output of shape (N, 1000)
+      k (int) - Number of classes to return per image
+    Returns:
+      class_ids (numpy.ndarray) - int64 array of shape (N, k), most probable first
+      probs (numpy.ndarray) - float32 softmax probabilities of shape (N, k)
+    """
+    if not isinstance(logits, torch.Tensor):
+        logits = torch.from_numpy(logits)
+    probs, class_ids = torch.softmax(logits.float(), dim=1).topk(k, dim=1)
+    return class_ids.numpy(), probs.numpy()
+
+
+def _classify_sessions(sessions, img_paths, batch_size, cache=None, cache_keys=None,
+                       tensor_store=None, ensemble=False, topk=None, decode='full',
+                       on_batch=None):
+    # Shared loop of InferenceSession.classify() and classify_multi(): each
+    # batch is decoded once and then passed through every session's model
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+
+    imagenet_classes_dict = get_imagenet_classes()
+    class_ids = {session.model_name: [] for session in sessions}
+    if ensemble:
+        class_ids[ENSEMBLE] = []
+    topk_parts = {name: [] for name in class_ids}
+    for start in range(0, len(img_paths), batch_size):
+        batch_paths = img_paths[start:start + batch_size]
+
+        # with --profile, the profiler records the first batches
+        if batch_profiler is not None:
+            batch_profiler.step()
+        if memory_tracker is not None:
+            memory_tracker.batch_start()
+
+        # preprocess every image of the batch and stack them along dim 0
+        batch = load_batch(batch_paths, tensor_store, decode)
+
+        # one forward pass for the whole batch per model
+        outputs = []
+        for session in sessions:
+            if latency_recorder is None:
+                output = session.forward(batch)
+            else:
+                start_time = perf_counter()
+                output = session.forward(batch)
+                latency_recorder.record(f"forward/{session.model_name}",
+                                        perf_counter() - start_time, len(batch))
+            batch_ids = output.argmax(dim=1).tolist()
+            class_ids[session.model_name].extend(batch_ids)
+            outputs.append(output)
+            if topk:
+                topk_parts[session.model_name].append(topk_probabilities(output, topk))
+
+            if cache is not None:
+                batch_keys = cache_keys[session.model_name][start:start + batch_size]
+                for key, class_id, logits in zip(batch_keys, batch_ids, output.numpy()):
+                    cache.put(key, class_id, logits)
+
+        # the ensemble prediction comes from the averaged logits
+        if ensemble:
+            averaged = torch.stack(outputs).mean(dim=0)
+            class_ids[ENSEMBLE].extend(averaged.argmax(dim=1).tolist())
+            if topk:
+                topk_parts[ENSEMBLE].append(topk_probabilities(averaged, topk))
+        if memory_tracker is not None:
+            memory_tracker.batch_end(len(batch_paths))
+
+        # report the batch's predictions as soon as they are known
+        if on_batch is not None:
+            on_batch(start, {name: ([imagenet_classes_dict[idx] for idx in ids[start:]],
+                                    ids[start:])
+                             for name, ids in class_ids.items()})
+
+    predictions = {name: ([imagenet_classes_dict[idx] for idx in ids], ids)
+                   for name, ids in class_ids.items()}
+    if not topk:
+        return predictions
+    topk_predictions = {name: _concat_topk(parts, topk)
+                        for name, parts in topk_parts.items()}
+    return predictions, topk_predictions
+
+
+def _concat_topk(parts, k):
+    # Joins per-batch (class ids, probabilities) arrays into one pair
+    if not parts:
+        return np.empty((0, k), dtype=np.int64), np.empty((0, k), dtype=np.float32)
+    return (np.concatenate([class_ids for class_ids, _ in parts]),
+            np.concatenate([probs for _, probs in parts]))
+
+
+def model_fingerprint(model_name, precision='fp32', calibration_paths=None,
+                      layout='nchw', decode='full'):
+    """
+    Returns a string identifying everything besides the image that decides
+    the prediction of model_name: architecture, weights, precision, torch
+    and torchvision versions and the decoding and preprocessing pipeline.
+    Used to key cached predictions.
+
+    Returns:
+      str - The fingerprint, or None when the registry builds randomly
+            initialized models whose predictions must not be cached
+    """
+    if not models.pretrained:
+        return None
+    fingerprint = (f"arch={model_name}|weights=imagenet|torch={torch.__version__}"
+                   f"|torchvision={torchvision.__version__}"
+                   f"|preprocess={preprocess_signature(decode)}")
+    if precision == 'fp32' and layout == 'nchw' and os.path.exists(artifact_path(model_name)):
+        fingerprint += "|artifact=optimized"
+    if layout != 'nchw':
+        fingerprint += f"|layout={layout}"
+    if precision == 'bf16':
+        fingerprint += "|precision=bf16"
+    elif precision != 'fp32':
+        fingerprint += f"|precision={precision}|engine={torch.backends.quantized.engine}"
+        if precision == 'int8-static':
+            fingerprint += f"|calibration={calibration_digest(calibration_paths)}"
+    return fingerprint
+
+
+def get_session(model_name, warmup=1, precision='fp32', calibration_paths=None,
+                layout='nchw'):
+    """
+    Returns the shared InferenceSession for model_name at precision and
+    layout, creating it (and running its warmup passes) on first use.
+    """
+    # A statically quantized model is only reused for the same calibration
+    # images, like its saved model and its cached predictions
+    calibration = calibration_digest(calibration_paths) \
+        if precision == 'int8-static' and calibration_paths else None
+    key = (model_name, precision, layout, calibration)
+    session = _sessions.get(key)
+    if session is None:
+        session = InferenceSession(model_name, warmup=warmup, precision=precision,
+                                   calibration_paths=calibration_paths, layout=layout)
+        _sessions[key] = session
+    return session
+
+
+def _tensor_nbytes(value):
+    # Bytes of the tensors in a state_dict value, which for quantized layers
+    # is a tuple of packed weight and bias tensors
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_nbytes(item) for item in value)
+    return 0
+
+
+def session_memory():
+    """
+    Returns the memory held by the model of every InferenceSession created
+    with get_session(). Sessions at fp32 NCHW share the registry's model.
+
+    Returns:
+      list - One dict per session with keys 'model', 'precision', 'layout',
+             'parameter_bytes', 'buffer_bytes' and 'state_bytes' (every
+             tensor of the state_dict, which also counts the packed weights
+             of quantized layers that are not parameters)
+    """
+    memory = []
+    for (model_name, precision, layout, _), session in _sessions.items():
+        memory.append({
+            'model': model_name, 'precision': precision, 'layout': layout,
+            'parameter_bytes': sum(_tensor_nbytes(t) for t in session.model.parameters()),
+            'buffer_bytes': sum(_tensor_nbytes(t) for t in session.model.buffers()),
+            'state_bytes': sum(_tensor_nbytes(value)
+                               for value in session.model.state_dict().values()),
+        })
+    return memory
 
-# obtain ImageNet labels
-with open('imagenet1000_clsid_to_human.txt') as imagenet_classes_file:
-    imagenet_classes_dict = ast.literal_eval(imagenet_classes_file.read())
 
 def classifier(img_path, model_name):
-    # load the image
-    img_pil = Image.open(img_path)
-
-    # define transforms
-    preprocess = transforms.Compose([
-        transforms.Resize(256),
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
-    
-    # preprocess the image
-    img_tensor = preprocess(img_pil)
-    
-    # resize the tensor (add dimension for batch)
-    img_tensor.unsqueeze_(0)
-    
-    # wrap input in variable, wrap input in variable - no longer needed for
-    # v 0.4 & higher code changed 04/26/2018 by Jennifer S. to handle PyTorch upgrade
-    pytorch_ver = __version__.split('.')
-    
-    # pytorch versions 0.4 & hihger - Variable depreciated so that it returns
-    # a tensor. So to address tensor as output (not wrapper) and to mimic the 
-    # affect of setting volatile = True (because we are using pretrained models
-    # for inference) we can set requires_gradient to False. Here we just set 
-    # requires_grad_ to False on our tensor 
-    if int(pytorch_ver[0]) > 0 or int(pytorch_ver[1]) >= 4:
-        img_tensor.requires_grad_(False)
-    
-    # pytorch versions less than 0.4 - uses Variable because not-depreciated
-    else:
-        # apply model to input
-        # wrap input in variable
-        data = Variable(img_tensor, volatile = True) 
-
-    # apply model to input
-    model = models[model_name]
-
-    # puts model in evaluation mode
-    # instead of (default)training mode
-    model = model.eval()
-    
-    # apply data to model - adjusted based upon version to account for 
-    # operating on a Tensor for version 0.4 & higher.
-    if int(pytorch_ver[0]) > 0 or int(pytorch_ver[1]) >= 4:
-        output = model(img_tensor)
-
-    # pytorch versions less than 0.4
-    else:
-        # apply data to model
-        output = model(data)
-
-    # return index corresponding to predicted class
-    pred_idx = output.data.numpy().argmax()
-
-    return imagenet_classes_dict[pred_idx]
+    """
+    Classifies one image and returns its ImageNet label.
+
+    Kept for compatibility - this is a thin wrapper around the shared
+    InferenceSession for model_name.
+
+    Parameters:
+      img_path (str) - Path of the image to classify
+      model_name (str) - CNN model architecture: 'resnet', 'alexnet' or 'vgg'
+    Returns:
+      str - ImageNet label of the predicted class
+    """
+    labels, _ = get_session(model_name).classify([img_path], batch_size=1)
+    return labels[0]
+
+
+def classify_batch(img_paths, model_name, batch_size=32, cache=None, cache_keys=None,
+                   tensor_store=None, topk=None, precision='fp32', calibration_paths=None,
+                   layout='nchw', decode='full'):
+    """
+    Classifies a list of images, running one forward pass per batch.
+
+    Each batch of images is preprocessed exactly like classifier() does,
+    stacked into a single (N, 3, 224, 224) tensor and passed through the
+    model at once, which makes much better use of the CPU than classifying
+    one image at a time.
+
+    Parameters:
+      img_paths (list) - Paths of the images to classify
+      model_name (str) - CNN model architecture: 'resnet', 'alexnet' or 'vgg'
+      batch_size (int) - Number of images per forward pass (default: 32)
+      cache (PredictionCache) - When given, every prediction is stored in this
+                                cache (default: None)
+      cache_keys (list) - Cache key of each image, required with cache
+      tensor_store (TensorStore) - Store holding the cropped images, read
+                                   instead of decoding them (default: None)
+      topk (int) - Also return the k most probable classes of every image,
+                   computed from the same forward pass (default: None)
+      precision (str) - One of PRECISIONS (default: 'fp32')
+      calibration_paths (list) - Images to calibrate 'int8-static' with
+                                 (default: None)
+      layout (str) - One of LAYOUTS (default: 'nchw')
+      decode (str) - How to decode the images, one of DECODE_MODES
+                     (default: 'full')
+    Returns:
+      labels (list) - ImageNet label (str) for each image, in input order
+      class_ids (list) - ImageNet class index (int) for each image, in input order
+      topk (tuple) - Only when topk is given: (class ids, probabilities)
+                     arrays of shape (N, k), most probable class first
+    """
+    session = get_session(model_name, precision=precision,
+                          calibration_paths=calibration_paths, layout=layout)
+    return session.classify(img_paths, batch_size, cache, cache_keys, tensor_store, topk,
+                            decode)
+
+
+def classify_multi(img_paths, model_names, batch_size=32, cache=None, cache_keys=None,
+                   tensor_store=None, ensemble=False, topk=None, precision='fp32',
+                   calibration_paths=None, layout='nchw', decode='full', on_batch=None,
+                   sessions=None):
+    """
+    Classifies a list of images with several architectures in one pass.
+
+    Every batch is decoded and preprocessed once and then fed to each of the
+    requested models. Optionally an ensemble prediction is made from the
+    logits of all models averaged together, at no extra decode cost.
+
+    Parameters:
+      img_paths (list) - Paths of the images to classify
+      model_names (list) - CNN model architectures, e.g. ['resnet', 'vgg']
+      batch_size (int) - Number of images per forward pass (default: 32)
+      cache (PredictionCache) - When given, every prediction is stored in this
+                                cache (default: None)
+      cache_keys (dict) - Maps each model name to the cache key of each image,
+                          required with cache
+      tensor_store (TensorStore) - Store holding the cropped images, read
+                                   instead of decoding them (default: None)
+      ensemble (bool) - Also return the averaged-logits prediction under the
+                        name ENSEMBLE (default: False)
+      topk (int) - Also return the k most probable classes of every image
+                   (default: None)
+      precision (str) - One of PRECISIONS (default: 'fp32')
+      calibration_paths (list) - Images to calibrate 'int8-static' with
+                                 (default: None)
+      layout (str) - One of LAYOUTS (default: 'nchw')
+      decode (str) - How to decode the images, one of DECODE_MODES
+                     (default: 'full')
+      on_batch (callable) - Called after every batch as on_batch(start,
+                            predictions), with the index of the batch's first
+                            image and its predictions in the format returned
+                            below (default: None)
+      sessions (list) - InferenceSessions of model_names, used instead of
+                        looking them up with get_session() (default: None)
+    Returns:
+      dict - Maps each model name (and ENSEMBLE) to a (labels, class_ids)
+             tuple of lists in input order
+      dict - Only when topk is given: maps each model name (and ENSEMBLE) to
+             a (class ids, probabilities) tuple of (N, k) arrays
+    """
+    if sessions is None:
+        sessions = [get_session(model_name, precision=precision,
+                                calibration_paths=calibration_paths, layout=layout)
+                    for model_name in model_names]
+    return _classify_sessions(sessions, img_paths, batch_size, cache, cache_keys,
+                              tensor_store, ensemble, topk, decode, on_batch)
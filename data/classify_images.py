@@ -20,8 +20,18 @@
 #           of the pet and classifier labels as the item at index 2 of the list.
 #
 ##
-# Imports classifier function for using CNN to classify images 
-from classifier import classifier 
+# Imports batched classifier function for using CNN to classify images 
+from itertools import islice
+
+import numpy as np
+
+from classifier import (ENSEMBLE, classify_multi, get_session, model_fingerprint,
+                        topk_probabilities)
+from imagenet_labels import get_imagenet_classes
+from parallel_classify import classify_parallel_multi
+from label_index import imagenet_label_index
+from prediction_cache import file_digest
+from results_table import ResultsTable
 
 # TODO 3: Define classify_images function below, specifically replace the None
 #       below by the function definition of the classify_images function. 
@@ -29,12 +39,18 @@ from classifier import classifier
 #       results_dic dictionary that is passed into the function is a mutable 
 #       data type so no return is needed.
 # 
-def classify_images(images_dir, results_dic, model):
+def classify_images(images_dir, results_dic, model, batch_size=32, workers=1,
+                    threads_per_worker=None, pin_cores=False, cache=None,
+                    tensor_store=None, topk=None, topk_dic=None, precision='fp32',
+                    calibration_paths=None, layout='nchw', decode='full',
+                    journal=None):
     """
     Classifies pet images using CNN model and compares results with true labels.
     
     This function processes each image in the results dictionary by:
-    1. Running the image through the specified CNN classifier
+    1. Looking up the image in the prediction cache (if given), otherwise
+       running it through the specified CNN classifier, batch_size images
+       per forward pass
     2. Normalizing the classifier output to match pet label format
     3. Comparing classifier label with the true pet label
     4. Extending the results dictionary with classification results
@@ -55,37 +71,346 @@ def classify_images(images_dir, results_dic, model):
                           EXTENDED BY THIS FUNCTION:
                             index 1 = classifier label (str)
                             index 2 = match indicator (int: 1=match, 0=no match)
+                          May also be a ResultsTable, whose classification
+                          columns (including the class ids) are set instead
       model (str) - CNN model architecture to use for classification
                    Valid values: 'resnet', 'alexnet', 'vgg'
+      batch_size (int) - Number of images classified per forward pass
+                        (default: 32)
+      workers (int) - Number of worker processes; with more than 1 worker the
+                     images are classified in parallel, each worker owning
+                     its own copy of the model (default: 1)
+      threads_per_worker (int) - Intra-op threads per worker process
+                                (default: cores divided evenly between workers)
+      pin_cores (bool) - Pin each worker process to its own set of cores
+                        (default: False)
+      cache (PredictionCache) - Cache of earlier predictions; images found in
+                               it are not run through the model and new
+                               predictions are added to it (default: None)
+      tensor_store (TensorStore) - Memory-mapped store of preprocessed images;
+                                  images missing from it are added, and the
+                                  model reads its input from the store
+                                  (default: None)
+      topk (int) - Number of most probable classes to record per image; they
+                  come from the same forward pass (default: None)
+      topk_dic (dict) - Filled in when topk is given, with structure:
+                       Key: image filename (str)
+                       Value: list where:
+                         index 0 = top-k ImageNet class ids (list of int)
+                         index 1 = their softmax probabilities (list of float)
+                         index 2 = top-k match indicator (int: 1=the pet label
+                                   matches any of the k classes, 0=no match)
+      precision (str) - Numeric precision of the models: 'fp32', 'int8'
+                       and 'int8-static' for quantized CPU inference or
+                       'bf16' for bfloat16 autocast (default: 'fp32')
+      calibration_paths (list) - Sample images to calibrate 'int8-static'
+                                quantization with (default: None)
+      layout (str) - Memory layout of the models and input batches: 'nchw'
+                    or 'channels_last' (default: 'nchw')
+      decode (str) - How images are decoded: 'full', or 'draft' to let the
+                    JPEG decoder reduce the resolution (default: 'full')
+      journal (RunJournal) - Run journal; images it already holds are not
+                            classified again and every new result is
+                            appended to it as its batch completes
+                            (default: None)
     
     Returns:
-      None - Modifies results_dic in place (mutable data type)
+      list - Per-worker statistics from classify_parallel() when workers > 1,
+             otherwise None. results_dic is modified in place (mutable data type)
       
     Note:
-      This function uses the classifier() function from classifier.py.
-      See test_classifier.py for proper usage examples.
+      This function uses the classify_multi() function from classifier.py,
+      the batched, multi-model counterpart of classifier() (see
+      test_classifier.py).
     """
-    # Process each image in the results dictionary
-    for filename in results_dic:
-        # Step 1: Run CNN classifier on image
-        # Construct full image path and get classifier prediction
-        full_image_path = images_dir + filename
-        classifier_label = classifier(full_image_path, model)
+    return classify_images_multi(images_dir, {model: results_dic}, [model],
+                                 batch_size, workers, threads_per_worker,
+                                 pin_cores, cache, tensor_store, topk,
+                                 {model: topk_dic} if topk else None,
+                                 precision, calibration_paths, layout, decode,
+                                 journal)
 
-        # Step 2: Normalize classifier label (lowercase and strip whitespace)
-        classifier_label = classifier_label.lower().strip()
 
-        # Step 3: Get the true pet label from results dictionary
-        pet_label = results_dic[filename][0]
+def classify_images_multi(images_dir, results_dics, models, batch_size=32, workers=1,
+                          threads_per_worker=None, pin_cores=False, cache=None,
+                          tensor_store=None, topk=None, topk_dics=None,
+                          precision='fp32', calibration_paths=None, layout='nchw',
+                          decode='full', journal=None):
+    """
+    Classifies pet images with several CNN models in a single pass.
+
+    Works like classify_images(), but every batch of images is decoded and
+    preprocessed once and then fed to each of the models, filling in one
+    results dictionary per model. If results_dics also has an ENSEMBLE
+    ('ensemble') entry, it is filled in from the averaged logits of all the
+    models, which costs no extra decoding.
+
+    Parameters:
+      images_dir (str) - Full path to folder containing images to classify
+                        (must include trailing slash)
+      results_dics (dict) - Maps each model name (and optionally 'ensemble')
+                           to its own results dictionary, as described for
+                           classify_images(); all must have the same keys
+      models (list) - CNN model architectures to use, e.g. ['resnet', 'vgg']
+      (batch_size, workers, threads_per_worker, pin_cores, cache,
+       tensor_store, topk, precision, calibration_paths, layout, decode and
+       journal as for classify_images)
+      topk_dics (dict) - With topk, maps each name of results_dics to the
+                        top-k dictionary to fill in (see classify_images)
+    
+    Returns:
+      list - Per-worker statistics from classify_parallel_multi() when
+             workers > 1, otherwise None. Every results dictionary is
+             modified in place (mutable data type)
+    """
+    fingerprints = _cache_fingerprints(cache, models, precision, calibration_paths,
+                                       layout, decode)
+    # Filename order keeps the merge of worker results deterministic
+    first_dic = results_dics[models[0]]
+    filenames = sorted(first_dic) if workers > 1 else list(first_dic)
+    return _classify_filenames(images_dir, results_dics, models, filenames, batch_size,
+                               workers, threads_per_worker, pin_cores, cache, fingerprints,
+                               tensor_store, topk, topk_dics, precision, calibration_paths,
+                               layout, decode, journal)
+
+
+def classify_images_stream(images_dir, records, model, batch_size=32, cache=None,
+                           precision='fp32', calibration_paths=None, layout='nchw',
+                           decode='full', journal=None, tensor_store=None):
+    """
+    Classifies a stream of pet images, yielding each image's results as soon
+    as its batch has been classified.
+
+    The streaming counterpart of classify_images(): records are read
+    batch_size at a time and every batch goes through the same steps as in
+    classify_images() (journal, cache, tensor store and model), so memory
+    use is bounded by the batch size rather than the number of images.
+    Classification runs in this process.
+
+    Parameters:
+      images_dir (str) - Full path to folder containing images to classify
+                        (must include trailing slash)
+      records (iterable) - (filename, [pet label]) tuples, e.g. from
+                          get_pet_labels.iter_pet_labels()
+      model (str) - CNN model architecture: 'resnet', 'alexnet' or 'vgg'
+      (batch_size, cache, precision, calibration_paths, layout, decode,
+       journal and tensor_store as for classify_images)
+    Yields:
+      tuple - (filename, results list) with the classifier label (index 1)
+              and match indicator (index 2) added, in input order
+    """
+    # The session and the model's cache fingerprint are set up once for the
+    # whole stream; each batch only looks up, classifies and journals its
+    # own images
+    sessions = [get_session(model, precision=precision, calibration_paths=calibration_paths,
+                            layout=layout)]
+    fingerprints = _cache_fingerprints(cache, [model], precision, calibration_paths,
+                                       layout, decode)
 
-        # Step 4: Parse classifier label into individual terms
-        # Classifier may return multiple breed names separated by commas
-        classifier_terms = [term.strip() for term in classifier_label.split(",")]
+    records = iter(records)
+    while True:
+        batch_dic = dict(islice(records, batch_size))
+        if not batch_dic:
+            return
+        _classify_filenames(images_dir, {model: batch_dic}, [model], list(batch_dic),
+                            batch_size, cache=cache, fingerprints=fingerprints,
+                            tensor_store=tensor_store, precision=precision,
+                            calibration_paths=calibration_paths, layout=layout,
+                            decode=decode, journal=journal, sessions=sessions)
+        yield from batch_dic.items()
 
-        # Step 5: Compare pet label with classifier terms
-        # Match = 1 if pet label found in any classifier term, otherwise 0
-        is_match = 1 if pet_label in classifier_terms else 0
 
-        # Step 6: Extend results dictionary with classifier results
+def _cache_fingerprints(cache, models, precision, calibration_paths, layout, decode):
+    # Fingerprint of every model for the prediction cache keys, or None when
+    # the cache is not used: without a cache, or when predictions of
+    # randomly initialized models (which have no fingerprint) would be cached
+    if cache is None:
+        return None
+    fingerprints = {model: model_fingerprint(model, precision, calibration_paths,
+                                             layout, decode)
+                    for model in models}
+    return None if None in fingerprints.values() else fingerprints
+
+
+def _classify_filenames(images_dir, results_dics, models, filenames, batch_size=32,
+                        workers=1, threads_per_worker=None, pin_cores=False, cache=None,
+                        fingerprints=None, tensor_store=None, topk=None, topk_dics=None,
+                        precision='fp32', calibration_paths=None, layout='nchw',
+                        decode='full', journal=None, sessions=None):
+    # Shared steps of classify_images_multi() and classify_images_stream():
+    # classifies the images filenames (keys of every results dictionary)
+    # and extends their results. The cache is only used with the
+    # fingerprints of _cache_fingerprints(); sessions are the in-process
+    # InferenceSessions of models when they have been set up already.
+    # Returns the per-worker statistics when workers > 1, otherwise None
+    ensemble = ENSEMBLE in results_dics
+    names = list(models) + ([ENSEMBLE] if ensemble else [])
+    first_dic = results_dics[models[0]]
+    full_image_paths = [images_dir + filename for filename in filenames]
+    class_ids = {name: [None] * len(filenames) for name in names}
+    if topk:
+        topk_ids = {name: np.zeros((len(filenames), topk), dtype=np.int64)
+                    for name in names}
+        topk_probs = {name: np.zeros((len(filenames), topk), dtype=np.float32)
+                      for name in names}
+
+    # Step 0: Reuse the results of images journaled before the run was
+    # interrupted - again only when every model's result is journaled
+    if journal is None:
+        todo = range(len(filenames))
+    else:
+        journaled = {name: journal.lookup(name, filenames) for name in names}
+        todo = []
+        for index, filename in enumerate(filenames):
+            if all(filename in journaled[name] for name in names):
+                for name in names:
+                    class_ids[name][index] = journaled[name][filename][0]
+            else:
+                todo.append(index)
+
+    # Step 1: Look up predictions of unchanged images in the cache - an image
+    # is only served from the cache when every model has a cached prediction
+    if fingerprints is None:
+        cache = None
+        cache_keys = None
+        pending = list(todo)
+    else:
+        cache_keys = {model: [None] * len(filenames) for model in models}
+        for index in todo:
+            digest = file_digest(full_image_paths[index])
+            for model in models:
+                cache_keys[model][index] = cache.key(digest, fingerprints[model])
+        pending = []
+        hits = []
+        hit_logits = {name: [] for name in names}
+        for index in todo:
+            cached = [cache.get(cache_keys[model][index]) for model in models]
+            if None in cached:
+                pending.append(index)
+                continue
+            hits.append(index)
+            for model, (class_id, logits) in zip(models, cached):
+                class_ids[model][index] = class_id
+                hit_logits[model].append(logits)
+            if ensemble:
+                averaged = np.mean([logits for _, logits in cached], axis=0)
+                class_ids[ENSEMBLE][index] = int(averaged.argmax())
+                hit_logits[ENSEMBLE].append(averaged)
+
+        # Cached results go into the journal like freshly classified ones
+        if journal is not None and hits:
+            imagenet_classes_dict = get_imagenet_classes()
+            hit_ids = {name: [class_ids[name][index] for index in hits] for name in names}
+            _journal_results(journal, first_dic, filenames, hits,
+                             {name: ([imagenet_classes_dict[class_id] for class_id in ids], ids)
+                              for name, ids in hit_ids.items()})
+
+        # Top-k classes of cached images come from their cached logits
+        if topk and hits:
+            for name in names:
+                topk_ids[name][hits], topk_probs[name][hits] = \
+                    topk_probabilities(np.stack(hit_logits[name]), topk)
+
+    # Step 2: Run CNN classifiers on the remaining images, batch_size images
+    # at a time, across worker processes when workers > 1
+    pending_paths = [full_image_paths[index] for index in pending]
+    pending_keys = None
+    if cache is not None:
+        pending_keys = {model: [keys[index] for index in pending]
+                        for model, keys in cache_keys.items()}
+    if tensor_store is not None:
+        tensor_store.add(pending_paths)
+    # Results are journaled batch by batch, as soon as they are known
+    on_batch = None
+    if journal is not None:
+        def on_batch(start, batch_predictions):
+            n_images = len(next(iter(batch_predictions.values()))[1])
+            _journal_results(journal, first_dic, filenames,
+                             pending[start:start + n_images], batch_predictions)
+    worker_stats = None
+    topk_predictions = None
+    if not pending:
+        predictions = {name: ([], []) for name in names}
+    elif workers > 1:
+        predictions, topk_predictions, worker_stats = classify_parallel_multi(
+            pending_paths, models, workers, batch_size,
+            threads_per_worker=threads_per_worker, pin_cores=pin_cores,
+            cache=cache, cache_keys=pending_keys, tensor_store=tensor_store,
+            ensemble=ensemble, topk=topk, precision=precision,
+            calibration_paths=calibration_paths, layout=layout, decode=decode,
+            on_batch=on_batch)
+    else:
+        predictions = classify_multi(pending_paths, models, batch_size, cache,
+                                     pending_keys, tensor_store, ensemble, topk,
+                                     precision, calibration_paths, layout, decode,
+                                     on_batch, sessions)
+        if topk:
+            predictions, topk_predictions = predictions
+    for name in names:
+        for index, class_id in zip(pending, predictions[name][1]):
+            class_ids[name][index] = class_id
+        if topk_predictions is not None:
+            topk_ids[name][pending], topk_probs[name][pending] = topk_predictions[name]
+
+    # Compare the labels of each model with the pet labels
+    for name in names:
+        _extend_results(results_dics[name], filenames, class_ids[name])
+        if topk:
+            _fill_topk(topk_dics[name], results_dics[name], filenames,
+                       topk_ids[name], topk_probs[name])
+
+    return worker_stats
+
+
+def _extend_results(results_dic, filenames, class_ids):
+    # Adds the classifier label and label match to each image's results
+    # Each pet label is resolved once to the class ids whose terms it
+    # matches (see label_index.py), so matching is an integer test
+    index = imagenet_label_index()
+
+    # A ResultsTable sets them for all images at once
+    if isinstance(results_dic, ResultsTable):
+        results_dic.set_classifications(filenames, class_ids, index.class_labels,
+                                        index.classes_for)
+        return
+    for filename, class_id in zip(filenames, class_ids):
+        # Step 3: Normalized classifier label (lowercase and stripped) of
+        # the predicted class
+        classifier_label = index.class_labels[class_id]
+
+        # Step 4: Get the true pet label from results dictionary
+        pet_label = results_dic[filename][0]
+
+        # Steps 5 and 6: Match = 1 if pet label is one of the classifier
+        # label's comma-separated terms, i.e. the predicted class is one
+        # of the classes the pet label resolves to, otherwise 0
+        is_match = 1 if class_id in index.classes_for(pet_label) else 0
+
+        # Step 7: Extend results dictionary with classifier results
         # Adds [classifier_label, is_match] to the existing list
-        results_dic[filename].extend([classifier_label, is_match]) 
\ No newline at end of file
+        results_dic[filename].extend([classifier_label, is_match])
+
+
+def _journal_results(journal, results_dic, filenames, indices, predictions):
+    # Appends the predictions of the images at indices (in filenames) to the
+    # run journal, one row per image and model
+    label_index = imagenet_label_index()
+    for name, (labels, class_ids) in predictions.items():
+        rows = []
+        for index, label, class_id in zip(indices, labels, class_ids):
+            filename = filenames[index]
+            pet_label = results_dic[filename][0]
+            rows.append((filename, pet_label, class_id, label,
+                         1 if class_id in label_index.classes_for(pet_label) else 0))
+        journal.record(name, rows)
+
+
+def _fill_topk(topk_dic, results_dic, filenames, topk_ids, topk_probs):
+    # Records each image's top-k classes and whether the pet label matches
+    # any of them (with the same term matching as the top-1 label)
+    index = imagenet_label_index()
+    for filename, class_ids, probs in zip(filenames, topk_ids.tolist(),
+                                          topk_probs.tolist()):
+        pet_label = results_dic[filename][0]
+        is_match = 0 if index.classes_for(pet_label).isdisjoint(class_ids) else 1
+        topk_dic[filename] = [class_ids, probs, is_match]
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/compare_decode.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Compares the reduced-resolution JPEG decode path ('draft', see
+#          classifier.decode_image) with the full decode on a folder of
+#          images. Reports the time spent decoding and preprocessing every
+#          image with each path, and for each architecture the rate at which
+#          both paths lead to the same predicted label.
+#
+#   Example call:
+#    python compare_decode.py --dir uploaded_images/ --arch all
+##
+# Imports python modules
+import argparse
+import os
+from time import time
+
+import torch
+
+# Imports functions created for this program
+from classifier import DECODE_MODES, decode_image, get_session, preprocess
+from get_input_args import arch_list, positive_int
+from image_discovery import discover_images
+
+
+def decode_all(img_paths, decode):
+    """
+    Decodes and preprocesses every image with the given decode mode.
+
+    Returns:
+      batch (torch.Tensor) - (N, 3, 224, 224) tensor of all images
+      seconds (float) - Time spent decoding and preprocessing
+    """
+    start_time = time()
+    tensors = [preprocess(decode_image(path, decode)) for path in img_paths]
+    return torch.stack(tensors), time() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare reduced-resolution JPEG decoding with full decoding'
+    )
+    parser.add_argument('--dir', type=str, default='pet_images/',
+                        help='Path to folder of images to decode')
+    parser.add_argument('--arch', type=arch_list, default='all',
+                        help="CNN model architecture(s), e.g. 'vgg', 'resnet,vgg' or 'all'")
+    parser.add_argument('--batch-size', type=positive_int, default=32,
+                        help='Number of images per forward pass')
+    args = parser.parse_args()
+
+    # The same images check_images.py would classify (see image_discovery)
+    img_paths = [os.path.join(args.dir, name) for name in sorted(discover_images(args.dir))]
+    if not img_paths:
+        parser.error(f"no images found in {args.dir}")
+    batches = {}
+    seconds = {}
+    for decode in DECODE_MODES:
+        batches[decode], seconds[decode] = decode_all(img_paths, decode)
+
+    print("\n" + "="*50)
+    print(f"*** Decode Comparison: {len(img_paths)} images ***")
+    print("="*50)
+    for decode in DECODE_MODES:
+        print(f"{decode.capitalize() + ' Decode Time:':<35}{seconds[decode]:>13.2f}s")
+    saved = seconds['full'] - seconds['draft']
+    pct_saved = saved / seconds['full'] * 100.0 if seconds['full'] > 0 else 0.0
+    print(f"{'Time Saved:':<35}{saved:>13.2f}s ({pct_saved:.1f}%)")
+
+    for model_name in args.arch.split(','):
+        session = get_session(model_name)
+        class_ids = {}
+        for decode, batch in batches.items():
+            class_ids[decode] = torch.cat([
+                session.forward(batch[start:start + args.batch_size]).argmax(dim=1)
+                for start in range(0, len(batch), args.batch_size)])
+        agreement = (class_ids['full'] == class_ids['draft']).float().mean().item()
+        print(f"{model_name.upper() + ' Prediction Agreement:':<35}{agreement * 100.0:>13.1f}%")
+    print("="*50)
+
+
+# Call to main function to run the program
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,93 @@
 # PROGRAMMER: Pyae Linn
 # DATE CREATED: 30/09/25                                  
 # REVISED DATE: 
-# PURPOSE: Retrieves 3 command line inputs from user using argparse.
+# PURPOSE: Retrieves command line inputs from user using argparse.
 #          If user doesn’t provide inputs, defaults are used:
 #            1. --dir with default value 'pet_images/'
-#            2. --arch with default value 'vgg'
+#            2. --arch with default value 'vgg' (a comma-separated list or
+#               'all' runs several architectures in one pass)
 #            3. --dogfile with default value 'dognames.txt'
+#            4. --batch-size with default value 32
+#            5. --workers with default value 1
+#            6. --threads-per-worker with default of cores divided by workers
+#            7. --pin-cores (flag, off by default)
+#            8. --cache-dir with default value '.prediction_cache'
+#            9. --cache-size-mb with default value 512
+#           10. --no-cache (flag, off by default)
+#           11. --tensor-store with no default (store disabled)
+#           12. --ensemble (flag, off by default)
+#           13. --topk with no default (top-k reporting disabled)
+#           14. --precision with default value 'fp32'
+#           15. --calibration-images with default value 32
+#           16. --compare-fp32 (flag, off by default)
+#           17. --layout with default value 'nchw'
+#           18. --decode with default value 'full'
+#           19. --stream (flag, off by default)
+#           20. --recursive (flag, off by default)
+#           21. --filelist with no default (the folder is scanned)
+#           22. --check-magic (flag, off by default)
+#           23. --scan-threads with default value 1
+#           24. --journal (flag, off by default)
+#           25. --resume with no default (a new run is started)
+#           26. --journal-path with default value '.run_journal.sqlite'
+#           27. --breed-stats (flag, off by default)
+#           28. --label-index (flag, off by default)
+#           29. --startup-report (flag, off by default)
+#           30. --timing-report with no default (no run report is written)
+#           31. --profile (flag, off by default)
+#           32. --profile-dir with default value '.profile'
+#           33. --profile-batches with default value 5
+#           34. --memory-report (flag, off by default)
+#           35. --tracemalloc with no default (tracemalloc off)
 #
 ##
 import argparse
+import os
+
+# CNN model architectures supported by classifier.py
+ARCHITECTURES = ['resnet', 'alexnet', 'vgg']
+
+# Numeric precisions supported by classifier.py (classifier.PRECISIONS)
+PRECISIONS = ['fp32', 'int8', 'int8-static', 'bf16']
+
+# Memory layouts supported by classifier.py (classifier.LAYOUTS)
+LAYOUTS = ['nchw', 'channels_last']
+
+# Image decode modes supported by classifier.py (classifier.DECODE_MODES)
+DECODE_MODES = ['full', 'draft']
+
+def arch_list(value):
+    """
+    argparse type for --arch: one architecture, a comma-separated list of
+    architectures or 'all'. Returns the architectures as a comma-separated
+    string without duplicates, e.g. 'resnet,alexnet,vgg' for 'all'.
+    """
+    if value == 'all':
+        return ','.join(ARCHITECTURES)
+    names = []
+    for name in value.split(','):
+        name = name.strip()
+        if name not in ARCHITECTURES:
+            raise argparse.ArgumentTypeError(
+                f"invalid architecture {name!r} (choose from "
+                f"{', '.join(ARCHITECTURES)} or all)")
+        if name not in names:
+            names.append(name)
+    return ','.join(names)
+
+def positive_int(value):
+    """
+    argparse type for options that must be an integer of at least 1.
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
 
 def get_input_args():
     """
-    Retrieves and parses 3 command line arguments from user for dog image classification.
+    Retrieves and parses command line arguments from user for dog image classification.
     
     This function uses argparse to handle command line arguments with sensible defaults.
     The arguments control which images to classify, which CNN model to use, and which
@@ -24,13 +99,98 @@ def get_input_args():
     
     Command Line Arguments:
       --dir     : Path to folder containing pet images (default: 'pet_images/')
-      --arch    : CNN model architecture to use (default: 'vgg')
-                  Valid options: 'resnet', 'alexnet', 'vgg'
+      --arch    : CNN model architecture(s) to use (default: 'vgg')
+                  Valid options: 'resnet', 'alexnet', 'vgg', a comma-separated
+                  list of these (e.g. 'resnet,vgg') or 'all'
       --dogfile : Text file with valid dog breed names (default: 'dognames.txt')
+      --batch-size : Number of images per CNN forward pass (default: 32)
+      --workers : Number of classification worker processes (default: 1)
+      --threads-per-worker : Intra-op threads per worker process
+                  (default: available cores divided evenly between workers)
+      --pin-cores : Pin each worker process to its own set of cores
+      --cache-dir : Directory of the persistent prediction cache
+                  (default: '.prediction_cache')
+      --cache-size-mb : Size limit of the prediction cache in MiB (default: 512)
+      --no-cache : Always run the model, without reading or writing the cache
+      --tensor-store : Path prefix of a memory-mapped store of preprocessed
+                  images shared between architectures (default: none)
+      --ensemble : With several architectures, also report an ensemble that
+                  classifies from the averaged logits of all of them
+      --topk    : Also report how often the pet label is among the k most
+                  probable classes (default: not reported)
+      --precision : Numeric precision of the models (default: 'fp32')
+                  Valid options: 'fp32', 'int8' (dynamically quantized Linear
+                  layers), 'int8-static' (also statically quantized conv
+                  layers, calibrated on images from --dir) or 'bf16'
+                  (bfloat16 autocast, fp32 on CPUs without support)
+      --calibration-images : Number of images from --dir used to calibrate
+                  'int8-static' (default: 32)
+      --compare-fp32 : With a precision other than fp32 or the channels_last
+                  layout, also run the fp32 NCHW models on the same images
+                  and compare accuracy, speed and prediction agreement
+      --layout  : Memory layout of models and input batches (default: 'nchw')
+                  Valid options: 'nchw' or 'channels_last'
+      --decode  : How images are decoded (default: 'full')
+                  Valid options: 'full' or 'draft' (JPEGs are decoded at the
+                  smallest reduced resolution still large enough to resize)
+      --stream  : Stream the images through every step one batch at a time,
+                  printing misclassifications as they are found; memory use
+                  stays flat however many images there are (one architecture,
+                  in-process classification only)
+      --recursive : Also classify images in subfolders of --dir
+      --filelist : File listing the images (relative to --dir, one per
+                  line) to classify instead of scanning --dir
+      --check-magic : Skip files whose contents do not start with a known
+                  image signature
+      --scan-threads : Number of subfolders scanned concurrently with
+                  --recursive (default: 1)
+      --journal : Record every image's results in a run journal as its
+                  batch completes, so that an interrupted run can be resumed
+      --resume  : Id of an interrupted journaled run to continue; images it
+                  already journaled are not classified again (implies
+                  --journal)
+      --journal-path : SQLite database holding the run journals
+                  (default: '.run_journal.sqlite')
+      --breed-stats : Also print the precision and recall of every dog
+                  breed for each model
+      --label-index : Print the ImageNet class ids every pet label resolves
+                  to, listing the labels that match no class
+      --startup-report : Print how long each startup phase and the slowest
+                  module imports took, like python -X importtime
+      --timing-report : JSON file to write a run report to, with the wall
+                  and CPU time of every stage, p50/p95/p99 per-image decode,
+                  preprocess and forward latencies, throughput and a
+                  manifest of the run's settings
+      --profile : Profile the run: the first --profile-batches batches with
+                  torch.profiler (Chrome trace and operator tables) and the
+                  Python side with cProfile (in-process classification only)
+      --profile-dir : Directory the profiles are written to
+                  (default: '.profile')
+      --profile-batches : Number of batches recorded by torch.profiler
+                  (default: 5)
+      --memory-report : Record the RSS before and after and the peak RSS of
+                  every stage, the memory of every loaded model and the peak
+                  memory growth of every batch; printed, and added to the
+                  --timing-report
+      --tracemalloc : Also record the top N tracemalloc allocation sites at
+                  the end of every stage (implies --memory-report)
     
     Returns:
       argparse.Namespace - Object containing parsed command line arguments with attributes:
-                          .dir (str), .arch (str), .dogfile (str)
+                          .dir (str), .arch (str), .dogfile (str), .batch_size (int),
+                          .workers (int), .threads_per_worker (int), .pin_cores (bool),
+                          .cache_dir (str), .cache_size_mb (int), .no_cache (bool),
+                          .tensor_store (str), .ensemble (bool), .topk (int),
+                          .precision (str), .calibration_images (int),
+                          .compare_fp32 (bool), .layout (str), .decode (str),
+                          .stream (bool), .recursive (bool), .filelist (str),
+                          .check_magic (bool), .scan_threads (int),
+                          .journal (bool), .resume (str), .journal_path (str),
+                          .breed_stats (bool), .label_index (bool),
+                          .startup_report (bool), .timing_report (str),
+                          .profile (bool), .profile_dir (str),
+                          .profile_batches (int), .memory_report (bool),
+                          .tracemalloc (int)
     
     Example Usage:
       python check_images.py --dir pet_images/ --arch vgg --dogfile dognames.txt
@@ -48,13 +208,14 @@ def get_input_args():
         help='Path to folder of images to classify'
     )
 
-    # Argument 2: CNN model architecture
+    # Argument 2: CNN model architecture(s)
     parser.add_argument(
         '--arch', 
-        type=str, 
+        type=arch_list, 
         default='vgg',
-        choices=['resnet', 'alexnet', 'vgg'],
-        help='CNN model architecture: resnet, alexnet, or vgg (default: vgg)'
+        help='CNN model architecture: resnet, alexnet, or vgg (default: vgg); '
+             'a comma-separated list or all classifies with several '
+             'architectures in a single pass'
     )
 
     # Argument 3: Dog names file
@@ -65,5 +226,287 @@ def get_input_args():
         help='Text file containing valid dog breed names (one per line)'
     )
 
+    # Argument 4: Inference batch size
+    parser.add_argument(
+        '--batch-size', 
+        type=positive_int, 
+        default=32,
+        help='Number of images classified per CNN forward pass (default: 32)'
+    )
+
+    # Argument 5: Number of worker processes
+    parser.add_argument(
+        '--workers', 
+        type=positive_int, 
+        default=1,
+        help='Number of worker processes, each with its own model (default: 1)'
+    )
+
+    # Argument 6: Threads per worker process
+    parser.add_argument(
+        '--threads-per-worker', 
+        type=positive_int, 
+        default=None,
+        help='Intra-op threads per worker process '
+             '(default: available cores divided evenly between workers)'
+    )
+
+    # Argument 7: Pin worker processes to cores
+    parser.add_argument(
+        '--pin-cores', 
+        action='store_true',
+        help='Pin each worker process to its own set of CPU cores'
+    )
+
+    # Argument 8: Prediction cache directory
+    parser.add_argument(
+        '--cache-dir', 
+        type=str, 
+        default='.prediction_cache',
+        help='Directory of the persistent prediction cache '
+             '(default: .prediction_cache)'
+    )
+
+    # Argument 9: Prediction cache size limit
+    parser.add_argument(
+        '--cache-size-mb', 
+        type=positive_int, 
+        default=512,
+        help='Size limit of the prediction cache in MiB (default: 512)'
+    )
+
+    # Argument 10: Disable the prediction cache
+    parser.add_argument(
+        '--no-cache', 
+        action='store_true',
+        help='Run the model on every image without using the prediction cache'
+    )
+
+    # Argument 11: Preprocessed image store
+    parser.add_argument(
+        '--tensor-store', 
+        type=str, 
+        default=None,
+        help='Path prefix of a memory-mapped store of preprocessed images, '
+             'built on first use and shared between architectures'
+    )
+
+    # Argument 12: Averaged-logits ensemble of several architectures
+    parser.add_argument(
+        '--ensemble', 
+        action='store_true',
+        help='With several architectures, also report the ensemble prediction '
+             'from their averaged logits'
+    )
+
+    # Argument 13: Top-k match reporting
+    parser.add_argument(
+        '--topk', 
+        type=positive_int, 
+        default=None,
+        help='Also report top-k match rates, e.g. --topk 5 for top-5 breed accuracy'
+    )
+
+    # Argument 14: Numeric precision of the models
+    parser.add_argument(
+        '--precision', 
+        type=str, 
+        default='fp32',
+        choices=PRECISIONS,
+        help='Numeric precision: fp32, int8 (quantized Linear layers), '
+             'int8-static (quantized conv and Linear layers) or bf16 (autocast)'
+    )
+
+    # Argument 15: Calibration sample for static quantization
+    parser.add_argument(
+        '--calibration-images', 
+        type=positive_int, 
+        default=32,
+        help='Number of images from --dir used to calibrate int8-static'
+    )
+
+    # Argument 16: Accuracy and speed comparison against fp32
+    parser.add_argument(
+        '--compare-fp32', 
+        action='store_true',
+        help='Also run fp32 NCHW and compare accuracy, speed and agreement'
+    )
+
+    # Argument 17: Memory layout of models and input batches
+    parser.add_argument(
+        '--layout', 
+        type=str, 
+        default='nchw',
+        choices=LAYOUTS,
+        help='Memory layout of models and input batches: nchw or channels_last'
+    )
+
+    # Argument 18: Image decode mode
+    parser.add_argument(
+        '--decode', 
+        type=str, 
+        default='full',
+        choices=DECODE_MODES,
+        help='Decode images in full, or draft to decode large JPEGs at reduced resolution'
+    )
+
+    # Argument 19: Streaming mode with bounded memory
+    parser.add_argument(
+        '--stream', 
+        action='store_true',
+        help='Stream images through every step one batch at a time with flat memory use'
+    )
+
+    # Argument 20: Recursive image discovery
+    parser.add_argument(
+        '--recursive', 
+        action='store_true',
+        help='Also classify images in subfolders of --dir'
+    )
+
+    # Argument 21: Pre-built list of images
+    parser.add_argument(
+        '--filelist', 
+        type=str, 
+        default=None,
+        help='File listing the images relative to --dir, read instead of scanning'
+    )
+
+    # Argument 22: File signature check
+    parser.add_argument(
+        '--check-magic', 
+        action='store_true',
+        help='Skip files that do not start with a known image signature'
+    )
+
+    # Argument 23: Concurrent folder scanning
+    parser.add_argument(
+        '--scan-threads', 
+        type=positive_int, 
+        default=1,
+        help='Number of subfolders scanned concurrently with --recursive'
+    )
+
+    # Argument 24: Resumable run journal
+    parser.add_argument(
+        '--journal', 
+        action='store_true',
+        help='Journal the results as they are classified so the run can be resumed'
+    )
+
+    # Argument 25: Run to resume
+    parser.add_argument(
+        '--resume', 
+        type=str, 
+        default=None,
+        metavar='RUN_ID',
+        help='Resume an interrupted journaled run, skipping images it already classified'
+    )
+
+    # Argument 26: Journal database
+    parser.add_argument(
+        '--journal-path', 
+        type=str, 
+        default='.run_journal.sqlite',
+        help='SQLite database holding the run journals (default: .run_journal.sqlite)'
+    )
+
+    # Argument 27: Per-breed precision and recall
+    parser.add_argument(
+        '--breed-stats', 
+        action='store_true',
+        help='Also print the precision and recall of every dog breed'
+    )
+
+    # Argument 28: Pet label resolution report
+    parser.add_argument(
+        '--label-index', 
+        action='store_true',
+        help='Print the ImageNet classes each pet label resolves to, including unmatched labels'
+    )
+
+    # Argument 29: Startup timing report
+    parser.add_argument(
+        '--startup-report', 
+        action='store_true',
+        help='Print the time of each startup phase and of the slowest module imports'
+    )
+
+    # Argument 30: JSON run report
+    parser.add_argument(
+        '--timing-report', 
+        type=str, 
+        default=None,
+        metavar='PATH',
+        help='Write per-stage times, per-image latency percentiles and throughput as JSON'
+    )
+
+    # Argument 31: Profiling mode
+    parser.add_argument(
+        '--profile', 
+        action='store_true',
+        help='Profile the first batches with torch.profiler and the Python side with cProfile'
+    )
+
+    # Argument 32: Profile output directory
+    parser.add_argument(
+        '--profile-dir', 
+        type=str, 
+        default='.profile',
+        help='Directory the profiles are written to (default: .profile)'
+    )
+
+    # Argument 33: Batches recorded by torch.profiler
+    parser.add_argument(
+        '--profile-batches', 
+        type=positive_int, 
+        default=5,
+        help='Number of classification batches recorded by torch.profiler (default: 5)'
+    )
+
+    # Argument 34: Memory accounting
+    parser.add_argument(
+        '--memory-report', 
+        action='store_true',
+        help='Report RSS per stage, memory per model and peak memory growth per batch'
+    )
+
+    # Argument 35: tracemalloc snapshots
+    parser.add_argument(
+        '--tracemalloc', 
+        type=positive_int, 
+        default=None,
+        metavar='N',
+        help='Also record the top N tracemalloc allocation sites per stage'
+    )
+
     # Parse and return arguments
-    return parser.parse_args()
+    args = parser.parse_args()
+    # Input paths are checked here, before the pipeline (and torch) is
+    # imported, rather than failing part way through a run
+    if not os.path.isdir(args.dir):
+        parser.error(f"--dir {args.dir} is not a directory")
+    if not os.path.isfile(args.dogfile):
+        parser.error(f"--dogfile {args.dogfile} does not exist")
+    if args.filelist is not None and not os.path.isfile(args.filelist):
+        parser.error(f"--filelist {args.filelist} does not exist")
+    if args.layout != 'nchw' and args.precision.startswith('int8'):
+        parser.error(f"--layout {args.layout} is not supported with --precision {args.precision}")
+    if args.profile and args.workers > 1:
+        # Worker processes are not profiled
+        parser.error("--profile is not supported with --workers")
+    if args.resume and args.topk:
+        # Only the top-1 prediction of each image is journaled
+        parser.error("--resume is not supported with --topk")
+    if args.stream:
+        # Streaming classifies in-process with one model and keeps no
+        # per-corpus state
+        unsupported = [option for option, used in [
+            ('several architectures', ',' in args.arch), ('--ensemble', args.ensemble),
+            ('--topk', args.topk), ('--workers', args.workers > 1),
+            ('--compare-fp32', args.compare_fp32), ('--breed-stats', args.breed_stats),
+            ('--label-index', args.label_index)]
+            if used]
+        if unsupported:
+            parser.error(f"--stream is not supported with {', '.join(unsupported)}")
+    return args
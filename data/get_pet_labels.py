@@ -14,16 +14,42 @@
 #          The results_dic dictionary has a 'key' that's the image filename and
 #          a 'value' that's a list. This list will contain the following item
 #          at index 0 : pet image label (string).
+#          iter_pet_labels yields the same (filename, [pet label]) records one
+#          at a time, for streaming through very large image folders. Both
+#          find the images with image_discovery.discover_images, optionally
+#          recursing into subfolders or reading a pre-built file list.
 #
 ##
 # Imports python modules
-from os import listdir
+from os import path
+
+# Imports functions created for this program
+from image_discovery import discover_images
+from results_table import ResultsTable
+
+
+def pet_label_from_filename(filename):
+    """
+    Returns the pet label encoded in an image filename, e.g. 'boston terrier'
+    for 'Boston_terrier_02259.jpg'.
+    """
+    # Remove file extension (e.g., .jpg, .png)
+    name_without_ext = filename.rsplit('.', 1)[0]
+
+    # Split by underscores and filter only alphabetic words (breed names)
+    name_parts = name_without_ext.split('_')
+    alphabetic_words = [word for word in name_parts if word.isalpha()]
+
+    # Join words with spaces, convert to lowercase, and strip whitespace
+    return " ".join(alphabetic_words).lower().strip()
+
 
 # TODO 2: Define get_pet_labels function below please be certain to replace None
 #       in the return statement with results_dic dictionary that you create 
 #       with this function
 # 
-def get_pet_labels(image_dir):
+def get_pet_labels(image_dir, recursive=False, filelist=None, check_magic=False,
+                   threads=1, table=False):
     """
     Creates a dictionary of pet labels extracted from image filenames.
     
@@ -36,8 +62,8 @@ def get_pet_labels(image_dir):
       Example: 'Boston_terrier_02259.jpg' -> 'boston terrier'
       
     Processing Steps:
-      1. List all files in the specified directory
-      2. Skip hidden files (starting with '.')
+      1. Discover the image files in the specified directory
+      2. Skip hidden files (starting with '.') and non-image files
       3. Remove file extensions
       4. Extract alphabetic words (breed names) from filename
       5. Convert to lowercase and normalize spacing
@@ -45,44 +71,64 @@ def get_pet_labels(image_dir):
     
     Parameters:
       image_dir (str) - Full or relative path to folder containing pet images
+      recursive (bool) - Also include images in subfolders; their keys are
+                        paths relative to image_dir (default: False)
+      filelist (str) - File listing the images relative to image_dir, read
+                      instead of scanning the folder (default: None)
+      check_magic (bool) - Only include files whose contents start with a
+                          known image signature (default: False)
+      threads (int) - Number of subfolders scanned concurrently (default: 1)
+      table (bool) - Return a columnar ResultsTable, which takes far less
+                    memory for large folders, instead of a dictionary
+                    (default: False)
     
     Returns:
       dict - Dictionary with structure:
              Key: image filename (str)
              Value: list containing [pet_label (str)] at index 0
+             (a ResultsTable with the same items when table is True)
              
     Example:
       >>> get_pet_labels('pet_images/')
       {'Boston_terrier_02259.jpg': ['boston terrier'],
        'Collie_03797.jpg': ['collie']}
     """
-    # Get list of files in directory
-    in_files = listdir(image_dir)
+    # Discover the image files in directory (hidden and non-image files are
+    # skipped)
+    in_files = discover_images(image_dir, recursive, filelist, check_magic, threads)
     
-    # Create empty dictionary for results
-    results_dic = {}
+    # Create empty dictionary (or table) for results
+    results_dic = ResultsTable() if table else {}
    
     # Process each file in the directory
     for filename in in_files:
-        # Skip hidden files (starting with '.')
-        if filename[0] != ".":
-            # Remove file extension (e.g., .jpg, .png)
-            name_without_ext = filename.rsplit('.', 1)[0]
-            
-            # Split by underscores and filter only alphabetic words (breed names)
-            name_parts = name_without_ext.split('_')
-            alphabetic_words = [word for word in name_parts if word.isalpha()]
-            
-            # Join words with spaces, convert to lowercase, and strip whitespace
-            pet_label = " ".join(alphabetic_words).lower().strip()
-            
-            # Add to dictionary if not already present
-            if filename not in results_dic:
-                results_dic[filename] = [pet_label]
-            else:
-                # Warn about duplicate filenames
-                print(f"** Warning: Duplicate file detected: {filename}")
+        # Extract the pet label (e.g. 'boston terrier') from the filename
+        pet_label = pet_label_from_filename(path.basename(filename))
+        
+        # Add to dictionary if not already present
+        if filename not in results_dic:
+            results_dic[filename] = [pet_label]
+        else:
+            # Warn about duplicate filenames
+            print(f"** Warning: Duplicate file detected: {filename}")
                 
     # Return the results dictionary
     return results_dic
 
+
+def iter_pet_labels(image_dir, recursive=False, filelist=None, check_magic=False,
+                    threads=1):
+    """
+    Yields the pet label of every image in image_dir, one image at a time.
+
+    The streaming counterpart of get_pet_labels(): the images are discovered
+    lazily, so memory use does not grow with the number of images.
+
+    Parameters:
+      image_dir (str) - Full or relative path to folder containing pet images
+      (recursive, filelist, check_magic and threads as for get_pet_labels)
+    Yields:
+      tuple - (filename (str), [pet_label (str)]) for each image
+    """
+    for filename in discover_images(image_dir, recursive, filelist, check_magic, threads):
+        yield filename, [pet_label_from_filename(path.basename(filename))]
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/image_discovery.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Finds the image files to classify. Folders are read with
+#          os.scandir, which returns the file type together with each name so
+#          no extra stat call is needed per entry, optionally recursing into
+#          subfolders - one thread per subfolder when scanning on a network
+#          filesystem. Only files with an image extension are kept, and
+#          optionally only files whose first bytes match a known image
+#          format. Instead of scanning, the images can also be read from a
+#          pre-built file list. Every function yields paths lazily, so memory
+#          use does not grow with the number of images.
+#
+##
+# Imports python modules
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# File extensions treated as images (compared in lower case)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+
+# Leading bytes of the supported image formats
+MAGIC_NUMBERS = (
+    b'\xff\xd8\xff',            # JPEG
+    b'\x89PNG\r\n\x1a\n',       # PNG
+    b'BM',                      # BMP
+    b'GIF87a', b'GIF89a',       # GIF
+    b'II*\x00', b'MM\x00*',     # TIFF (little and big endian)
+)
+
+
+def has_image_magic(path):
+    """
+    Returns True when the file at path starts with the signature of a
+    supported image format.
+    """
+    try:
+        with open(path, 'rb') as infile:
+            header = infile.read(12)
+    except OSError:
+        return False
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return True
+    return header.startswith(MAGIC_NUMBERS)
+
+
+def is_image_name(name, extensions=IMAGE_EXTENSIONS):
+    """Returns True for a non-hidden file name with an image extension."""
+    return name[0] != '.' and os.path.splitext(name)[1].lower() in extensions
+
+
+def _scan_dir(path, relative_dir, extensions):
+    # Reads one folder: returns its image files (as paths relative to the
+    # top folder) and its non-hidden subfolders
+    files = []
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name[0] == '.':
+                continue
+            relative_path = relative_dir + entry.name
+            if entry.is_dir():
+                subdirs.append((entry.path, relative_path + '/'))
+            elif entry.is_file() and is_image_name(entry.name, extensions):
+                files.append(relative_path)
+    return files, subdirs
+
+
+def scan_images(image_dir, recursive=False, extensions=IMAGE_EXTENSIONS, threads=1):
+    """
+    Yields the image files in image_dir, optionally including subfolders.
+
+    With threads > 1 the subfolders are read concurrently by a thread pool,
+    which hides the latency of each directory listing on network
+    filesystems; files are then yielded in the order their folders finish.
+
+    Parameters:
+      image_dir (str) - Folder to scan
+      recursive (bool) - Also scan all non-hidden subfolders (default: False)
+      extensions (tuple) - Lower case extensions of the files to keep
+                           (default: IMAGE_EXTENSIONS)
+      threads (int) - Number of folders read concurrently (default: 1)
+    Yields:
+      str - Path of each image relative to image_dir, e.g. 'cats/Cat_01.jpg'
+    """
+    if threads <= 1 or not recursive:
+        pending = [(image_dir, '')]
+        while pending:
+            files, subdirs = _scan_dir(*pending.pop(), extensions)
+            yield from files
+            if recursive:
+                pending.extend(reversed(subdirs))
+        return
+
+    with ThreadPoolExecutor(threads) as pool:
+        running = {pool.submit(_scan_dir, image_dir, '', extensions)}
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                for path, relative_dir in subdirs:
+                    running.add(pool.submit(_scan_dir, path, relative_dir, extensions))
+                yield from files
+
+
+def read_filelist(filelist, extensions=IMAGE_EXTENSIONS):
+    """
+    Yields the image paths listed in a file list, one path per line relative
+    to the image folder. Empty lines, lines starting with '#' and paths
+    without an image extension are skipped; the files are not checked on
+    disk.
+    """
+    with open(filelist) as infile:
+        for line in infile:
+            path = line.strip()
+            if path and path[0] != '#' and is_image_name(os.path.basename(path),
+                                                         extensions):
+                yield path
+
+
+def discover_images(image_dir, recursive=False, filelist=None, check_magic=False,
+                    threads=1, extensions=IMAGE_EXTENSIONS):
+    """
+    Yields the images to classify: the entries of filelist when given,
+    otherwise the image files found by scanning image_dir.
+
+    Parameters:
+      image_dir (str) - Folder containing the images
+      recursive (bool) - Also scan subfolders (default: False)
+      filelist (str) - File listing the images relative to image_dir, used
+                       instead of scanning (default: None)
+      check_magic (bool) - Only keep files whose contents start with a known
+                           image signature (default: False)
+      threads (int) - Number of folders read concurrently (default: 1)
+      extensions (tuple) - Lower case extensions of the files to keep
+                           (default: IMAGE_EXTENSIONS)
+    Yields:
+      str - Path of each image relative to image_dir
+    """
+    if filelist is not None:
+        paths = read_filelist(filelist, extensions)
+    else:
+        paths = scan_images(image_dir, recursive, extensions, threads)
+    for path in paths:
+        if not check_magic or has_image_magic(os.path.join(image_dir, path)):
+            yield path
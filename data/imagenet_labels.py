@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/imagenet_labels.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Loads the 1000 ImageNet class labels without importing torch, so
+#          that the label index and the is-a-dog check can be used before
+#          (or without) the CNN models. The labels file is a Python dict
+#          literal, and evaluating it with ast.literal_eval takes several
+#          milliseconds on every run; the parsed dict is therefore also
+#          written to a compact marshal file next to the labels file, which
+#          loads in a fraction of that time. The compiled file is keyed by
+#          the size and modification time of the labels file and is rebuilt
+#          whenever the labels file changes.
+#
+##
+# Imports python modules
+import ast
+import marshal
+import os
+
+IMAGENET_CLASSES_FILE = 'imagenet1000_clsid_to_human.txt'
+
+# Parsed labels file, loaded the first time it is needed
+_imagenet_classes_dict = None
+
+
+def compiled_labels_path(labels_file):
+    """
+    Returns the path of the compiled labels next to labels_file, e.g.
+    '.imagenet1000_clsid_to_human.marshal' for the ImageNet labels file.
+    """
+    folder, name = os.path.split(labels_file)
+    return os.path.join(folder, '.' + os.path.splitext(name)[0] + '.marshal')
+
+
+def load_class_labels(labels_file):
+    """
+    Reads a labels file holding a dict literal of class index -> label,
+    from its compiled copy when that is up to date. Otherwise the file is
+    parsed and the compiled copy (re)written; a folder that is not writable
+    only means the file is parsed every time.
+
+    Parameters:
+      labels_file (str) - Path of the labels file
+    Returns:
+      dict - Maps each class index (int) to its label (str)
+    """
+    stat = os.stat(labels_file)
+    key = (stat.st_size, stat.st_mtime_ns, marshal.version)
+    compiled_path = compiled_labels_path(labels_file)
+
+    # Reads the compiled labels, which start with the key of the labels
+    # file they were compiled from
+    try:
+        with open(compiled_path, 'rb') as compiled_file:
+            compiled_key, class_labels = marshal.load(compiled_file)
+        if tuple(compiled_key) == key:
+            return class_labels
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    with open(labels_file) as infile:
+        class_labels = ast.literal_eval(infile.read())
+
+    # Writes to a temporary file first so that a concurrent run never reads
+    # a half-written file
+    temp_path = f"{compiled_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as compiled_file:
+            marshal.dump((key, class_labels), compiled_file)
+        os.replace(temp_path, compiled_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return class_labels
+
+
+def get_imagenet_classes():
+    """
+    Returns the dict of ImageNet class index -> human readable label, loading
+    the labels file the first time it is needed.
+    """
+    global _imagenet_classes_dict
+    if _imagenet_classes_dict is None:
+        _imagenet_classes_dict = load_class_labels(IMAGENET_CLASSES_FILE)
+    return _imagenet_classes_dict
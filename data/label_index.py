@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/label_index.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Resolves pet labels to ImageNet class ids once. A pet label
+#          matches a classifier label when it is one of the label's
+#          comma-separated terms (see classify_images), so an index of
+#          every term of the 1000 ImageNet labels maps each distinct pet
+#          label to the set of class ids it matches. Matching an image is
+#          then a test of its predicted class id against that set instead
+#          of lowercasing and splitting the classifier label every time.
+#          The resolved index can be printed, which shows the pet labels
+#          that match no ImageNet class and so can never be classified
+#          correctly.
+#
+##
+# Imports functions created for this program
+from imagenet_labels import get_imagenet_classes
+
+# Index of the ImageNet labels, built the first time it is needed
+_imagenet_label_index = None
+
+
+class LabelIndex:
+    """
+    Index of the terms of a set of classifier labels.
+
+    Parameters:
+      class_labels (dict) - Maps each class id (int) to its classifier
+                            label, e.g. 'Maltese dog, Maltese terrier, Maltese'
+
+    Example:
+      >>> index = LabelIndex({0: 'Dalmatian, coach dog', 1: 'coach'})
+      >>> index.class_labels[0]
+      'dalmatian, coach dog'
+      >>> index.classes_for('coach dog')
+      frozenset({0})
+    """
+
+    def __init__(self, class_labels):
+        # Normalized label (lowercase, stripped) of every class id, and the
+        # class ids each term appears in
+        self.class_labels = [''] * (max(class_labels) + 1)
+        self._term_classes = {}
+        for class_id, label in class_labels.items():
+            label = label.lower().strip()
+            self.class_labels[class_id] = label
+            for term in label.split(","):
+                self._term_classes.setdefault(term.strip(), set()).add(class_id)
+        self._resolved = {}
+
+    def classes_for(self, pet_label):
+        """
+        Returns the class ids (frozenset of int) whose label has pet_label
+        as one of its terms; resolved once per pet label.
+        """
+        classes = self._resolved.get(pet_label)
+        if classes is None:
+            classes = frozenset(self._term_classes.get(pet_label, ()))
+            self._resolved[pet_label] = classes
+        return classes
+
+    def resolve(self, pet_labels):
+        """
+        Resolves a set of pet labels.
+
+        Parameters:
+          pet_labels (iterable) - Distinct pet labels
+        Returns:
+          dict - Maps each pet label to the sorted list of class ids it
+                 matches (empty when it matches none)
+        """
+        return {pet_label: sorted(self.classes_for(pet_label)) for pet_label in pet_labels}
+
+
+def imagenet_label_index():
+    """Returns the LabelIndex of the 1000 ImageNet class labels."""
+    global _imagenet_label_index
+    if _imagenet_label_index is None:
+        _imagenet_label_index = LabelIndex(get_imagenet_classes())
+    return _imagenet_label_index
+
+
+def print_label_index(label_counts, index=None):
+    """
+    Prints the ImageNet classes every pet label resolves to, followed by the
+    pet labels that match no class.
+
+    Parameters:
+      label_counts (dict) - Maps each distinct pet label to its number of
+                            images, e.g. from ResultsTable.label_counts()
+      index (LabelIndex) - Index to resolve with (default: the ImageNet
+                           label index)
+    Returns:
+      None - Prints to console
+    """
+    index = index or imagenet_label_index()
+    resolved = index.resolve(sorted(label_counts))
+    unmatched = [label for label, class_ids in resolved.items() if not class_ids]
+
+    print("\n" + "="*70)
+    print(f"*** Pet Label Index: {len(resolved)} labels, {len(unmatched)} unmatched ***")
+    print("="*70)
+    print(f"{'PET LABEL':<30}{'IMAGES':>8}  IMAGENET CLASS IDS")
+    for label, class_ids in resolved.items():
+        ids = ', '.join(str(class_id) for class_id in class_ids) or '-'
+        print(f"{label[:29]:<30}{label_counts[label]:>8}  {ids}")
+    if unmatched:
+        n_images = sum(label_counts[label] for label in unmatched)
+        print(f"\nUnmatched labels ({n_images} images can never match): "
+              f"{', '.join(unmatched)}")
+    print("="*70)
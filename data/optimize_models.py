@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/optimize_models.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: The "optimize" step: writes a frozen TorchScript inference artifact
+#          for each CNN architecture (see classifier.optimize_model) into the
+#          artifact directory, where classifier.py picks it up instead of
+#          building the eager torchvision model. For every architecture the
+#          load time and the latency of one batch are reported for the eager
+#          model and for the artifact, and the predictions of both on the
+#          blank benchmark batch are checked to agree.
+#
+#   Example call:
+#    python optimize_models.py --arch all
+##
+# Imports python modules
+import argparse
+from time import time
+
+import torch
+
+# Imports functions created for this program
+from classifier import (ARTIFACT_DIR, CROP_SIZE, InferenceSession, ModelRegistry,
+                        optimize_model)
+from get_input_args import arch_list, positive_int
+
+
+def time_batch(session, batch, n_passes=3):
+    """
+    Returns the mean seconds per forward pass of session on batch (after one
+    untimed pass) and the output of the last pass.
+    """
+    output = session.forward(batch)
+    start_time = time()
+    for _ in range(n_passes):
+        output = session.forward(batch)
+    return (time() - start_time) / n_passes, output
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Write optimized inference artifacts used by classifier.py'
+    )
+    parser.add_argument('--arch', type=arch_list, default='all',
+                        help="CNN model architecture(s), e.g. 'vgg', 'resnet,vgg' or 'all'")
+    parser.add_argument('--artifact-dir', type=str, default=ARTIFACT_DIR,
+                        help='Directory to write the artifacts to')
+    parser.add_argument('--batch-size', type=positive_int, default=32,
+                        help='Number of images in the benchmark batch')
+    args = parser.parse_args()
+
+    batch = torch.zeros(args.batch_size, 3, CROP_SIZE, CROP_SIZE)
+    print(f"{'MODEL':<10}{'LOAD EAGER':>12}{'LOAD OPT':>12}"
+          f"{'BATCH EAGER':>13}{'BATCH OPT':>12}{'SPEEDUP':>10}")
+    for model_name in args.arch.split(','):
+        # A fresh registry, so that the eager load time includes building
+        # the model and loading its pretrained weights
+        registry = ModelRegistry()
+        start_time = time()
+        eager = InferenceSession(model_name, registry=registry, artifact_dir=None)
+        eager_load = time() - start_time
+
+        optimize_model(model_name, registry, args.artifact_dir)
+        start_time = time()
+        optimized = InferenceSession(model_name, registry=registry,
+                                     artifact_dir=args.artifact_dir)
+        optimized_load = time() - start_time
+
+        eager_batch, eager_output = time_batch(eager, batch)
+        optimized_batch, optimized_output = time_batch(optimized, batch)
+        if not torch.equal(eager_output.argmax(dim=1), optimized_output.argmax(dim=1)):
+            print(f"Warning: {model_name} artifact predictions differ from the eager model")
+        print(f"{model_name:<10}{eager_load:>11.2f}s{optimized_load:>11.2f}s"
+              f"{eager_batch:>12.3f}s{optimized_batch:>11.3f}s"
+              f"{eager_batch / optimized_batch:>9.2f}x")
+
+
+# Call to main function to run the program
+if __name__ == "__main__":
+    main()
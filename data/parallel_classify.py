@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/parallel_classify.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Classifies images with a pool of worker processes so that every
+#          CPU core is used. Each worker process owns its own replica of the
+#          CNN model(s) (InferenceSessions from classifier.py) and a fixed
+#          number of intra-op threads, optionally pinned to its own set of
+#          cores. Images are handed out in chunks and the predictions are put
+#          back in the order of the input paths.
+#
+##
+# Imports python modules
+import os
+from multiprocessing import get_context
+from time import time
+
+import numpy as np
+
+# Per-process state of a worker, set up once by _init_worker
+_worker_model_names = None
+_worker_precision = 'fp32'
+_worker_calibration_paths = None
+_worker_layout = 'nchw'
+_worker_decode = 'full'
+_worker_ensemble = False
+_worker_topk = None
+_worker_batch_size = None
+_worker_cache = None
+_worker_store = None
+
+
+def available_cores():
+    """Returns the sorted ids of the CPU cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _init_worker(model_names, precision, calibration_paths, layout, decode, ensemble,
+                 topk, batch_size, threads, core_sets, counter, pretrained, cache_dir,
+                 store_path):
+    """
+    Initializes a worker process: sets its thread count and CPU affinity and
+    builds its own InferenceSessions (including warmup) before any work arrives.
+    """
+    global _worker_model_names, _worker_precision, _worker_calibration_paths
+    global _worker_layout, _worker_decode
+    global _worker_ensemble, _worker_topk, _worker_batch_size
+    global _worker_cache, _worker_store
+
+    # Claim a worker slot to pick this worker's core set
+    with counter.get_lock():
+        slot = counter.value
+        counter.value += 1
+    if core_sets and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, core_sets[slot % len(core_sets)])
+
+    import torch
+    torch.set_num_threads(threads)
+
+    import classifier
+    classifier.models.pretrained = pretrained
+    for model_name in model_names:
+        classifier.get_session(model_name, precision=precision,
+                               calibration_paths=calibration_paths, layout=layout)
+    _worker_model_names = model_names
+    _worker_precision = precision
+    _worker_calibration_paths = calibration_paths
+    _worker_layout = layout
+    _worker_decode = decode
+    _worker_ensemble = ensemble
+    _worker_topk = topk
+    _worker_batch_size = batch_size
+
+    # Workers only add entries - the parent enforces the size limit once
+    # the pool is done
+    if cache_dir is not None:
+        from prediction_cache import PredictionCache
+        _worker_cache = PredictionCache(cache_dir, max_bytes=None)
+
+    # Every worker maps the same store file, so its pages are shared
+    if store_path is not None:
+        from tensor_store import TensorStore
+        _worker_store = TensorStore(store_path, decode)
+
+
+def _classify_chunk(task):
+    """
+    Classifies one chunk of images inside a worker process.
+
+    Returns:
+      tuple - (chunk index, worker pid, predictions dict, top-k predictions
+               dict or None, seconds spent)
+    """
+    from classifier import classify_multi
+
+    chunk_index, img_paths, cache_keys = task
+    start_time = time()
+    predictions = classify_multi(img_paths, _worker_model_names, _worker_batch_size,
+                                 _worker_cache, cache_keys, _worker_store,
+                                 _worker_ensemble, _worker_topk, _worker_precision,
+                                 _worker_calibration_paths, _worker_layout,
+                                 _worker_decode)
+    topk_predictions = None
+    if _worker_topk:
+        predictions, topk_predictions = predictions
+    return chunk_index, os.getpid(), predictions, topk_predictions, time() - start_time
+
+
+def split_core_sets(workers, threads_per_worker):
+    """
+    Splits the cores this process may run on into one disjoint set per worker.
+
+    Parameters:
+      workers (int) - Number of worker processes
+      threads_per_worker (int) - Number of cores to give each worker
+    Returns:
+      list - One list of core ids per worker; sets wrap around when there are
+             fewer cores than workers * threads_per_worker
+    """
+    cores = available_cores()
+    core_sets = []
+    for worker in range(workers):
+        first = (worker * threads_per_worker) % len(cores)
+        core_sets.append([cores[(first + i) % len(cores)]
+                          for i in range(min(threads_per_worker, len(cores)))])
+    return core_sets
+
+
+def classify_parallel_multi(img_paths, model_names, workers, batch_size=32,
+                            chunk_size=None, threads_per_worker=None, pin_cores=False,
+                            cache=None, cache_keys=None, tensor_store=None,
+                            ensemble=False, topk=None, precision='fp32',
+                            calibration_paths=None, layout='nchw', decode='full',
+                            on_batch=None):
+    """
+    Classifies images with one or more architectures across a pool of
+    worker processes.
+
+    Each worker owns its own replica of every requested model and runs
+    threads_per_worker intra-op threads, so the pool as a whole uses every
+    core without the workers competing for the same threads. Images are
+    distributed in chunks of chunk_size and the results are reassembled in
+    input order, so the output does not depend on which worker finished
+    first.
+
+    Parameters:
+      img_paths (list) - Paths of the images to classify
+      model_names (list) - CNN model architectures, e.g. ['resnet', 'vgg']
+      workers (int) - Number of worker processes
+      batch_size (int) - Number of images per forward pass (default: 32)
+      chunk_size (int) - Number of images handed to a worker at a time
+                         (default: batch_size)
+      threads_per_worker (int) - Intra-op threads per worker (default: the
+                                 available cores divided evenly between workers)
+      pin_cores (bool) - Pin each worker to its own set of cores, where the
+                         platform supports it (default: False)
+      cache (PredictionCache) - When given, workers store every prediction in
+                                this cache's directory (default: None)
+      cache_keys (dict) - Maps each model name to the cache key of each image,
+                          required with cache
+      tensor_store (TensorStore) - Store already holding every image, which
+                                   workers read instead of decoding the
+                                   images (default: None)
+      ensemble (bool) - Also predict from the averaged logits of all models
+                        (default: False)
+      topk (int) - Also return the k most probable classes of every image
+                   (default: None)
+      precision (str) - Precision every worker runs its models in, one of
+                        classifier.PRECISIONS (default: 'fp32')
+      calibration_paths (list) - Images to calibrate 'int8-static' with
+                                 (default: None)
+      layout (str) - Memory layout every worker runs its models in, one of
+                     classifier.LAYOUTS (default: 'nchw')
+      decode (str) - How workers decode the images, one of
+                     classifier.DECODE_MODES (default: 'full')
+      on_batch (callable) - Called in this process as each chunk arrives, as
+                            on_batch(start, predictions) with the index of
+                            the chunk's first image and the chunk's
+                            predictions in the format returned below; chunks
+                            arrive in the order workers finish them
+                            (default: None)
+    Returns:
+      predictions (dict) - Maps each model name (and classifier.ENSEMBLE) to a
+                           (labels, class_ids) tuple of lists in input order
+      topk_predictions (dict) - Maps each name to a (class ids, probabilities)
+                                tuple of (N, k) arrays, or None without topk
+      worker_stats (list) - One dict per worker with keys 'pid', 'images',
+                            'seconds' and 'images_per_sec'
+    """
+    # Imported here so that worker processes pick up the same settings
+    import classifier
+
+    if chunk_size is None:
+        chunk_size = batch_size
+    if threads_per_worker is None:
+        threads_per_worker = max(1, len(available_cores()) // workers)
+    core_sets = split_core_sets(workers, threads_per_worker) if pin_cores else None
+
+    # Quantize pretrained models once up front - the workers then load the
+    # saved quantized models instead of each calibrating their own
+    if precision.startswith('int8') and classifier.models.pretrained:
+        for model_name in model_names:
+            classifier.load_quantized_model(model_name, precision, calibration_paths)
+
+    chunks = []
+    for index, start in enumerate(range(0, len(img_paths), chunk_size)):
+        chunk_keys = None
+        if cache is not None:
+            chunk_keys = {name: keys[start:start + chunk_size]
+                          for name, keys in cache_keys.items()}
+        chunks.append((index, img_paths[start:start + chunk_size], chunk_keys))
+
+    # spawn (rather than fork) so that no OpenMP state is inherited from
+    # the parent process
+    context = get_context('spawn')
+    counter = context.Value('i', 0)
+    initargs = (list(model_names), precision, calibration_paths, layout, decode,
+                ensemble, topk,
+                batch_size, threads_per_worker,
+                core_sets, counter, classifier.models.pretrained,
+                cache.cache_dir if cache is not None else None,
+                tensor_store.store_path if tensor_store is not None else None)
+
+    chunk_results = [None] * len(chunks)
+    busy = {}
+    with context.Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+        for chunk_index, pid, chunk_predictions, chunk_topk, seconds in \
+                pool.imap_unordered(_classify_chunk, chunks):
+            chunk_results[chunk_index] = (chunk_predictions, chunk_topk)
+            if on_batch is not None:
+                on_batch(chunk_index * chunk_size, chunk_predictions)
+            images, total_seconds = busy.get(pid, (0, 0.0))
+            busy[pid] = (images + len(chunks[chunk_index][1]), total_seconds + seconds)
+
+    if cache is not None:
+        cache.enforce_limit()
+
+    # Reassemble the predictions in input order
+    names = list(model_names) + ([classifier.ENSEMBLE] if ensemble else [])
+    predictions = {name: ([], []) for name in names}
+    for chunk_predictions, _ in chunk_results:
+        for name, (labels, class_ids) in chunk_predictions.items():
+            predictions[name][0].extend(labels)
+            predictions[name][1].extend(class_ids)
+    topk_predictions = None
+    if topk:
+        topk_predictions = {
+            name: tuple(np.concatenate([chunk_topk[name][part]
+                                        for _, chunk_topk in chunk_results])
+                        for part in (0, 1))
+            for name in names}
+
+    worker_stats = [
+        {'pid': pid,
+         'images': images,
+         'seconds': seconds,
+         'images_per_sec': images / seconds if seconds > 0 else 0.0}
+        for pid, (images, seconds) in sorted(busy.items())
+    ]
+    return predictions, topk_predictions, worker_stats
+
+
+def classify_parallel(img_paths, model_name, workers, batch_size=32,
+                      chunk_size=None, threads_per_worker=None, pin_cores=False,
+                      cache=None, cache_keys=None, tensor_store=None):
+    """
+    Classifies images with one architecture across a pool of worker
+    processes - see classify_parallel_multi() for the details.
+
+    Parameters:
+      model_name (str) - CNN model architecture: 'resnet', 'alexnet' or 'vgg'
+      cache_keys (list) - Cache key of each image, required with cache
+      (all other parameters as for classify_parallel_multi)
+    Returns:
+      labels (list) - ImageNet label (str) for each image, in input order
+      class_ids (list) - ImageNet class index (int) for each image, in input order
+      worker_stats (list) - One dict per worker with keys 'pid', 'images',
+                            'seconds' and 'images_per_sec'
+    """
+    if cache is not None:
+        cache_keys = {model_name: cache_keys}
+    predictions, _, worker_stats = classify_parallel_multi(
+        img_paths, [model_name], workers, batch_size, chunk_size,
+        threads_per_worker, pin_cores, cache, cache_keys, tensor_store)
+    labels, class_ids = predictions[model_name]
+    return labels, class_ids, worker_stats
+
+
+def print_worker_stats(worker_stats):
+    """
+    Prints the number of images and throughput of every worker process.
+
+    Parameters:
+      worker_stats (list) - Worker statistics as returned by classify_parallel()
+    Returns:
+      None - Prints to console
+    """
+    print("\n" + "="*50)
+    print("Worker Throughput:")
+    print("="*50)
+    for worker, stats in enumerate(worker_stats, 1):
+        name = f"Worker {worker} (pid {stats['pid']}):"
+        print(f"  {name:<24}{stats['images']:>6} images "
+              f"{stats['images_per_sec']:>8.1f} images/sec")
+    total_images = sum(stats['images'] for stats in worker_stats)
+    total_rate = sum(stats['images_per_sec'] for stats in worker_stats)
+    print(f"  {'Total:':<24}{total_images:>6} images {total_rate:>8.1f} images/sec")
+    print("="*50)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/precision_comparison.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Compares a reduced precision (INT8 quantized or bfloat16) and/or
+#          channels_last run of the CNN models against the fp32 NCHW baseline
+#          on the same images, so that it can be decided per architecture
+#          whether the faster setup is safe to use. Both setups classify
+#          every image (the prediction cache is
+#          bypassed so that the timings are real), their results are scored
+#          with the usual calculates_results_stats() metrics, and the
+#          throughput and the rate at which both setups predict the same
+#          label are reported next to them.
+#
+##
+# Imports python modules
+from time import time
+
+import numpy as np
+
+# Imports functions created for this program
+from classifier import get_session
+from classify_images import classify_images_multi
+from adjust_results4_isadog import adjust_results4_isadog
+from calculates_results_stats import calculates_results_stats
+from results_table import ResultsTable
+
+
+def compare_precision(images_dir, results_dic, models, dogfile, precision,
+                      calibration_paths=None, batch_size=32, workers=1,
+                      tensor_store=None, layout='nchw', decode='full'):
+    """
+    Classifies the images at fp32 in the nchw layout and at precision in
+    layout, and compares the results.
+
+    Parameters:
+      images_dir (str) - Full path to folder containing images to classify
+                        (must include trailing slash)
+      results_dic (dict) - Results dictionary (or ResultsTable) holding the
+                          pet labels (index 0 of each value); it is copied,
+                          never modified
+      models (list) - CNN model architectures to compare, e.g. ['resnet', 'vgg']
+      dogfile (str) - Text file with valid dog names (see adjust_results4_isadog)
+      precision (str) - Precision to compare against fp32, e.g. 'int8'
+      calibration_paths (list) - Images to calibrate 'int8-static' with
+                                (default: None)
+      batch_size (int) - Number of images per forward pass (default: 32)
+      workers (int) - Number of worker processes (default: 1)
+      tensor_store (TensorStore) - Store of preprocessed images (default: None)
+      layout (str) - Layout to compare against nchw (default: 'nchw')
+      decode (str) - How both runs decode the images (default: 'full')
+    Returns:
+      dict - Maps each model name to a dict with keys:
+               'stats' - {'baseline' and 'candidate': results statistics
+                          dictionary}
+               'images_per_sec' - {'baseline' and 'candidate': throughput}
+               'agreement' - percentage of images given the same label
+    """
+    comparison = {}
+    n_images = len(results_dic)
+    # Both runs fill in copies of one table, so that their interned label
+    # ids can be compared directly
+    if not isinstance(results_dic, ResultsTable):
+        results_dic = ResultsTable.from_records(
+            (filename, values[:1]) for filename, values in results_dic.items())
+    for model in models:
+        # Each model is timed on its own so that the speedup is per architecture
+        runs = {}
+        for run, run_precision, run_layout in (('baseline', 'fp32', 'nchw'),
+                                               ('candidate', precision, layout)):
+            # The session (including quantization) is built before the clock
+            # starts so that only classification is timed
+            if workers == 1:
+                get_session(model, precision=run_precision,
+                            calibration_paths=calibration_paths, layout=run_layout)
+
+            run_dic = results_dic.copy(classified=False)
+            start_time = time()
+            classify_images_multi(images_dir, {model: run_dic}, [model], batch_size,
+                                  workers, tensor_store=tensor_store,
+                                  precision=run_precision,
+                                  calibration_paths=calibration_paths,
+                                  layout=run_layout, decode=decode)
+            seconds = time() - start_time
+            adjust_results4_isadog(run_dic, dogfile)
+            runs[run] = (run_dic, seconds)
+
+        baseline = runs['baseline'][0]
+        candidate = runs['candidate'][0]
+        same = np.count_nonzero(baseline.column('classifier_label_id') ==
+                                candidate.column('classifier_label_id'))
+        comparison[model] = {
+            'stats': {run: calculates_results_stats(run_dic)
+                      for run, (run_dic, _) in runs.items()},
+            'images_per_sec': {run: n_images / seconds if seconds > 0 else 0.0
+                               for run, (_, seconds) in runs.items()},
+            'agreement': same / n_images * 100.0 if n_images > 0 else 0.0,
+        }
+    return comparison
+
+
+def print_precision_comparison(comparison, precision, layout='nchw'):
+    """
+    Prints the accuracy and speed of every model at fp32 NCHW and at
+    precision in layout.
+
+    Parameters:
+      comparison (dict) - Comparison as returned by compare_precision()
+      precision (str) - The precision compared against fp32, e.g. 'int8'
+      layout (str) - The layout compared against nchw (default: 'nchw')
+    Returns:
+      None - Prints results to console
+
+    Example Output:
+      *** Precision Comparison: VGG ***
+                                                FP32         INT8         DIFF
+      Overall Match Accuracy:                  87.5%        87.5%        +0.0%
+      ...
+    """
+    rows = [('Overall Match Accuracy:', 'pct_match'),
+            ('Dog Detection Accuracy:', 'pct_correct_dogs'),
+            ('Breed Identification Accuracy:', 'pct_correct_breed'),
+            ('Non-Dog Classification Accuracy:', 'pct_correct_notdogs')]
+    # channels_last is the NHWC layout
+    label = precision if layout == 'nchw' else f"{precision}/nhwc"
+    for model, result in comparison.items():
+        fp32_stats = result['stats']['baseline']
+        stats = result['stats']['candidate']
+        fp32_rate = result['images_per_sec']['baseline']
+        rate = result['images_per_sec']['candidate']
+
+        print("\n" + "="*74)
+        print(f"*** Precision Comparison: {model.upper()} ***")
+        print("="*74)
+        print(f"{'':<35}{'FP32':>13}{label.upper():>13}{'DIFF':>13}")
+        for title, key in rows:
+            print(f"{title:<35}{fp32_stats[key]:>12.1f}%{stats[key]:>12.1f}%"
+                  f"{stats[key] - fp32_stats[key]:>+12.1f}%")
+        print(f"{'Images per Second:':<35}{fp32_rate:>13.1f}{rate:>13.1f}"
+              f"{rate / fp32_rate if fp32_rate > 0 else 0.0:>12.2f}x")
+        print(f"{'Prediction Agreement with FP32:':<35}{'':>13}"
+              f"{result['agreement']:>12.1f}%")
+        print("="*74)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/prediction_cache.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Persistent on-disk cache of CNN predictions so that reruns over
+#          unchanged images skip the forward pass. Entries are keyed on the
+#          SHA-256 of the image file contents together with a fingerprint of
+#          everything else that determines the prediction (architecture,
+#          weights, torch/torchvision versions and preprocessing). Each entry
+#          stores the predicted ImageNet class id and the full logits vector.
+#          The cache is bounded in size; the least recently used entries are
+#          evicted first.
+#
+##
+# Imports python modules
+import hashlib
+import os
+import struct
+
+import numpy as np
+
+# Default location and size limit of the cache
+DEFAULT_CACHE_DIR = '.prediction_cache'
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+
+# Entry layout: little-endian int32 class id followed by float32 logits
+_HEADER = struct.Struct('<i')
+
+
+def file_digest(path, chunk_size=1024 ** 2):
+    """
+    Returns the hex SHA-256 digest of a file's contents.
+
+    Parameters:
+      path (str) - Path of the file to hash
+      chunk_size (int) - Number of bytes read at a time (default: 1 MiB)
+    Returns:
+      str - Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    Content-addressed cache of (class id, logits) predictions on disk.
+
+    Every entry is a small file in a two-level directory tree under
+    cache_dir. Reading an entry refreshes its modification time, which is
+    what eviction uses as the least-recently-used order. Writes go to a
+    temporary file that is renamed into place, so several processes can
+    share one cache directory safely.
+
+    Parameters:
+      cache_dir (str) - Directory holding the cache (default: DEFAULT_CACHE_DIR)
+      max_bytes (int) - Size limit of the cache in bytes, or None to never
+                        evict while writing (default: DEFAULT_MAX_BYTES)
+
+    Example:
+      >>> cache = PredictionCache('.prediction_cache')
+      >>> keys = cache.keys_for(['pet_images/Collie_03797.jpg'], fingerprint)
+      >>> cache.get(keys[0])
+      (231, array([...], dtype=float32))
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._nbytes = None
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.bin')
+
+    @staticmethod
+    def key(digest, fingerprint):
+        """
+        Returns the cache key of an image with contents digest (see
+        file_digest) for the model described by fingerprint (see
+        classifier.model_fingerprint).
+        """
+        return hashlib.sha256(f"{digest}|{fingerprint}".encode()).hexdigest()
+
+    def keys_for(self, img_paths, fingerprint):
+        """
+        Returns the cache key of every image for the model described by
+        fingerprint (see classifier.model_fingerprint).
+
+        Parameters:
+          img_paths (list) - Paths of the images
+          fingerprint (str) - Identifies the model, weights and preprocessing
+        Returns:
+          list - Cache key (str) for each image, in input order
+        """
+        return [self.key(file_digest(path), fingerprint) for path in img_paths]
+
+    def get(self, key):
+        """
+        Returns the cached prediction for key.
+
+        Returns:
+          tuple - (class id (int), logits (numpy.ndarray of float32)), or
+                  None when key is not in the cache
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as infile:
+                data = infile.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        class_id, = _HEADER.unpack_from(data)
+        logits = np.frombuffer(data, dtype='<f4', offset=_HEADER.size)
+        return class_id, logits
+
+    def put(self, key, class_id, logits):
+        """
+        Stores the prediction for key, evicting old entries when the cache
+        grows over max_bytes.
+
+        Parameters:
+          key (str) - Cache key from keys_for()
+          class_id (int) - Predicted ImageNet class index
+          logits (array-like) - Model output for the image
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = _HEADER.pack(class_id) + np.asarray(logits, dtype='<f4').tobytes()
+        # An entry that is overwritten no longer counts towards the size
+        old_nbytes = 0
+        if self.max_bytes is not None and self._nbytes is not None:
+            try:
+                old_nbytes = os.stat(path).st_size
+            except FileNotFoundError:
+                pass
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as outfile:
+            outfile.write(data)
+        os.replace(tmp_path, path)
+
+        if self.max_bytes is not None:
+            if self._nbytes is None:
+                self._nbytes = self.nbytes()
+            else:
+                self._nbytes += len(data) - old_nbytes
+            if self._nbytes > self.max_bytes:
+                self.enforce_limit()
+
+    def _entries(self):
+        # (mtime, size, path) of every entry in the cache
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.bin'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def nbytes(self):
+        """Returns the total size in bytes of the entries on disk."""
+        return sum(size for _, size, _ in self._entries())
+
+    def enforce_limit(self, max_bytes=None):
+        """
+        Evicts least recently used entries once the cache is larger than
+        max_bytes, down to 90% of max_bytes so that there is room for new
+        entries before the next eviction pass.
+
+        Parameters:
+          max_bytes (int) - Size limit to enforce (default: self.max_bytes)
+        Returns:
+          int - Number of entries evicted
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        if max_bytes is None:
+            return 0
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        self._nbytes = total
+        if total <= max_bytes:
+            return 0
+        target = int(max_bytes * 0.9)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        self._nbytes = total
+        return evicted
@@ -25,7 +25,12 @@
 #             False in the function call within main (defaults to False)
 #         This function does not output anything other than printing a summary
 #         of the final results.
+#         print_results_stream prints the same report for a stream of results,
+#         printing misclassified images as they arrive.
 ##
+# Imports functions created for this program
+from calculates_results_stats import calculates_results_stats
+
 # TODO 6: Define print_results function below, specifically replace the None
 #       below by the function definition of the print_results function. 
 #       Notice that this function doesn't to return anything because it  
@@ -96,6 +101,12 @@ def print_results(results_dic, results_stats_dic, model,
     print(f"{'Dog Detection Accuracy:':<35} {results_stats_dic['pct_correct_dogs']:>6.1f}%")
     print(f"{'Breed Identification Accuracy:':<35} {results_stats_dic['pct_correct_breed']:>6.1f}%")
     print(f"{'Non-Dog Classification Accuracy:':<35} {results_stats_dic['pct_correct_notdogs']:>6.1f}%")
+
+    # Print top-k accuracy when the run recorded top-k predictions
+    if 'pct_topk_match' in results_stats_dic:
+        k = results_stats_dic['topk']
+        print(f"{f'Top-{k} Match Accuracy:':<35} {results_stats_dic['pct_topk_match']:>6.1f}%")
+        print(f"{f'Top-{k} Breed Accuracy:':<35} {results_stats_dic['pct_topk_correct_breed']:>6.1f}%")
     print("="*70)
     
     # Print incorrectly classified dogs if requested
@@ -157,4 +168,119 @@ def print_results(results_dic, results_stats_dic, model,
         else:
             print(f"\nTotal Breed Errors: {incorrect_breed_count}")
         print("="*70)
-                
+
+
+def print_results_stream(records, model, print_incorrect_dogs=False,
+                         print_incorrect_breed=False):
+    """
+    Prints the results of a stream of classified images.
+
+    The streaming counterpart of print_results(): incorrectly classified
+    dogs and breeds (if requested) are printed one line each as their
+    records arrive, the statistics are accumulated along the way with
+    calculates_results_stats(), and the summary is printed once the stream
+    is exhausted.
+
+    Parameters:
+      records (iterable) - (filename, results list) tuples with all five
+                           values, e.g. from adjust_results4_isadog_stream()
+      model (str) - CNN model architecture used ('resnet', 'alexnet', or 'vgg')
+      print_incorrect_dogs (bool) - Print dog/non-dog classification errors
+                                   (default: False)
+      print_incorrect_breed (bool) - Print breed identification errors
+                                    (default: False)
+    Returns:
+      dict - The results statistics dictionary of the whole stream
+    """
+    def reported(records):
+        # Prints every misclassification while passing the records on
+        for filename, values in records:
+            pet_label, classifier_label, labels_match, pet_is_dog, classifier_is_dog = values
+            if print_incorrect_dogs and pet_is_dog != classifier_is_dog:
+                error_type = "FALSE NEGATIVE" if pet_is_dog == 1 else "FALSE POSITIVE"
+                print(f"{error_type:<16}{filename}: true '{pet_label}', "
+                      f"classifier '{classifier_label}'")
+            if print_incorrect_breed and pet_is_dog == 1 and classifier_is_dog == 1 \
+                    and labels_match == 0:
+                print(f"{'WRONG BREED':<16}{filename}: true '{pet_label}', "
+                      f"predicted '{classifier_label}'")
+            yield filename, values
+
+    results_stats_dic = calculates_results_stats(reported(records))
+    print_results({}, results_stats_dic, model)
+    return results_stats_dic
+
+
+def print_model_comparison(results_stats_dics):
+    """
+    Prints the summary statistics of several CNN models side by side.
+
+    Used when check_images.py classifies with several architectures in a
+    single run, to make it easy to pick the 'best' model.
+
+    Parameters:
+      results_stats_dics (dict) - Maps each model name (e.g. 'resnet' or
+                                  'ensemble') to its results statistics
+                                  dictionary from calculates_results_stats()
+    Returns:
+      None - Prints results to console
+
+    Example Output:
+      *** Side-by-Side Model Comparison ***
+                                              RESNET   ALEXNET       VGG
+      Overall Match Accuracy:                  82.5%     75.0%     87.5%
+      ...
+    """
+    names = list(results_stats_dics)
+    width = 35 + 10 * len(names)
+
+    print("\n" + "="*width)
+    print("*** Side-by-Side Model Comparison ***")
+    print("="*width)
+    print(f"{'':<35}" + "".join(f"{name.upper():>10}" for name in names))
+
+    # Image counts are the same for every model
+    first_stats = results_stats_dics[names[0]]
+    print(f"{'Total Images Processed:':<35}" + f"{first_stats['n_images']:>10}")
+    print(f"{'Dog Images:':<35}" + f"{first_stats['n_dogs_img']:>10}")
+    print(f"{'Non-Dog Images:':<35}" + f"{first_stats['n_notdogs_img']:>10}")
+
+    rows = [('Overall Match Accuracy:', 'pct_match'),
+            ('Dog Detection Accuracy:', 'pct_correct_dogs'),
+            ('Breed Identification Accuracy:', 'pct_correct_breed'),
+            ('Non-Dog Classification Accuracy:', 'pct_correct_notdogs')]
+    if 'pct_topk_match' in first_stats:
+        k = first_stats['topk']
+        rows += [(f'Top-{k} Match Accuracy:', 'pct_topk_match'),
+                 (f'Top-{k} Breed Accuracy:', 'pct_topk_correct_breed')]
+    for title, key in rows:
+        print(f"{title:<35}" + "".join(f"{results_stats_dics[name][key]:>9.1f}%"
+                                       for name in names))
+    print("="*width)
+
+
+def print_breed_stats(breed_metrics, model):
+    """
+    Prints the precision and recall of every dog breed for one CNN model.
+
+    Parameters:
+      breed_metrics (dict) - Per-breed metrics from
+                             ResultsStats.breed_metrics()
+      model (str) - CNN model architecture (or 'ensemble')
+    Returns:
+      None - Prints results to console
+
+    Example Output:
+      *** Per-Breed Results for VGG CNN Model ***
+      BREED                          IMAGES  PREDICTED  PRECISION    RECALL
+      basset hound                        1          1     100.0%    100.0%
+      ...
+    """
+    print("\n" + "="*70)
+    print(f"*** Per-Breed Results for {model.upper()} CNN Model ***")
+    print("="*70)
+    print(f"{'BREED':<30}{'IMAGES':>8}{'PREDICTED':>11}{'PRECISION':>11}{'RECALL':>10}")
+    for breed, metrics in sorted(breed_metrics.items()):
+        print(f"{breed[:29]:<30}{metrics['n_images']:>8}{metrics['n_predicted']:>11}"
+              f"{metrics['pct_precision']:>10.1f}%{metrics['pct_recall']:>9.1f}%")
+    print("="*70)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/profiling.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Profiling mode for --profile. The first batches of a run (as
+#          many as --profile-batches) are wrapped in torch.profiler, which
+#          records every operator the models run; the profile is exported
+#          as a Chrome trace (open it in chrome://tracing or Perfetto) and
+#          as tables of the operators by time and by input shape. The Python
+#          side - classification and the lab check and results printers -
+#          is profiled with cProfile and dumped as a pstats file together
+#          with a text summary. Nothing here is imported or called unless
+#          --profile is given.
+#
+##
+# Imports python modules
+import cProfile
+import io
+import os
+import pstats
+
+# Files written to the profile directory
+TORCH_TRACE_FILE = 'torch_trace.json'
+TORCH_OPERATORS_FILE = 'torch_operators.txt'
+PYTHON_STATS_FILE = 'python.pstats'
+PYTHON_SUMMARY_FILE = 'python_stats.txt'
+
+# Number of rows of the operator and function tables
+TABLE_ROWS = 40
+
+
+class BatchProfiler:
+    """
+    Records the operators of the first n_batches classification batches
+    with torch.profiler.
+
+    classifier._classify_sessions() calls step() before every batch: the
+    profiler starts with the first batch, so building the models is not
+    recorded, and once n_batches batches have been recorded it is stopped
+    and its results exported, so later batches run without it. finish()
+    exports the results of runs with fewer batches.
+
+    Parameters:
+      profile_dir (str) - Directory the results are written to
+      n_batches (int) - Number of batches to record
+
+    Example:
+      >>> profiler = BatchProfiler('.profile', n_batches=3)
+      >>> for batch in batches:
+      ...     profiler.step()
+      ...     session.forward(batch)
+      >>> profiler.finish()
+    """
+
+    def __init__(self, profile_dir, n_batches):
+        self.profile_dir = profile_dir
+        self.n_batches = n_batches
+        self.batches = 0
+        self._profile = None
+        self._exported = False
+
+    def step(self):
+        """
+        Marks the start of a batch: starts recording before the first batch
+        and stops once n_batches batches have been recorded.
+        """
+        if self._exported:
+            return
+        if self._profile is None:
+            # torch is only imported when a profile is actually taken
+            import torch.profiler
+
+            self._profile = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU],
+                record_shapes=True, profile_memory=True)
+            self._profile.__enter__()
+        elif self.batches >= self.n_batches:
+            self.finish()
+            return
+        else:
+            self._profile.step()
+        self.batches += 1
+
+    def finish(self):
+        """Stops recording, if still running, and exports the results."""
+        if self._profile is None or self._exported:
+            return
+        self._profile.__exit__(None, None, None)
+        self._exported = True
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self._profile.export_chrome_trace(os.path.join(self.profile_dir, TORCH_TRACE_FILE))
+        averages = self._profile.key_averages()
+        by_shape = self._profile.key_averages(group_by_input_shape=True)
+        with open(os.path.join(self.profile_dir, TORCH_OPERATORS_FILE), 'w') as outfile:
+            outfile.write(f"Operators of the first {self.batches} batches, "
+                          f"by self CPU time\n\n")
+            outfile.write(averages.table(sort_by='self_cpu_time_total', row_limit=TABLE_ROWS))
+            outfile.write("\n\nOperators by input shape, by self CPU time\n\n")
+            outfile.write(by_shape.table(sort_by='self_cpu_time_total', row_limit=TABLE_ROWS))
+
+
+class PythonProfiler:
+    """
+    cProfile profile of the Python side of a run, collected over any number
+    of enable()/disable() sections and written out by dump().
+
+    Parameters:
+      profile_dir (str) - Directory the results are written to
+    """
+
+    def __init__(self, profile_dir):
+        self.profile_dir = profile_dir
+        self._profile = cProfile.Profile()
+
+    def enable(self):
+        """Starts (or resumes) profiling."""
+        self._profile.enable()
+
+    def disable(self):
+        """Pauses profiling."""
+        self._profile.disable()
+
+    def dump(self):
+        """
+        Writes the pstats file and a text summary of the slowest functions by
+        cumulative and by own time.
+        """
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self._profile.dump_stats(os.path.join(self.profile_dir, PYTHON_STATS_FILE))
+        summary = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=summary)
+        stats.sort_stats('cumulative').print_stats(TABLE_ROWS)
+        stats.sort_stats('tottime').print_stats(TABLE_ROWS)
+        with open(os.path.join(self.profile_dir, PYTHON_SUMMARY_FILE), 'w') as outfile:
+            outfile.write(summary.getvalue())
+
+
+def print_profile_files(profile_dir):
+    """Prints the files written to profile_dir by a profiling run."""
+    print("\nProfile written to " + profile_dir + ":")
+    for name in (TORCH_TRACE_FILE, TORCH_OPERATORS_FILE, PYTHON_STATS_FILE,
+                 PYTHON_SUMMARY_FILE):
+        if os.path.exists(os.path.join(profile_dir, name)):
+            print(f"  {name}")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/results_stats.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Vectorized statistics over a ResultsTable. The counts reported by
+#          calculates_results_stats() are taken with boolean masks over the
+#          table's columns, and a confusion matrix of true pet label against
+#          predicted label is built with a single np.bincount, from which
+#          the precision and recall of every dog breed follow. Statistics
+#          can be computed for a range of rows (a shard) and merged, so the
+#          statistics of a very large run can be computed piece by piece -
+#          also from separately built tables, e.g. in other processes.
+#
+##
+# Imports python modules
+import numpy as np
+
+# Counts kept by ResultsStats, as named in the results statistics dictionary
+COUNTS = ('n_images', 'n_dogs_img', 'n_match', 'n_correct_dogs',
+          'n_correct_notdogs', 'n_correct_breed')
+
+
+def predicted_label_ids(table, pet_ids, classifier_ids, matches):
+    """
+    Maps every classification to the label it predicts, in the label ids of
+    table: the pet label itself when the labels match, otherwise the first
+    comma-separated term of the classifier label that is a known label (pet
+    labels are interned as the table is built), or else the classifier label.
+
+    Parameters:
+      table (ResultsTable) - Table whose interned labels the ids refer to
+      pet_ids (numpy.ndarray) - Pet label id of every image
+      classifier_ids (numpy.ndarray) - Classifier label id of every image
+      matches (numpy.ndarray) - Label match indicator of every image
+    Returns:
+      numpy.ndarray - Predicted label id (int64) of every image
+    """
+    # Label ids are small, so the labels in use are found with a bincount
+    # rather than by sorting, and each is mapped once
+    mapped = np.arange(len(table.labels), dtype=np.int64)
+    in_use = np.bincount(classifier_ids, minlength=len(table.labels))
+    for label_id in np.flatnonzero(in_use).tolist():
+        for term in table.labels[label_id].split(','):
+            term_id = table.label_id(term.strip())
+            if term_id is not None:
+                mapped[label_id] = term_id
+                break
+    return np.where(matches == 1, pet_ids, mapped[classifier_ids])
+
+
+class ResultsStats:
+    """
+    Counts and label confusion matrix of a set of classification results.
+
+    Label ids refer to the interned labels of the table the statistics were
+    computed from. Statistics of tables with other labels are matched up by
+    label when they are merged.
+
+    Parameters:
+      labels (list) - Interned labels of the table (ResultsTable.labels)
+      counts (dict) - Value of each name in COUNTS
+      confusion (numpy.ndarray) - Square matrix of image counts indexed by
+                                  (true pet label id, predicted label id)
+      dog_images (numpy.ndarray) - Number of dog images of each pet label id
+
+    Example:
+      >>> shards = [ResultsStats.from_table(table, start, start + 1000000)
+      ...           for start in range(0, len(table), 1000000)]
+      >>> merged = merge_stats(shards)
+      >>> merged.counts()['n_match']
+      8123456
+    """
+
+    def __init__(self, labels, counts, confusion, dog_images):
+        self.labels = labels
+        self._counts = counts
+        self.confusion = confusion
+        self.dog_images = dog_images
+
+    @classmethod
+    def from_table(cls, table, start=0, stop=None):
+        """
+        Computes the statistics of rows start to stop of a ResultsTable whose
+        classification and is-a-dog columns are set.
+
+        Parameters:
+          table (ResultsTable) - Table of results
+          start (int) - First row (default: 0)
+          stop (int) - Row after the last one (default: the end of the table)
+        Returns:
+          ResultsStats - Statistics of the rows
+        """
+        rows = slice(start, stop)
+        pet_ids = table.column('pet_label_id')[rows].astype(np.int64)
+        classifier_ids = table.column('classifier_label_id')[rows]
+        matches = table.column('match')[rows]
+        pet_is_dog = table.column('pet_is_dog')[rows] == 1
+        classifier_is_dog = table.column('classifier_is_dog')[rows] == 1
+        is_match = matches == 1
+
+        counts = {
+            'n_images': len(pet_ids),
+            'n_dogs_img': int(np.count_nonzero(pet_is_dog)),
+            'n_match': int(np.count_nonzero(is_match)),
+            'n_correct_dogs': int(np.count_nonzero(pet_is_dog & classifier_is_dog)),
+            'n_correct_notdogs': int(np.count_nonzero(~pet_is_dog & ~classifier_is_dog)),
+            'n_correct_breed': int(np.count_nonzero(pet_is_dog & is_match)),
+        }
+
+        # One bincount over the flattened (true id, predicted id) index
+        n_labels = len(table.labels)
+        predicted = predicted_label_ids(table, pet_ids, classifier_ids, matches)
+        confusion = np.bincount(pet_ids * n_labels + predicted,
+                                minlength=n_labels * n_labels).reshape(n_labels, n_labels)
+        dog_images = np.bincount(pet_ids[pet_is_dog], minlength=n_labels)
+        return cls(table.labels, counts, confusion, dog_images)
+
+    def counts(self):
+        """Returns a new dictionary of the counts named in COUNTS."""
+        return dict(self._counts)
+
+    def merge(self, other):
+        """
+        Returns the statistics of both sets of results together. When other
+        was computed from a table with different labels (e.g. a shard built
+        in another process), its label ids are mapped to these labels by
+        label, and labels only other has are added after them.
+        """
+        labels = self.labels
+        if other.labels is self.labels:
+            other_ids = np.arange(len(other.confusion))
+        else:
+            labels = list(self.labels)
+            label_ids = {label: label_id for label_id, label in enumerate(labels)}
+            other_ids = np.empty(len(other.confusion), dtype=np.int64)
+            for label_id, label in enumerate(other.labels[:len(other.confusion)]):
+                if label not in label_ids:
+                    label_ids[label] = len(labels)
+                    labels.append(label)
+                other_ids[label_id] = label_ids[label]
+        # Labels interned after one part was computed only widen the matrix
+        n_labels = max(len(self.confusion), int(other_ids.max(initial=-1)) + 1)
+        confusion = np.zeros((n_labels, n_labels), dtype=np.int64)
+        dog_images = np.zeros(n_labels, dtype=np.int64)
+        size = len(self.confusion)
+        confusion[:size, :size] += self.confusion
+        dog_images[:size] += self.dog_images
+        # Interned labels are distinct, so other_ids has no repeats
+        confusion[np.ix_(other_ids, other_ids)] += other.confusion
+        dog_images[other_ids] += other.dog_images
+        counts = {name: self._counts[name] + other._counts[name] for name in COUNTS}
+        return ResultsStats(labels, counts, confusion, dog_images)
+
+    def breed_metrics(self):
+        """
+        Returns the precision and recall of every dog breed among the pet
+        labels.
+
+        Returns:
+          dict - Maps each breed (str) to a dict with keys 'n_images' (dog
+                 images of the breed), 'n_predicted' (images predicted as
+                 the breed), 'n_correct', 'pct_precision' and 'pct_recall'
+        """
+        correct = np.diagonal(self.confusion)
+        n_true = self.confusion.sum(axis=1)
+        n_predicted = self.confusion.sum(axis=0)
+        metrics = {}
+        for label_id in np.flatnonzero(self.dog_images).tolist():
+            metrics[self.labels[label_id]] = {
+                'n_images': int(n_true[label_id]),
+                'n_predicted': int(n_predicted[label_id]),
+                'n_correct': int(correct[label_id]),
+                'pct_precision': (float(correct[label_id] / n_predicted[label_id]) * 100.0
+                                  if n_predicted[label_id] > 0 else 0.0),
+                'pct_recall': (float(correct[label_id] / n_true[label_id]) * 100.0
+                               if n_true[label_id] > 0 else 0.0),
+            }
+        return metrics
+
+
+def merge_stats(parts):
+    """
+    Merges the statistics of several shards, of one table or of separately
+    built tables.
+
+    Parameters:
+      parts (iterable) - ResultsStats of each shard (at least one)
+    Returns:
+      ResultsStats - Statistics of all shards together
+    """
+    parts = iter(parts)
+    merged = next(parts)
+    for part in parts:
+        merged = merged.merge(part)
+    return merged
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/results_table.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Columnar, memory-compact replacement for the results dictionary.
+#          Instead of one Python list of strings and ints per image, a
+#          ResultsTable keeps one NumPy array per column (pet label,
+#          classifier label, ImageNet class id, label match and the two
+#          is-a-dog flags) - 15 bytes per image. Labels are interned: every
+#          distinct label string is stored once and the columns hold its id.
+#          A filename index maps each image to its row. Classification
+#          results and is-a-dog flags are set for all rows at once, with any
+#          string work done once per distinct label rather than once per
+#          image. The table also behaves
+#          like a read-only results dictionary (filename -> results list), so
+#          the lab check and print functions work on it unchanged.
+#
+##
+# Imports python modules
+from collections.abc import Mapping
+
+import numpy as np
+
+# Columns of a ResultsTable in the order of a results dictionary list; -1
+# marks a value that has not been set yet
+COLUMNS = (
+    ('pet_label_id', np.int32),
+    ('classifier_label_id', np.int32),
+    ('class_id', np.int32),
+    ('match', np.int8),
+    ('pet_is_dog', np.int8),
+    ('classifier_is_dog', np.int8),
+)
+
+
+class ResultsTable(Mapping):
+    """
+    Results of classifying a set of images, stored column by column.
+
+    Rows are added with table[filename] = [pet_label] (as for a results
+    dictionary), then classify_images() fills in the classification columns
+    with set_classifications() and adjust_results4_isadog() the is-a-dog
+    flags with set_is_dog(). Reading table[filename] returns a new results
+    list with as many of the five results dictionary values as have been set
+    for that image; changing that list does not change the table.
+
+    Parameters:
+      capacity (int) - Number of rows allocated up front; the columns grow
+                       as needed (default: 1024)
+
+    Example:
+      >>> table = ResultsTable()
+      >>> table['Collie_03797.jpg'] = ['collie']
+      >>> table['Collie_03797.jpg']
+      ['collie']
+      >>> table.column('pet_label_id')
+      array([0], dtype=int32)
+    """
+
+    def __init__(self, capacity=1024):
+        self._n = 0
+        self._columns = {name: np.full(max(capacity, 1), -1, dtype=dtype)
+                         for name, dtype in COLUMNS}
+        self._index = {}
+        self._index_shared = False
+        # Interned labels: id -> label and label -> id; shared by copies,
+        # which only ever append to them
+        self.labels = []
+        self._label_ids = {}
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Builds a table from (filename, results list) records, e.g. the items
+        of a results dictionary or the records of iter_pet_labels().
+        """
+        table = cls()
+        for filename, values in records:
+            table[filename] = values
+        return table
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __contains__(self, filename):
+        return filename in self._index
+
+    def __getitem__(self, filename):
+        row = self._index[filename]
+        columns = self._columns
+        values = [self.labels[columns['pet_label_id'][row]]]
+        if columns['classifier_label_id'][row] >= 0:
+            values += [self.labels[columns['classifier_label_id'][row]],
+                       int(columns['match'][row])]
+        if columns['pet_is_dog'][row] >= 0:
+            values += [int(columns['pet_is_dog'][row]),
+                       int(columns['classifier_is_dog'][row])]
+        return values
+
+    def __setitem__(self, filename, values):
+        """
+        Sets the row of filename from a results list of 1, 3 or 5 values
+        (pet label, classifier label, match, pet is-a-dog, classifier
+        is-a-dog), adding the row if the image is new. Values beyond the
+        given ones are reset to unset.
+        """
+        if len(values) not in (1, 3, 5):
+            raise ValueError(f"results list must have 1, 3 or 5 values, got {len(values)}")
+        row = self._index.get(filename)
+        if row is None:
+            row = self._append(filename)
+        else:
+            for name, _ in COLUMNS[1:]:
+                self._columns[name][row] = -1
+        self._columns['pet_label_id'][row] = self.intern(values[0])
+        if len(values) >= 3:
+            self._columns['classifier_label_id'][row] = self.intern(values[1])
+            self._columns['match'][row] = values[2]
+        if len(values) == 5:
+            self._columns['pet_is_dog'][row] = values[3]
+            self._columns['classifier_is_dog'][row] = values[4]
+
+    def _append(self, filename):
+        # Adds an empty row for filename and returns its index
+        if self._index_shared:
+            self._index = dict(self._index)
+            self._index_shared = False
+        if self._n == len(self._columns['pet_label_id']):
+            for name, column in self._columns.items():
+                grown = np.full(2 * len(column), -1, dtype=column.dtype)
+                grown[:self._n] = column
+                self._columns[name] = grown
+        row = self._n
+        self._index[filename] = row
+        self._n += 1
+        return row
+
+    def intern(self, label):
+        """Returns the id of label, adding it to the labels if it is new."""
+        label_id = self._label_ids.get(label)
+        if label_id is None:
+            label_id = len(self.labels)
+            self.labels.append(label)
+            self._label_ids[label] = label_id
+        return label_id
+
+    def label_id(self, label):
+        """Returns the id of label, or None when it is not a known label."""
+        return self._label_ids.get(label)
+
+    def column(self, name):
+        """
+        Returns a read-only view of one column (see COLUMNS), one value per
+        row in the order the images were added.
+        """
+        view = self._columns[name][:self._n]
+        view.flags.writeable = False
+        return view
+
+    def label_counts(self, name='pet_label_id'):
+        """
+        Returns the number of images of every distinct label in one label
+        column, as a dict of label (str) -> count (int).
+        """
+        column = self._columns[name][:self._n]
+        counts = np.bincount(column[column >= 0], minlength=len(self.labels))
+        return {self.labels[label_id]: int(counts[label_id])
+                for label_id in np.flatnonzero(counts).tolist()}
+
+    def rows(self, filenames):
+        """Returns the row index (numpy.ndarray of int64) of every filename."""
+        return np.fromiter((self._index[filename] for filename in filenames),
+                           dtype=np.int64, count=len(filenames))
+
+    def _unique_pairs(self, first, second):
+        # Returns the first row holding each distinct (first, second) id pair
+        # and, for every row, the index of its pair
+        keys = (first.astype(np.int64) << 32) | second.astype(np.int64)
+        _, pair_rows, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        return pair_rows, inverse
+
+    def set_classifications(self, filenames, class_ids, class_labels, pet_label_classes):
+        """
+        Sets the classification columns of the given images from their
+        predicted class ids. Each predicted class's label is interned once,
+        and the match indicators are read from a table of one row per
+        distinct pet label and one column per class.
+
+        Parameters:
+          filenames (list) - Images to set, all already in the table
+          class_ids (list) - Predicted class id of each image
+          class_labels (list) - Normalized classifier label of every class
+                                id, e.g. LabelIndex.class_labels
+          pet_label_classes (callable) - pet_label_classes(pet label) returns
+                                         the class ids matching the pet
+                                         label; called once per distinct
+                                         pet label
+        Returns:
+          None
+        """
+        rows = self.rows(filenames)
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        pet_ids = self._columns['pet_label_id'][rows]
+
+        # Match indicators of every distinct pet label against every class
+        pet_label_ids = np.flatnonzero(np.bincount(pet_ids, minlength=len(self.labels)))
+        match_row = np.zeros(len(self.labels), dtype=np.int64)
+        match_row[pet_label_ids] = np.arange(len(pet_label_ids))
+        class_matches = np.zeros((len(pet_label_ids), len(class_labels)), dtype=np.int8)
+        for row, label_id in enumerate(pet_label_ids.tolist()):
+            class_matches[row, sorted(pet_label_classes(self.labels[label_id]))] = 1
+
+        # Label id of every predicted class
+        class_label_ids = np.full(len(class_labels), -1, dtype=np.int32)
+        for class_id in np.flatnonzero(np.bincount(class_ids,
+                                                   minlength=len(class_labels))).tolist():
+            class_label_ids[class_id] = self.intern(class_labels[class_id])
+
+        self._columns['class_id'][rows] = class_ids
+        self._columns['classifier_label_id'][rows] = class_label_ids[class_ids]
+        self._columns['match'][rows] = class_matches[match_row[pet_ids], class_ids]
+
+    def set_is_dog(self, flags):
+        """
+        Sets the two is-a-dog columns of every image.
+
+        Parameters:
+          flags (callable) - flags(pet label, classifier label) returns the
+                             [pet is-a-dog, classifier is-a-dog] indicators;
+                             it is called once per distinct label pair
+        Returns:
+          None
+        Raises:
+          ValueError - Some images have not been classified yet
+        """
+        pet_ids = self._columns['pet_label_id'][:self._n]
+        classifier_ids = self._columns['classifier_label_id'][:self._n]
+        if self._n and classifier_ids.min() < 0:
+            raise ValueError("every image must be classified before the is-a-dog flags are set")
+        pair_rows, inverse = self._unique_pairs(pet_ids, classifier_ids)
+        pair_flags = np.array([flags(self.labels[pet_ids[row]],
+                                     self.labels[classifier_ids[row]])
+                               for row in pair_rows.tolist()],
+                              dtype=np.int8).reshape(-1, 2)
+        self._columns['pet_is_dog'][:self._n] = pair_flags[inverse, 0]
+        self._columns['classifier_is_dog'][:self._n] = pair_flags[inverse, 1]
+
+    def set_is_dog_by_class(self, pet_label_is_dog, class_is_dog):
+        """
+        Sets the two is-a-dog columns of every image from the class id
+        column: the classifier flags by indexing class_is_dog with all class
+        ids at once, the pet flags once per distinct pet label.
+
+        Parameters:
+          pet_label_is_dog (callable) - pet_label_is_dog(pet label) returns
+                                        the pet is-a-dog indicator
+          class_is_dog (numpy.ndarray) - Is-a-dog flag of every class id
+        Returns:
+          None
+        Raises:
+          ValueError - Some images have no class id
+        """
+        pet_ids = self._columns['pet_label_id'][:self._n]
+        class_ids = self._columns['class_id'][:self._n]
+        if self._n and class_ids.min() < 0:
+            raise ValueError("every image must have a class id")
+        label_flags = np.zeros(len(self.labels), dtype=np.int8)
+        for label_id in np.flatnonzero(np.bincount(pet_ids, minlength=len(self.labels))).tolist():
+            label_flags[label_id] = pet_label_is_dog(self.labels[label_id])
+        self._columns['pet_is_dog'][:self._n] = label_flags[pet_ids]
+        self._columns['classifier_is_dog'][:self._n] = class_is_dog[class_ids]
+
+    def copy(self, classified=True):
+        """
+        Returns a copy of the table. The copy shares the filename index
+        (until either table adds a row) and the interned labels.
+
+        Parameters:
+          classified (bool) - Copy the classification and is-a-dog columns
+                              too; otherwise only the pet labels are copied
+                              (default: True)
+        Returns:
+          ResultsTable - The copy
+        """
+        table = ResultsTable.__new__(ResultsTable)
+        table._n = self._n
+        table._columns = {}
+        for name, column in self._columns.items():
+            if classified or name == 'pet_label_id':
+                table._columns[name] = column.copy()
+            else:
+                table._columns[name] = np.full(len(column), -1, dtype=column.dtype)
+        table._index = self._index
+        table._index_shared = self._index_shared = True
+        table.labels = self.labels
+        table._label_ids = self._label_ids
+        return table
+
+    @property
+    def nbytes(self):
+        """Number of bytes allocated for the columns."""
+        return sum(column.nbytes for column in self._columns.values())
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/run_journal.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Crash-safe journal of a classification run, so that a long run
+#          which dies part way through can be resumed instead of starting
+#          over. The journal is an SQLite database in WAL mode; as every
+#          batch of images is classified, each image's pet label, predicted
+#          ImageNet class id and label and label match flag are appended
+#          under the run's id. Rows are buffered and committed together,
+#          at most every commit_rows rows or commit_seconds seconds, so
+#          journaling costs next to nothing per batch and a crash loses at
+#          most the last uncommitted rows.
+#
+##
+# Imports python modules
+import json
+import os
+import sqlite3
+from time import localtime, strftime, time
+
+# Default location of the journal database
+DEFAULT_JOURNAL_PATH = '.run_journal.sqlite'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    settings TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    pet_label TEXT NOT NULL,
+    class_id INTEGER NOT NULL,
+    classifier_label TEXT NOT NULL,
+    is_match INTEGER NOT NULL,
+    PRIMARY KEY (run_id, model, filename)
+) WITHOUT ROWID;
+"""
+
+# Number of filenames per lookup query, below SQLite's variable limit
+_LOOKUP_CHUNK = 500
+
+
+class RunJournal:
+    """
+    Append-only journal of the per-image results of one classification run.
+
+    A new run is started when run_id is None; its id is available as
+    journal.run_id and is what --resume takes to continue it. Resuming
+    checks that the run was started with the same settings, since mixing
+    predictions of different models or preprocessing would make the
+    results meaningless.
+
+    Parameters:
+      journal_path (str) - Path of the SQLite database (default:
+                           DEFAULT_JOURNAL_PATH)
+      run_id (str) - Id of the run to resume, or None to start a new run
+                     (default: None)
+      settings (dict) - JSON-serializable settings the run's predictions
+                        depend on, e.g. architectures and precision
+                        (default: None)
+      commit_rows (int) - Commit once this many rows are buffered
+                          (default: 1000)
+      commit_seconds (float) - Commit buffered rows at least this often
+                               (default: 5.0)
+    Raises:
+      KeyError - run_id is not in the journal
+      ValueError - run_id was started with different settings
+
+    Example:
+      >>> with RunJournal(settings={'arch': 'vgg'}) as journal:
+      ...     journal.record('vgg', [('Collie_03797.jpg', 'collie', 231,
+      ...                             'collie', 1)])
+      >>> RunJournal(run_id=journal.run_id).lookup('vgg', ['Collie_03797.jpg'])
+      {'Collie_03797.jpg': (231, 'collie')}
+    """
+
+    def __init__(self, journal_path=DEFAULT_JOURNAL_PATH, run_id=None, settings=None,
+                 commit_rows=1000, commit_seconds=5.0):
+        self.journal_path = journal_path
+        self.commit_rows = commit_rows
+        self.commit_seconds = commit_seconds
+        self.resumed = run_id is not None
+        self._buffer = []
+        self._last_commit = time()
+
+        # WAL lets readers inspect the journal while a run is writing it;
+        # synchronous=NORMAL only fsyncs at checkpoints, which still never
+        # corrupts the database on a crash
+        self.connection = sqlite3.connect(journal_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(_SCHEMA)
+
+        settings_json = json.dumps(settings or {}, sort_keys=True)
+        if run_id is None:
+            run_id = self.new_run_id()
+            with self.connection:
+                self.connection.execute('INSERT INTO runs VALUES (?, ?, ?)',
+                                        (run_id, time(), settings_json))
+        else:
+            row = self.connection.execute('SELECT settings FROM runs WHERE run_id = ?',
+                                          (run_id,)).fetchone()
+            if row is None:
+                self.connection.close()
+                raise KeyError(f"run {run_id!r} not found in {journal_path}")
+            if settings is not None and row[0] != settings_json:
+                self.connection.close()
+                raise ValueError(f"run {run_id!r} was started with settings {row[0]}, "
+                                 f"not {settings_json}")
+        self.run_id = run_id
+
+    @staticmethod
+    def new_run_id():
+        """Returns a new run id made of the local time and the process id."""
+        return f"{strftime('%Y%m%d-%H%M%S', localtime())}-{os.getpid()}"
+
+    def record(self, model_name, rows):
+        """
+        Appends the results of a batch of images for one model. The rows
+        are committed together with other buffered rows (see commit()).
+
+        Parameters:
+          model_name (str) - CNN model architecture (or 'ensemble')
+          rows (iterable) - (filename, pet label, class id, classifier label,
+                            match indicator) tuples
+        Returns:
+          None
+        """
+        self._buffer.extend((self.run_id, model_name) + tuple(row) for row in rows)
+        if len(self._buffer) >= self.commit_rows or \
+                time() - self._last_commit >= self.commit_seconds:
+            self.commit()
+
+    def commit(self):
+        """Writes every buffered row to the journal in one transaction."""
+        if self._buffer:
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    self._buffer)
+            self._buffer = []
+        self._last_commit = time()
+
+    def lookup(self, model_name, filenames):
+        """
+        Returns the journaled predictions of one model for the given images.
+
+        Parameters:
+          model_name (str) - CNN model architecture (or 'ensemble')
+          filenames (list) - Filenames of the images to look up
+        Returns:
+          dict - Maps the filename of every journaled image to a
+                 (class id, classifier label) tuple; images that are not
+                 journaled are left out
+        """
+        # Buffered rows are only committed first when they are among the
+        # images looked up, so lookups do not break up batched commits
+        if self._buffer:
+            wanted = set(filenames)
+            if any(row[1] == model_name and row[2] in wanted for row in self._buffer):
+                self.commit()
+        journaled = {}
+        for start in range(0, len(filenames), _LOOKUP_CHUNK):
+            chunk = filenames[start:start + _LOOKUP_CHUNK]
+            query = ('SELECT filename, class_id, classifier_label FROM results '
+                     'WHERE run_id = ? AND model = ? AND filename IN '
+                     f"({', '.join('?' * len(chunk))})")
+            for filename, class_id, label in self.connection.execute(
+                    query, [self.run_id, model_name] + list(chunk)):
+                journaled[filename] = (class_id, label)
+        return journaled
+
+    def count(self, model_name=None):
+        """
+        Returns the number of images journaled for the run, for one model
+        or for all models together.
+        """
+        self.commit()
+        query = 'SELECT COUNT(*) FROM results WHERE run_id = ?'
+        params = [self.run_id]
+        if model_name is not None:
+            query += ' AND model = ?'
+            params.append(model_name)
+        return self.connection.execute(query, params).fetchone()[0]
+
+    def close(self):
+        """Commits the buffered rows and closes the database."""
+        self.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
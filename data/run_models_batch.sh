@@ -9,6 +9,6 @@
 #
 # Usage: sh run_models_batch.sh    -- will run program from commandline within Project Workspace
 #  
-python check_images.py --dir pet_images/ --arch resnet  --dogfile dognames.txt > resnet_pet-images.txt
-python check_images.py --dir pet_images/ --arch alexnet --dogfile dognames.txt > alexnet_pet-images.txt
-python check_images.py --dir pet_images/ --arch vgg  --dogfile dognames.txt > vgg_pet-images.txt
+python check_images.py --dir pet_images/ --arch resnet  --dogfile dognames.txt --tensor-store pet_images.store > resnet_pet-images.txt
+python check_images.py --dir pet_images/ --arch alexnet --dogfile dognames.txt --tensor-store pet_images.store > alexnet_pet-images.txt
+python check_images.py --dir pet_images/ --arch vgg  --dogfile dognames.txt --tensor-store pet_images.store > vgg_pet-images.txt
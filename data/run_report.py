@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/run_report.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Stage instrumentation of a run for --timing-report and
+#          --memory-report. A StageTimer records the wall and CPU time of
+#          every stage of check_images (argument parsing, image discovery,
+#          classification, the is-a-dog check, statistics, printing, ...),
+#          and a LatencyRecorder the per-image latency of decoding,
+#          preprocessing and the forward pass of every model, from which
+#          p50/p95/p99 latencies, histograms and throughput in images/sec
+#          are computed. With memory tracking on, a MemoryTracker adds the
+#          resident set size (RSS) before and after every stage, the peak
+#          RSS within it and optionally the top tracemalloc allocation
+#          sites, as well as the peak memory growth of every classification
+#          batch. Everything is written, together with a manifest of the
+#          run's settings and software versions, as a JSON run report.
+#
+##
+# Imports python modules
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from array import array
+from time import perf_counter, process_time, strftime
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+# Latency percentiles reported for every stage
+PERCENTILES = (50, 95, 99)
+
+# Upper bounds (milliseconds) of the latency histogram buckets; the last
+# bucket holds everything slower
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Linux interface to the process's memory use and to resetting its peak RSS
+PROC_STATUS = '/proc/self/status'
+PROC_CLEAR_REFS = '/proc/self/clear_refs'
+
+
+def memory_usage():
+    """
+    Returns the current and the peak resident set size of this process.
+
+    On Linux both come from /proc/self/status (VmRSS and VmHWM); elsewhere
+    only the peak is known, from getrusage, and is returned for both.
+
+    Returns:
+      rss (int) - Resident set size in bytes
+      peak (int) - Peak resident set size in bytes since the process
+                   started or the peak was last reset
+    """
+    rss = peak = None
+    try:
+        with open(PROC_STATUS) as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if peak is None and resource is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != 'darwin':
+            peak *= 1024
+    peak = peak or 0
+    return (peak if rss is None else rss), peak
+
+
+class MemoryTracker:
+    """
+    Memory use of the stages and classification batches of a run.
+
+    The peak RSS within a stage or batch is measured by resetting the
+    process's peak RSS (Linux 4.0+, see PROC_CLEAR_REFS) when it starts and
+    reading it when it ends; where the peak cannot be reset it is the peak
+    since the process started. Batch peaks are relative to the RSS when the
+    batch started, so they show the memory the batch's decoded images,
+    tensors and activations took at their largest.
+
+    Parameters:
+      tracemalloc_top (int) - Number of top allocation sites recorded with
+                              tracemalloc at the end of every stage, or 0
+                              to leave tracemalloc off (default: 0)
+    """
+
+    def __init__(self, tracemalloc_top=0):
+        self.tracemalloc_top = tracemalloc_top
+        if tracemalloc_top:
+            tracemalloc.start()
+        self.batch_peaks = array('q')
+        self.batch_images = array('q')
+        self._stage_peak = 0
+        self._batch_rss = 0
+        self._can_reset = True
+        self._reset_peak()
+
+    def _reset_peak(self):
+        # Folds the peak so far into the stage's peak, then resets it
+        self._stage_peak = max(self._stage_peak, memory_usage()[1])
+        if self._can_reset:
+            try:
+                with open(PROC_CLEAR_REFS, 'w') as clear_refs:
+                    clear_refs.write('5')
+            except OSError:
+                self._can_reset = False
+
+    def stage_end(self):
+        """
+        Ends a stage: returns the RSS now and the peak RSS since the
+        previous stage ended, as bytes (rss, peak).
+        """
+        rss, peak = memory_usage()
+        peak = max(self._stage_peak, peak)
+        self._reset_peak()
+        self._stage_peak = 0
+        return rss, peak
+
+    def batch_start(self):
+        """Marks the start of a classification batch."""
+        self._reset_peak()
+        self._batch_rss = memory_usage()[0]
+
+    def batch_end(self, n_images):
+        """Records the peak memory growth of the batch that started last."""
+        self.batch_peaks.append(max(memory_usage()[1] - self._batch_rss, 0))
+        self.batch_images.append(n_images)
+
+    def top_allocations(self):
+        """
+        Returns the tracemalloc_top source lines holding the most memory
+        allocated through Python (NumPy arrays included, torch tensors
+        not), as a list of dicts with 'location', 'size_bytes' and 'count'.
+        """
+        if not self.tracemalloc_top:
+            return []
+        statistics = tracemalloc.take_snapshot().statistics('lineno')
+        return [{'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 'size_bytes': stat.size, 'count': stat.count}
+                for stat in statistics[:self.tracemalloc_top]]
+
+    def batch_summary(self):
+        """
+        Returns the number of batches and the largest, mean and per-image
+        peak memory growth of the classification batches.
+        """
+        if not self.batch_peaks:
+            return {'batches': 0}
+        peaks = list(self.batch_peaks)
+        return {'batches': len(peaks), 'max_peak_bytes': max(peaks),
+                'mean_peak_bytes': sum(peaks) / len(peaks),
+                'max_peak_bytes_per_image': max(peak / images for peak, images
+                                                in zip(peaks, self.batch_images))}
+
+
+class StageTimer:
+    """
+    Wall and CPU time of the stages of a run.
+
+    mark(stage) ends the stage that started at the previous mark (or when
+    the timer was created); marking the same stage again, e.g. once per
+    model, adds to its time. After track_memory() every stage also records
+    its RSS before (first time) and after (last time), its total RSS change,
+    its peak RSS and optionally its top tracemalloc allocation sites.
+
+    Example:
+      >>> timer = StageTimer()
+      >>> results = get_pet_labels('pet_images/')
+      >>> timer.mark('get_pet_labels')
+      >>> timer.stages['get_pet_labels']
+      {'wall_seconds': 0.004, 'cpu_seconds': 0.004, 'calls': 1}
+    """
+
+    def __init__(self):
+        self.start = self._last_wall = perf_counter()
+        self._last_cpu = process_time()
+        # Stage name -> {'wall_seconds', 'cpu_seconds', 'calls'}, in the
+        # order the stages were first marked
+        self.stages = {}
+        self.memory = None
+        self._last_rss = 0
+
+    def track_memory(self, tracemalloc_top=0):
+        """
+        Records the memory use of every stage from now on.
+
+        Parameters:
+          tracemalloc_top (int) - Number of top allocation sites recorded
+                                  per stage, 0 for none (default: 0)
+        Returns:
+          MemoryTracker - The tracker, whose batch methods the classifier
+                          calls
+        """
+        self.memory = MemoryTracker(tracemalloc_top)
+        self._last_rss = memory_usage()[0]
+        return self.memory
+
+    def mark(self, stage):
+        """Records that stage ended now; it started at the previous mark."""
+        wall, cpu = perf_counter(), process_time()
+        times = self.stages.setdefault(stage, {'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                               'calls': 0})
+        times['wall_seconds'] += wall - self._last_wall
+        times['cpu_seconds'] += cpu - self._last_cpu
+        times['calls'] += 1
+        if self.memory is not None:
+            rss, peak = self.memory.stage_end()
+            times.setdefault('rss_before_bytes', self._last_rss)
+            times['rss_after_bytes'] = rss
+            times['rss_change_bytes'] = times.get('rss_change_bytes', 0) + rss - self._last_rss
+            times['peak_rss_bytes'] = max(times.get('peak_rss_bytes', 0), peak)
+            if self.memory.tracemalloc_top:
+                times['tracemalloc_top'] = self.memory.top_allocations()
+            self._last_rss = rss
+        # Read last, so the time spent measuring memory is not counted
+        self._last_wall, self._last_cpu = perf_counter(), process_time()
+
+    def elapsed(self):
+        """Returns the wall seconds since the timer was created."""
+        return perf_counter() - self.start
+
+
+class LatencyRecorder:
+    """
+    Per-image latencies of the stages of classification, e.g. 'decode',
+    'preprocess' and 'forward/resnet'.
+
+    A stage that processes a whole batch at once (the forward pass) is
+    recorded once per image with the batch time divided by its size.
+    Latencies are kept in compact arrays of doubles.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+
+    def record(self, stage, seconds, n_images=1):
+        """Records the time one image (or a batch of n_images) took in stage."""
+        samples = self.latencies.get(stage)
+        if samples is None:
+            samples = self.latencies[stage] = array('d')
+        per_image = seconds / n_images
+        samples.extend([per_image] * n_images)
+
+    def summary(self):
+        """
+        Returns the latency statistics of every stage.
+
+        Returns:
+          dict - Maps each stage to a dict with 'images', 'total_seconds',
+                 'images_per_second', 'mean_ms', 'max_ms', 'p50_ms',
+                 'p95_ms', 'p99_ms' and 'histogram' (bucket upper bounds
+                 'bounds_ms' and 'counts', one more count than bounds)
+        """
+        # numpy is imported here rather than at the top so that the stage
+        # timer, created before any other import, does not import it
+        import numpy as np
+
+        summary = {}
+        for stage, samples in self.latencies.items():
+            milliseconds = np.frombuffer(samples, dtype=np.float64) * 1e3
+            total = float(milliseconds.sum()) / 1e3
+            stats = {'images': len(milliseconds), 'total_seconds': total,
+                     'images_per_second': len(milliseconds) / total if total > 0 else 0.0,
+                     'mean_ms': float(milliseconds.mean()),
+                     'max_ms': float(milliseconds.max())}
+            for percentile, value in zip(PERCENTILES,
+                                         np.percentile(milliseconds, PERCENTILES)):
+                stats[f"p{percentile}_ms"] = float(value)
+            counts = np.bincount(np.searchsorted(HISTOGRAM_BOUNDS_MS, milliseconds),
+                                 minlength=len(HISTOGRAM_BOUNDS_MS) + 1)
+            stats['histogram'] = {'bounds_ms': list(HISTOGRAM_BOUNDS_MS),
+                                  'counts': counts.tolist()}
+            summary[stage] = stats
+        return summary
+
+
+def run_manifest(in_arg):
+    """
+    Returns the settings and environment of a run: the command line
+    arguments, thread counts and the versions of Python and the libraries.
+
+    Parameters:
+      in_arg (argparse.Namespace) - Command line arguments
+    Returns:
+      dict - JSON-serializable manifest
+    """
+    manifest = {
+        'created': strftime('%Y-%m-%d %H:%M:%S'),
+        'command': sys.argv,
+        'arch': in_arg.arch,
+        'batch_size': in_arg.batch_size,
+        'workers': in_arg.workers,
+        'threads_per_worker': in_arg.threads_per_worker,
+        'arguments': vars(in_arg),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+    # Libraries are only reported when the run imported them
+    numpy = sys.modules.get('numpy')
+    if numpy is not None:
+        manifest['numpy'] = numpy.__version__
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        manifest['torch'] = torch.__version__
+        manifest['torch_threads'] = torch.get_num_threads()
+        manifest['torch_interop_threads'] = torch.get_num_interop_threads()
+    torchvision = sys.modules.get('torchvision')
+    if torchvision is not None:
+        manifest['torchvision'] = torchvision.__version__
+    return manifest
+
+
+def write_timing_report(path, manifest, stage_timer, latency_recorder, n_images,
+                        model_memory=None):
+    """
+    Writes the JSON run report of --timing-report.
+
+    Parameters:
+      path (str) - File to write
+      manifest (dict) - Manifest of the run, see run_manifest()
+      stage_timer (StageTimer) - Wall and CPU time (and memory use, when
+                                 tracked) of the run's stages
+      latency_recorder (LatencyRecorder) - Per-image latencies
+      n_images (int) - Number of images the run classified
+      model_memory (list) - Memory of every loaded model, see
+                            classifier.session_memory() (default: None)
+    Returns:
+      dict - The report written
+    """
+    total = stage_timer.elapsed()
+    classification = stage_timer.stages.get('classification', {}).get('wall_seconds', 0.0)
+    report = {
+        'manifest': manifest,
+        'total_seconds': total,
+        'stages': stage_timer.stages,
+        'latency': latency_recorder.summary(),
+        'throughput': {
+            'images': n_images,
+            'classification_seconds': classification,
+            'images_per_second': n_images / classification if classification > 0 else 0.0,
+            'end_to_end_images_per_second': n_images / total if total > 0 else 0.0,
+        },
+    }
+    if stage_timer.memory is not None:
+        report['memory'] = {'peak_rss_bytes': max(times.get('peak_rss_bytes', 0)
+                                                  for times in stage_timer.stages.values()),
+                            'batches': stage_timer.memory.batch_summary(),
+                            'models': model_memory or []}
+    with open(path, 'w') as outfile:
+        json.dump(report, outfile, indent=2, default=str)
+    return report
+
+
+def print_memory_report(stage_timer, model_memory):
+    """
+    Prints the memory use of every stage, every loaded model and the
+    classification batches, followed by the top tracemalloc allocation
+    sites at the end of the run (when recorded).
+
+    Parameters:
+      stage_timer (StageTimer) - Timer that tracked memory
+      model_memory (list) - Memory of every loaded model, see
+                            classifier.session_memory()
+    Returns:
+      None - Prints to console
+    """
+    mib = 1024 ** 2
+    print("\n" + "="*78)
+    print("*** Memory Report ***")
+    print("="*78)
+    print(f"{'STAGE':<30}{'RSS BEFORE':>12}{'RSS AFTER':>12}{'CHANGE':>12}{'PEAK':>12}  [MiB]")
+    for stage, times in stage_timer.stages.items():
+        if 'rss_after_bytes' in times:
+            print(f"{stage[:29]:<30}{times['rss_before_bytes'] / mib:>12.1f}"
+                  f"{times['rss_after_bytes'] / mib:>12.1f}"
+                  f"{times['rss_change_bytes'] / mib:>+12.1f}{times['peak_rss_bytes'] / mib:>12.1f}")
+    if model_memory:
+        print(f"\n{'MODEL':<30}{'PARAMETERS':>12}{'BUFFERS':>12}{'STATE':>12}  [MiB]")
+        for model in model_memory:
+            name = f"{model['model']} ({model['precision']}, {model['layout']})"
+            print(f"{name[:29]:<30}{model['parameter_bytes'] / mib:>12.1f}"
+                  f"{model['buffer_bytes'] / mib:>12.1f}{model['state_bytes'] / mib:>12.1f}")
+    batches = stage_timer.memory.batch_summary()
+    if batches['batches']:
+        print(f"\nPeak memory growth per batch ({batches['batches']} batches): "
+              f"max {batches['max_peak_bytes'] / mib:.1f} MiB, "
+              f"mean {batches['mean_peak_bytes'] / mib:.1f} MiB, "
+              f"max per image {batches['max_peak_bytes_per_image'] / mib:.2f} MiB")
+    top = stage_timer.memory.top_allocations()
+    if top:
+        print(f"\nTop {len(top)} tracemalloc allocation sites:")
+        for allocation in top:
+            print(f"  {allocation['size_bytes'] / mib:>9.2f} MiB {allocation['count']:>8} blocks"
+                  f"  {allocation['location']}")
+    print("="*78)
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/serve.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Local HTTP inference service around the classifier.py models, so
+#          other services can classify pet images without running
+#          check_images.py on a folder. The server is built on asyncio
+#          streams and the standard library only. POST /classify takes
+#          either one image as the request body or several images as a
+#          multipart/form-data batch. Images from concurrent requests are
+#          coalesced into CPU batches by a MicroBatcher: a batch is run as
+#          soon as it holds max_batch_size images or its first image has
+#          waited max_wait_ms. The queue in front of the batcher is bounded;
+#          when it is full the request is shed with HTTP 503 instead of
+#          piling up latency. Every result carries the ImageNet label and
+#          class id, the is-a-dog flag and timings. GET /health reports the
+#          queue depth and batching statistics.
+#
+#   Example calls:
+#    python serve.py --arch resnet --port 8080
+#    curl --data-binary @pet_images/Collie_03797.jpg http://127.0.0.1:8080/classify
+#    curl -F a=@pet_images/Collie_03797.jpg -F b=@pet_images/cat_01.jpg \
+#         http://127.0.0.1:8080/classify
+#   Offline, with randomly initialized weights:
+#    python serve.py --arch resnet --random-weights
+##
+# Imports python modules
+import argparse
+import asyncio
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesParser
+from email.policy import HTTP
+from time import perf_counter
+
+import torch
+
+# Imports functions created for this program
+from adjust_results4_isadog import dog_class_bitmap
+from classifier import (DECODE_MODES, LAYOUTS, PRECISIONS, InferenceSession, ModelRegistry,
+                        decode_image, get_session, preprocess)
+from get_input_args import ARCHITECTURES, positive_int
+from imagenet_labels import get_imagenet_classes
+
+# Reason phrases of the status codes the server sends
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 411: 'Length Required',
+                413: 'Payload Too Large', 431: 'Request Header Fields Too Large',
+                500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+# Longest accepted request line plus headers, in bytes
+MAX_HEADER_BYTES = 16 * 1024
+
+
+class Overloaded(Exception):
+    """Raised when the batching queue has no room for a request's images."""
+
+
+class BadRequest(Exception):
+    """Raised for a request that cannot be served; args are (status, message)."""
+
+
+def load_image(data, decode='full'):
+    """
+    Decodes and preprocesses one image from its encoded bytes.
+
+    Returns:
+      torch.Tensor - The preprocessed (3, 224, 224) image
+    Raises:
+      BadRequest - The bytes are not a decodable image
+    """
+    try:
+        return preprocess(decode_image(io.BytesIO(data), decode))
+    except (OSError, ValueError, SyntaxError) as error:
+        raise BadRequest(400, f"not a decodable image: {error}") from None
+
+
+class MicroBatcher:
+    """
+    Coalesces the images of concurrent requests into batches for one model.
+
+    Images wait in a bounded asyncio.Queue. One task takes the first waiting
+    image, then keeps taking images until the batch holds max_batch_size
+    images or max_wait_ms have passed since the first one arrived, and runs
+    the batch's forward pass on a single inference thread - so the event
+    loop keeps accepting requests (and filling the next batch) meanwhile.
+
+    Parameters:
+      session (InferenceSession) - Model to classify with
+      dog_classes (numpy.ndarray) - Is-a-dog flag of every class id
+      max_batch_size (int) - Largest batch run at once
+      max_wait_ms (float) - Longest time the first image of a batch waits
+                            for more images
+      max_queue (int) - Images allowed to wait; requests beyond that are
+                        shed with Overloaded
+
+    Example:
+      >>> batcher = MicroBatcher(get_session('resnet'), dog_class_bitmap('dognames.txt'))
+      >>> batcher.start()
+      >>> results = await batcher.classify([tensor])
+    """
+
+    def __init__(self, session, dog_classes, max_batch_size=16, max_wait_ms=5.0,
+                 max_queue=256):
+        self.session = session
+        self.dog_classes = dog_classes
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue(max_queue)
+        self.imagenet_classes_dict = get_imagenet_classes()
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='inference')
+        self.stats = {'batches': 0, 'images': 0, 'shed_requests': 0}
+        self._task = None
+        self._getter = None
+
+    def start(self):
+        """Starts the batching task on the running event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stops the batching task and the inference thread."""
+        if self._getter is not None:
+            self._getter.cancel()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=True)
+
+    async def classify(self, tensors):
+        """
+        Classifies preprocessed images, all or none of them: when the queue
+        cannot take every image the request is shed.
+
+        Parameters:
+          tensors (list) - Preprocessed (3, 224, 224) images
+        Returns:
+          list - One result dict per image, in order
+        Raises:
+          Overloaded - The queue has no room for the images
+        """
+        if self.queue.maxsize - self.queue.qsize() < len(tensors):
+            self.stats['shed_requests'] += 1
+            raise Overloaded()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for tensor in tensors:
+            future = loop.create_future()
+            self.queue.put_nowait((tensor, future, perf_counter()))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    async def _next_item(self, timeout):
+        # Returns the next queued item, or None after timeout seconds. A get
+        # that has not finished is kept for the next call rather than
+        # cancelled, so a queued image can never be lost
+        if self._getter is None:
+            self._getter = asyncio.ensure_future(self.queue.get())
+        done, _ = await asyncio.wait({self._getter}, timeout=timeout)
+        if not done:
+            return None
+        item = self._getter.result()
+        self._getter = None
+        return item
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._next_item(None)]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.max_batch_size:
+                # Images already waiting join the batch at once
+                if self._getter is None and not self.queue.empty():
+                    items.append(self.queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                item = await self._next_item(remaining)
+                if item is None:
+                    break
+                items.append(item)
+            # Images of requests that were cancelled while waiting (their
+            # futures are then done already) are skipped
+            items = [item for item in items if not item[1].done()]
+            if not items:
+                continue
+            batch_start = perf_counter()
+            try:
+                class_ids, forward_seconds = await loop.run_in_executor(
+                    self.executor, self._forward, [tensor for tensor, _, _ in items])
+            except Exception as error:
+                for _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.stats['batches'] += 1
+            self.stats['images'] += len(items)
+            for (_, future, queued), class_id in zip(items, class_ids):
+                if not future.done():
+                    future.set_result({
+                        'label': self.imagenet_classes_dict[class_id],
+                        'class_id': class_id,
+                        'is_dog': bool(self.dog_classes[class_id]),
+                        'timing': {'queue_ms': (batch_start - queued) * 1e3,
+                                   'forward_ms': forward_seconds * 1e3,
+                                   'batch_size': len(items)},
+                    })
+
+    def _forward(self, tensors):
+        # Runs on the inference thread: one forward pass for the batch
+        start_time = perf_counter()
+        output = self.session.forward(torch.stack(tensors))
+        return output.argmax(dim=1).tolist(), perf_counter() - start_time
+
+
+def split_multipart(content_type, body):
+    """
+    Returns the contents of the parts of a multipart/form-data body, in
+    order, e.g. one per image file.
+
+    Raises:
+      BadRequest - The body is not a multipart message with parts
+    """
+    message = BytesParser(policy=HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body)
+    if not message.is_multipart():
+        raise BadRequest(400, "malformed multipart body")
+    parts = [part.get_payload(decode=True) for part in message.iter_parts()]
+    parts = [part for part in parts if part]
+    if not parts:
+        raise BadRequest(400, "multipart body has no images")
+    return parts
+
+
+class InferenceServer:
+    """
+    HTTP/1.1 front end of a MicroBatcher.
+
+    Parameters:
+      batcher (MicroBatcher) - Batcher the images are classified by
+      decode (str) - One of DECODE_MODES (default: 'full')
+      max_body_bytes (int) - Largest accepted request body
+                             (default: 32 MiB)
+      max_images (int) - Most images accepted in one request
+                         (default: 64)
+    """
+
+    def __init__(self, batcher, decode='full', max_body_bytes=32 * 1024 ** 2,
+                 max_images=64):
+        self.batcher = batcher
+        self.decode = decode
+        self.max_body_bytes = max_body_bytes
+        self.max_images = max_images
+        # Task serving each open connection -> its stream writer
+        self._connections = {}
+
+    async def handle_connection(self, reader, writer):
+        """Serves the requests of one connection until it is closed."""
+        self._connections[asyncio.current_task()] = writer
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, 431, {'error': 'request head too large'}, False)
+                    break
+                method, path, version, headers = self.parse_head(head)
+                keep_alive = version == 'HTTP/1.1' and \
+                    headers.get('connection', '').lower() != 'close'
+                try:
+                    status, payload = await self.dispatch(method, path, headers, reader)
+                except BadRequest as error:
+                    status, payload = error.args[0], {'error': error.args[1]}
+                    # The unread body makes the connection unusable
+                    keep_alive = False
+                except Exception as error:
+                    # E.g. a failed forward pass: the client still gets a reply
+                    status, payload = 500, {'error': f"{type(error).__name__}: {error}"}
+                    keep_alive = False
+                headers_out = {'Retry-After': '1'} if status == 503 else {}
+                await self.respond(writer, status, payload, keep_alive, headers_out)
+        except ConnectionError:
+            pass
+        finally:
+            del self._connections[asyncio.current_task()]
+            writer.close()
+
+    async def close_connections(self, timeout=5.0):
+        """
+        Closes every open connection at shutdown. Idle connections end at
+        once; requests in progress get up to timeout seconds to finish.
+        """
+        for writer in self._connections.values():
+            writer.close()
+        if self._connections:
+            await asyncio.wait(list(self._connections), timeout=timeout)
+
+    @staticmethod
+    def parse_head(head):
+        # Returns the method, path, version and lower-cased headers
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, path, version = lines[0].split(' ', 2)
+        except ValueError:
+            method, path, version = '', '', 'HTTP/1.0'
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        return method, path.split('?', 1)[0], version, headers
+
+    async def dispatch(self, method, path, headers, reader):
+        """
+        Serves one request.
+
+        Returns:
+          status (int) - HTTP status code
+          payload (dict) - JSON response body
+        Raises:
+          BadRequest - The request cannot be served
+        """
+        if path == '/health':
+            if method != 'GET':
+                raise BadRequest(405, "use GET")
+            return 200, {'status': 'ok', 'model': self.batcher.session.model_name,
+                         'queued': self.batcher.queue.qsize(), **self.batcher.stats}
+        if path != '/classify':
+            raise BadRequest(404, f"no such endpoint: {path}")
+        if method != 'POST':
+            raise BadRequest(405, "use POST")
+
+        if 'content-length' not in headers:
+            raise BadRequest(411, "Content-Length is required")
+        try:
+            length = int(headers['content-length'])
+        except ValueError:
+            raise BadRequest(400, "invalid Content-Length") from None
+        if length > self.max_body_bytes:
+            raise BadRequest(413, f"body larger than {self.max_body_bytes} bytes")
+        request_start = perf_counter()
+        try:
+            body = await reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            raise BadRequest(400, "body shorter than Content-Length") from None
+
+        content_type = headers.get('content-type', '')
+        if content_type.startswith('multipart/'):
+            images = split_multipart(content_type, body)
+        elif body:
+            images = [body]
+        else:
+            raise BadRequest(400, "empty body: send an image or a multipart batch")
+        if len(images) > self.max_images:
+            raise BadRequest(413, f"more than {self.max_images} images in one request")
+        # Requests that cannot be queued are shed before any decoding
+        if self.batcher.queue.maxsize - self.batcher.queue.qsize() < len(images):
+            self.batcher.stats['shed_requests'] += 1
+            return 503, {'error': 'server overloaded, retry later'}
+
+        # Images are decoded on the default thread pool, off the event loop
+        loop = asyncio.get_running_loop()
+        decode_start = perf_counter()
+        tensors = await asyncio.gather(*[loop.run_in_executor(None, load_image, data,
+                                                              self.decode)
+                                         for data in images])
+        decode_ms = (perf_counter() - decode_start) * 1e3
+        try:
+            results = await self.batcher.classify(tensors)
+        except Overloaded:
+            return 503, {'error': 'server overloaded, retry later'}
+        total_ms = (perf_counter() - request_start) * 1e3
+        for result in results:
+            result['timing'].update(decode_ms=decode_ms, total_ms=total_ms)
+        if content_type.startswith('multipart/'):
+            return 200, {'results': results}
+        return 200, results[0]
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive, extra_headers=None):
+        """Writes one JSON response."""
+        body = json.dumps(payload).encode()
+        head = [f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}",
+                'Content-Type: application/json',
+                f"Content-Length: {len(body)}",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        head += [f"{name}: {value}" for name, value in (extra_headers or {}).items()]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+
+async def serve(args):
+    """Loads the model and serves requests until interrupted."""
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if args.random_weights:
+        # Randomly initialized weights need no download, e.g. for testing
+        torch.manual_seed(0)
+        session = InferenceSession(args.arch, registry=ModelRegistry(pretrained=False),
+                                   artifact_dir=None, precision=args.precision,
+                                   layout=args.layout)
+    else:
+        session = get_session(args.arch, precision=args.precision, layout=args.layout)
+    batcher = MicroBatcher(session, dog_class_bitmap(args.dogfile), args.max_batch_size,
+                           args.max_wait_ms, args.max_queue)
+    server = InferenceServer(batcher, args.decode, args.max_body_mb * 1024 ** 2,
+                             args.max_images)
+    batcher.start()
+    listener = await asyncio.start_server(server.handle_connection, args.host, args.port,
+                                          limit=MAX_HEADER_BYTES)
+    print(f"Serving {args.arch} on http://{args.host}:{args.port} "
+          f"(max batch {args.max_batch_size}, max wait {args.max_wait_ms:g} ms, "
+          f"queue {args.max_queue})", flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close_connections()
+        await batcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve the pet image classifier over HTTP with dynamic micro-batching'
+    )
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='Address to listen on (default: localhost only)')
+    parser.add_argument('--port', type=int, default=8080,
+                        help='Port to listen on')
+    parser.add_argument('--arch', type=str, default='resnet', choices=ARCHITECTURES,
+                        help='CNN model architecture')
+    parser.add_argument('--dogfile', type=str, default='dognames.txt',
+                        help='Text file with dog names')
+    parser.add_argument('--max-batch-size', type=positive_int, default=16,
+                        help='Largest number of images classified in one forward pass')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help='Longest time an image waits for a batch to fill')
+    parser.add_argument('--max-queue', type=positive_int, default=256,
+                        help='Images allowed to wait; further requests get HTTP 503')
+    parser.add_argument('--max-images', type=positive_int, default=64,
+                        help='Most images accepted in one request')
+    parser.add_argument('--max-body-mb', type=positive_int, default=32,
+                        help='Largest accepted request body in MiB')
+    parser.add_argument('--precision', type=str, default='fp32', choices=PRECISIONS,
+                        help="Numeric precision ('int8-static' is not supported)")
+    parser.add_argument('--layout', type=str, default='nchw', choices=LAYOUTS,
+                        help='Memory layout of the model and input batches')
+    parser.add_argument('--decode', type=str, default='full', choices=DECODE_MODES,
+                        help='Image decode mode')
+    parser.add_argument('--threads', type=positive_int, default=None,
+                        help='Intra-op threads for torch (default: torch default)')
+    parser.add_argument('--random-weights', action='store_true',
+                        help='Use randomly initialized weights (no download, for testing)')
+    args = parser.parse_args()
+    if args.max_wait_ms < 0:
+        parser.error(f"--max-wait-ms must be at least 0, got {args.max_wait_ms}")
+    if args.max_images > args.max_queue:
+        # A request with more images than the queue holds could never be served
+        parser.error(f"--max-images ({args.max_images}) must not exceed "
+                     f"--max-queue ({args.max_queue})")
+    if args.precision == 'int8-static':
+        # Static quantization needs calibration images, which a server lacks
+        parser.error("--precision int8-static is not supported by the server")
+    if args.layout != 'nchw' and args.precision.startswith('int8'):
+        parser.error(f"--layout {args.layout} is not supported with --precision {args.precision}")
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+# Call to main function to run the program
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/startup_report.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Startup report for --startup-report. Records how long each phase
+#          of a run takes (imports, argument parsing, image discovery,
+#          importing the CNN pipeline, classification, ...; see
+#          run_report.StageTimer) and, like python -X importtime, how long
+#          importing every module took, both on its own (self) and including
+#          the modules it imported in turn (cumulative). Imports are timed by
+#          wrapping the built-in __import__, so only first imports through
+#          an import statement are seen; modules imported with importlib
+#          count towards the module that imported them.
+#
+##
+# Imports python modules
+import builtins
+import sys
+from time import perf_counter
+
+# Imports functions created for this program
+from run_report import StageTimer
+
+
+class StartupReport(StageTimer):
+    """
+    Phase (stage) and import timings of one run.
+
+    Parameters:
+      time_imports (bool) - Time every module imported from now on
+                            (default: False)
+
+    Example:
+      >>> report = StartupReport(time_imports=True)
+      >>> import json
+      >>> report.mark('imports')
+      >>> report.print_report()
+    """
+
+    def __init__(self, time_imports=False):
+        super().__init__()
+        # Module name -> [self seconds, cumulative seconds]
+        self.imports = {}
+        # Time spent in nested first imports, one entry per import in progress
+        self._nested = []
+        self._original_import = None
+        if time_imports:
+            self.install_import_timer()
+
+    def install_import_timer(self):
+        """Starts timing every first import of a module."""
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+
+    def uninstall_import_timer(self):
+        """Stops timing imports."""
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Modules already imported (and relative imports) are passed straight
+        # through, so the timer only adds to first imports
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        self._nested.append(0.0)
+        start = perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = perf_counter() - start
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+            self.imports[name] = [elapsed - nested, elapsed]
+
+    def print_report(self, top=15):
+        """
+        Prints the time of every phase and the slowest imports.
+
+        Parameters:
+          top (int) - Number of imports listed, by cumulative time (default: 15)
+        Returns:
+          None - Prints to console
+        """
+        print("\n" + "="*70)
+        print(f"*** Startup Report: {self.elapsed():.3f} s since startup ***")
+        print("="*70)
+        print(f"{'PHASE':<40}{'WALL [s]':>12}{'CPU [s]':>12}")
+        for phase, times in self.stages.items():
+            print(f"{phase[:39]:<40}{times['wall_seconds']:>12.3f}{times['cpu_seconds']:>12.3f}")
+        if self.imports:
+            slowest = sorted(self.imports.items(), key=lambda item: -item[1][1])[:top]
+            print(f"\n{'IMPORT':<40}{'SELF [us]':>12}{'CUMULATIVE [us]':>18}")
+            for name, (self_time, cumulative) in slowest:
+                print(f"{name[:39]:<40}{self_time * 1e6:>12.0f}{cumulative * 1e6:>18.0f}")
+        print(f"\ntorch imported: {'yes' if 'torch' in sys.modules else 'no'}")
+        print("="*70)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# */AIPND-revision/intropyproject-classify-pet-images/tensor_store.py
+#
+# PROGRAMMER: Pyae Linn
+# DATE CREATED: 18/10/26
+# REVISED DATE:
+# PURPOSE: Memory-mapped store of preprocessed images shared by every CNN
+#          architecture. All three models use the same Resize(256) and
+#          CenterCrop(224) preprocessing, so each image only needs to be
+#          decoded and resized once: the 224x224 RGB uint8 result is appended
+#          to a single raw array file (<store>.u8) and located through an
+#          index file (<store>.json). Later runs, of any architecture, read
+#          batches straight from the memory map and only the normalization is
+#          left to do, as one batched tensor operation
+#          (classifier.normalize_batch).
+#
+#   Example call:
+#    python tensor_store.py pet_images/ pet_images.store
+##
+# Imports python modules
+import argparse
+import json
+import os
+
+import numpy as np
+
+# Imports the crop half of the classifier preprocessing
+from classifier import CROP_SIZE, crop, decode_image
+# Imports the image listing shared with get_pet_labels
+from image_discovery import discover_images
+
+# Shape of one stored image (height, width, channels)
+IMAGE_SHAPE = (CROP_SIZE, CROP_SIZE, 3)
+IMAGE_NBYTES = CROP_SIZE * CROP_SIZE * 3
+
+
+class TensorStore:
+    """
+    Append-only, memory-mapped store of cropped uint8 images.
+
+    Images are identified by their absolute path together with their size
+    and modification time, so an image that changes on disk is decoded
+    again on the next add(). Rows of images that changed are simply left
+    unused in the array file.
+
+    Parameters:
+      store_path (str) - Path prefix of the store; the array and index are
+                         kept in store_path + '.u8' and store_path + '.json'
+      decode (str) - How images are decoded, one of classifier.DECODE_MODES;
+                     a store built with another mode is started afresh
+                     (default: 'full')
+
+    Example:
+      >>> store = TensorStore('pet_images.store')
+      >>> store.add(['pet_images/Collie_03797.jpg'])
+      1
+      >>> store.batch(['pet_images/Collie_03797.jpg']).shape
+      (1, 224, 224, 3)
+    """
+
+    def __init__(self, store_path, decode='full'):
+        self.store_path = store_path
+        self.array_path = store_path + '.u8'
+        self.index_path = store_path + '.json'
+        self.decode = decode
+        self.preprocess = repr(crop) if decode == 'full' else f"decode={decode}|{crop!r}"
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as infile:
+                stored = json.load(infile)
+            if stored.get('preprocess') == self.preprocess:
+                self.index = stored['images']
+        self._array = None
+        self._open()
+
+    def _open(self):
+        # (Re)maps the array file - copy-on-write so that the returned arrays
+        # are writable for torch.from_numpy without ever changing the file
+        rows = os.path.getsize(self.array_path) // IMAGE_NBYTES \
+            if os.path.exists(self.array_path) else 0
+        self._array = np.memmap(self.array_path, dtype=np.uint8, mode='c',
+                                shape=(rows,) + IMAGE_SHAPE) if rows else None
+
+    def __len__(self):
+        return len(self.index)
+
+    @staticmethod
+    def _signature(img_path):
+        stat = os.stat(img_path)
+        return os.path.abspath(img_path), stat.st_size, stat.st_mtime_ns
+
+    def __contains__(self, img_path):
+        path, size, mtime_ns = self._signature(img_path)
+        entry = self.index.get(path)
+        return entry is not None and entry[1:] == [size, mtime_ns]
+
+    def add(self, img_paths):
+        """
+        Decodes, crops and appends every image not already in the store.
+
+        Parameters:
+          img_paths (list) - Paths of the images to store
+        Returns:
+          int - Number of images added
+        """
+        if not self.index and os.path.exists(self.array_path):
+            # Rows of a store built with other preprocessing are unusable
+            os.remove(self.array_path)
+
+        rows = os.path.getsize(self.array_path) // IMAGE_NBYTES \
+            if os.path.exists(self.array_path) else 0
+        added = 0
+        with open(self.array_path, 'ab') as outfile:
+            for img_path in img_paths:
+                if img_path in self:
+                    continue
+                path, size, mtime_ns = self._signature(img_path)
+                image = crop(decode_image(img_path, self.decode))
+                outfile.write(np.asarray(image, dtype=np.uint8).tobytes())
+                self.index[path] = [rows, size, mtime_ns]
+                rows += 1
+                added += 1
+
+        if added:
+            self._write_index()
+            self._open()
+        return added
+
+    def _write_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as outfile:
+            json.dump({'shape': list(IMAGE_SHAPE), 'preprocess': self.preprocess,
+                       'images': self.index}, outfile)
+        os.replace(tmp_path, self.index_path)
+
+    def rows(self, img_paths):
+        """Returns the row of every image in img_paths (KeyError if missing)."""
+        return [self.index[os.path.abspath(path)][0] for path in img_paths]
+
+    def batch(self, img_paths):
+        """
+        Returns the cropped images of img_paths as one uint8 array.
+
+        When the images occupy consecutive rows - as they do when a batch is
+        requested in the order the store was built - the result is a
+        zero-copy slice of the memory map.
+
+        Parameters:
+          img_paths (list) - Paths of the images, all present in the store
+        Returns:
+          numpy.ndarray - uint8 array of shape (N, 224, 224, 3)
+        """
+        rows = self.rows(img_paths)
+        first = rows[0]
+        if rows == list(range(first, first + len(rows))):
+            return self._array[first:first + len(rows)]
+        return self._array[rows]
+
+
+# Builds or updates a store from the command line, so that it can be filled
+# once before running check_images.py for each architecture
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Build the preprocessed image store used by check_images.py'
+    )
+    parser.add_argument('dir', help='Path to folder of images to store')
+    parser.add_argument('store', help='Path prefix of the tensor store')
+    parser.add_argument('--decode', choices=['full', 'draft'], default='full',
+                        help='Decode JPEGs in full or at reduced resolution')
+    args = parser.parse_args()
+
+    # The same images check_images.py would classify (see image_discovery)
+    filenames = sorted(discover_images(args.dir))
+    store = TensorStore(args.store, args.decode)
+    added = store.add([os.path.join(args.dir, name) for name in filenames])
+    print(f"Added {added} images to {args.store} ({len(store)} images in store)")